@@ -0,0 +1,290 @@
+"""
+Exercise the appointment confirmation campaign runner against a local Twilio
+REST API stub and CRM stub; no real calls are placed.
+
+The Twilio stub accepts call requests up to a calls-per-second limit (429
+above it, like Twilio), then plays each call through initiated / ringing /
+in-progress / completed (or busy, no-answer, failed) by posting status
+callbacks to the app's /api/twilio/call-status. The CRM stub serves a day of
+appointments, paginated.
+
+The run is interrupted part way, the kind of state a crash leaves behind is
+simulated (a call Twilio accepted but the runner never recorded, and one it
+never sent), and the campaign is resumed. Reports throughput, throttling, the
+highest number of simultaneous calls, and checks that every appointment was
+dialed exactly once.
+
+Usage (from ai-receptionist/):
+    python benchmarks/confirmation_campaign_test.py [--appointments 150] [--concurrency 10]
+        [--calls-per-second 8] [--twilio-cps 5] [--ring-seconds 0.5] [--talk-seconds 1.5]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+import requests
+
+ACCOUNT_SID = 'AC' + '0' * 32
+
+# Share of calls ending each way
+OUTCOMES = [('completed', 0.7), ('no-answer', 0.15), ('busy', 0.1), ('failed', 0.05)]
+
+
+class TwilioAndCRMStub:
+    def __init__(self, appointments, appointment_date, twilio_cps, ring_seconds, talk_seconds):
+        self.appointments = [
+            {
+                'id': 5000 + index,
+                'patient_name': f'Patient {index}',
+                'patient_phone': f'+1484555{index:04d}',
+                'service_type': 'Wellness Consultation',
+                'appointment_date': appointment_date.isoformat(),
+                'appointment_time': f'{8 + index % 10:02d}:{(index // 10) % 2 * 30:02d}:00',
+                'status': 'scheduled'
+            }
+            for index in range(appointments)
+        ]
+        self.min_interval = 1.0 / twilio_cps
+        self.ring_seconds = ring_seconds
+        self.talk_seconds = talk_seconds
+
+        self.calls = {}  # sid -> call JSON
+        self.dialed = Counter()  # phone number -> call requests accepted
+        self.create_times = []
+        self.throttled = 0
+        self.active = 0
+        self.max_active = 0
+        self._last_create = 0.0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.handle(self, 'GET')
+
+            def do_POST(self):
+                stub.handle(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='twilio-stub', daemon=True).start()
+
+    def handle(self, handler, method):
+        url = urlparse(handler.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(handler.headers.get('Content-Length') or 0)
+        form = {key: values[0] for key, values in parse_qs(handler.rfile.read(length).decode()).items()} if length else {}
+
+        if url.path == '/api/appointments':
+            status, payload = self.list_appointments(query)
+        elif url.path.endswith('/Calls.json') and method == 'POST':
+            status, payload = self.create_call(form)
+        elif url.path.endswith('/Calls.json'):
+            status, payload = self.list_calls(query)
+        elif re.search(r'/Calls/(CA\w+)\.json$', url.path):
+            call = self.calls.get(re.search(r'/Calls/(CA\w+)\.json$', url.path).group(1))
+            status, payload = (200, call) if call else (404, {'code': 20404, 'message': 'Not found', 'status': 404})
+        else:
+            status, payload = 404, {'success': False, 'error': f'{method} {url.path} is not stubbed'}
+
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def list_appointments(self, query):
+        page, per_page = int(query.get('page', 1)), int(query.get('per_page', 50))
+        pages = max(1, -(-len(self.appointments) // per_page))
+        return 200, {
+            'success': True,
+            'appointments': self.appointments[(page - 1) * per_page:page * per_page],
+            'pagination': {'page': page, 'pages': pages, 'per_page': per_page, 'total': len(self.appointments)}
+        }
+
+    def create_call(self, form):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_create < self.min_interval:
+                self.throttled += 1
+                return 429, {'code': 20429, 'message': 'Too Many Requests', 'status': 429}
+            self._last_create = now
+            self.create_times.append(now)
+            self.dialed[form['To']] += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+            sid = 'CA' + '%032x' % random.getrandbits(128)
+            self.calls[sid] = {
+                'sid': sid, 'account_sid': ACCOUNT_SID, 'to': form['To'], 'from': form['From'],
+                'status': 'queued', 'direction': 'outbound-api', 'duration': None, 'price': None,
+                'date_created': format_datetime(datetime.now(timezone.utc)),
+                'start_time': None, 'end_time': None
+            }
+        threading.Thread(target=self.play_call, args=(sid, form.get('StatusCallback')), daemon=True).start()
+        return 201, self.calls[sid]
+
+    def list_calls(self, query):
+        calls = [call for call in reversed(list(self.calls.values())) if call['to'] == query.get('To')]
+        return 200, {'calls': calls[:int(query.get('PageSize', 50))], 'next_page_uri': None, 'page': 0,
+                     'page_size': int(query.get('PageSize', 50)), 'uri': '/Calls.json'}
+
+    def play_call(self, sid, callback_url):
+        outcome = random.choices([name for name, _ in OUTCOMES], [share for _, share in OUTCOMES])[0]
+        steps = [('initiated', 0.05), ('ringing', self.ring_seconds)]
+        if outcome == 'completed':
+            steps += [('in-progress', self.talk_seconds), ('completed', 0)]
+        else:
+            steps += [(outcome, 0)]
+
+        started = time.monotonic()
+        for call_status, duration in steps:
+            self.calls[sid]['status'] = call_status
+            if call_status in ('completed', 'no-answer', 'busy', 'failed'):
+                self.calls[sid]['duration'] = str(int(time.monotonic() - started))
+                with self._lock:
+                    self.active -= 1
+            if callback_url:
+                try:
+                    requests.post(callback_url, data={
+                        'CallSid': sid, 'CallStatus': call_status, 'CallDuration': self.calls[sid]['duration'] or 0
+                    }, timeout=10)
+                except requests.RequestException:
+                    pass
+            time.sleep(duration)
+
+    def peak_rate(self):
+        """Most call requests accepted in any one-second window"""
+        times = sorted(self.create_times)
+        return max((sum(1 for other in times[index:] if other - start < 1.0) for index, start in enumerate(times)),
+                   default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a confirmation campaign against local Twilio and CRM stubs')
+    parser.add_argument('--appointments', type=int, default=150)
+    parser.add_argument('--concurrency', type=int, default=10, help='runner: calls in progress at once')
+    parser.add_argument('--calls-per-second', type=float, default=8, help='runner: call request rate')
+    parser.add_argument('--twilio-cps', type=float, default=5, help="stub: requests per second before it answers 429")
+    parser.add_argument('--ring-seconds', type=float, default=0.5)
+    parser.add_argument('--talk-seconds', type=float, default=1.5)
+    parser.add_argument('--verbose', action='store_true', help='keep the app logs')
+    args = parser.parse_args()
+
+    appointment_date = date.today() + timedelta(days=1)
+    stub = TwilioAndCRMStub(args.appointments, appointment_date, args.twilio_cps, args.ring_seconds, args.talk_seconds)
+    stub.start()
+
+    scratch = tempfile.mkdtemp(prefix='receptionist-campaign-')
+    os.environ.update({
+        'OPENAI_API_KEY': 'campaign-test',
+        'TWILIO_ACCOUNT_SID': ACCOUNT_SID,
+        'TWILIO_AUTH_TOKEN': 'campaign-test',
+        'TWILIO_API_BASE_URL': stub.url,
+        'CRM_API_URL': f'{stub.url}/api',
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'app.db')}",
+        'CALL_SESSION_DB': os.path.join(scratch, 'call_sessions.db'),
+        'POST_CALL_QUEUE_DB': os.path.join(scratch, 'post_call_jobs.db'),
+        'TTS_CACHE_DIR': os.path.join(scratch, 'tts_cache'),
+    })
+    if not args.verbose:
+        # 429s are expected here and counted by the stub
+        logging.disable(logging.ERROR)
+
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.user import db
+    from src.models.campaign import CampaignCall
+    from src.services.crm_integration import CRMIntegrationService
+    from src.services.twilio_integration import TwilioIntegrationService
+    from src.services.confirmation_campaign import ConfirmationCampaignRunner
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='receptionist', daemon=True).start()
+    callback_url = f'http://127.0.0.1:{server.server_port}/api/twilio/call-status'
+
+    def new_runner():
+        return ConfirmationCampaignRunner(
+            TwilioIntegrationService(), CRMIntegrationService(), max_concurrency=args.concurrency,
+            calls_per_second=args.calls_per_second, callback_url=callback_url, poll_interval=0.2
+        )
+
+    print(f"{args.appointments} appointments on {appointment_date}; runner {args.concurrency} concurrent at "
+          f"{args.calls_per_second:g}/s, Twilio stub limit {args.twilio_cps:g}/s")
+    started = time.perf_counter()
+
+    with app.app_context():
+        campaign_id = new_runner().create_campaign(appointment_date, appointment_date).id
+
+        # First run, interrupted about a third of the way through
+        stop_event = threading.Event()
+        first_run = threading.Thread(target=lambda: _run_in_context(app, new_runner(), campaign_id, stop_event))
+        first_run.start()
+        while len(stub.calls) < args.appointments // 3:
+            time.sleep(0.05)
+        stop_event.set()
+        first_run.join()
+        print(f"interrupted after {len(stub.calls)} calls")
+
+        # What a crash leaves behind: a call Twilio accepted but the runner never recorded...
+        db.session.expire_all()
+        placed = CampaignCall.query.filter(CampaignCall.campaign_id == campaign_id,
+                                           CampaignCall.call_sid.isnot(None)).first()
+        placed.status, placed.call_sid = 'dialing', None
+        # ...and one it marked as dialing but never sent
+        unsent = CampaignCall.query.filter_by(campaign_id=campaign_id, status='pending').first()
+        unsent.status, unsent.dialing_at, unsent.attempts = 'dialing', datetime.utcnow(), 1
+        db.session.commit()
+
+        result = new_runner().run(campaign_id)
+    elapsed = time.perf_counter() - started
+
+    duplicates = {number: count for number, count in stub.dialed.items() if count > 1}
+    never_dialed = args.appointments - len(stub.dialed)
+    print(f"\ncampaign {campaign_id} {result['status']} in {elapsed:.1f}s: {result['calls_by_status']}")
+    print(f"call requests accepted: {len(stub.calls)}, throttled (429): {stub.throttled}, "
+          f"peak {stub.peak_rate()} accepted in one second")
+    print(f"most simultaneous calls: {stub.max_active} (limit {args.concurrency})")
+    print(f"numbers dialed more than once: {len(duplicates)}; appointments never dialed: {never_dialed}")
+
+    ok = (result['status'] == 'completed' and not duplicates and never_dialed == 0
+          and stub.max_active <= args.concurrency
+          and sum(result['calls_by_status'].get(status, 0) for status in ('pending', 'dialing')) == 0)
+    print('\nOK' if ok else '\nFAILED')
+    server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+def _run_in_context(app, runner, campaign_id, stop_event):
+    with app.app_context():
+        runner.run(campaign_id, stop_event)
+
+
+if __name__ == '__main__':
+    main()
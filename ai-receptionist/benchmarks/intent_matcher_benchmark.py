@@ -0,0 +1,191 @@
+"""
+Benchmark: the shared keyword matcher vs the original nested substring loops used by
+AIReceptionistService.detect_intent and PhoneService.detect_emergency_in_speech.
+
+The shipped tables are small enough that the matcher runs the same substring scan
+as the loops (once for both consumers); the word index only takes over above
+SCAN_LIMIT distinct keywords, shown with the scaled tables.
+
+Usage (from ai-receptionist/):
+    python benchmarks/intent_matcher_benchmark.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-no-network')
+
+from src.services.ai_service import AIReceptionistService
+from src.services.phone_service import PhoneService
+from src.services.keyword_matcher import KeywordMatcher, EMERGENCY_SCREEN
+
+UTTERANCES = [
+    "Hi, I'd like to schedule an appointment for hormone optimization next Tuesday morning",
+    "Can I reschedule my visit to a different time, maybe later in the afternoon?",
+    "How much does the weight loss program cost and does insurance cover it?",
+    "What are your hours and is there parking at the Hamilton Blvd location?",
+    "I have chest pain and I can't breathe, please help me",
+    "yeah I need to talk to someone about my bill",
+    "Tell me about peptide therapy, what is the treatment like?",
+    "my name is Jane Doe and my number is 484-555-0199",
+    "I'm not sure, I was just calling to ask a question",
+    "I need to cancel tomorrow's consultation, something came up at work and I can't make it in",
+    "I need to make some appointments",
+    "what are your prices",
+]
+
+# Emergency screening must never be less sensitive than the legacy substring loop
+EMERGENCY_UTTERANCES = [
+    "I have chest pains",
+    "my son overdosed",
+    "(emergency) please",
+    "I am having a heart-attack",
+    '"help me"',
+    "it's URGENT, I can’t breathe",
+    "there's a lot of bleeding-",
+    "chest-pain since this morning",
+]
+
+
+def legacy_analyze(ai_service, phone_service, message):
+    """The pre-matcher implementation: one substring loop per intent plus an emergency loop."""
+    message_lower = message.lower()
+    intent_scores = {}
+    for intent, keywords in ai_service.intents.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in message_lower:
+                score += 1
+        if score > 0:
+            intent_scores[intent] = score / len(keywords)
+
+    is_emergency = False
+    for keyword in phone_service.routing_rules['emergency_keywords']:
+        if keyword in message_lower:
+            is_emergency = True
+            break
+
+    return intent_scores, is_emergency
+
+
+def compiled_analyze(ai_service, phone_service, matcher, message):
+    """Single pass over the utterance feeding both intent scoring and emergency detection."""
+    matches = matcher.match(message)
+    intent_scores = ai_service.score_intents(message, matches)
+    is_emergency, _ = phone_service.detect_emergency_in_speech(message, matches.get(EMERGENCY_SCREEN, set()))
+    return intent_scores, is_emergency
+
+
+def build_matcher(ai_service, phone_service):
+    return KeywordMatcher({
+        **ai_service.intents,
+        EMERGENCY_SCREEN: phone_service.routing_rules['emergency_keywords']
+    })
+
+
+def emergency_misses(keywords):
+    """Utterances the legacy substring loop flags as emergencies but the matcher does not."""
+    matcher = KeywordMatcher({EMERGENCY_SCREEN: keywords})
+    misses = []
+    for message in UTTERANCES + EMERGENCY_UTTERANCES:
+        legacy = any(keyword in message.lower() for keyword in keywords)
+        compiled = bool(matcher.match(message).get(EMERGENCY_SCREEN))
+        if legacy and not compiled:
+            misses.append(message)
+    return misses
+
+
+def intent_misses(ai_service):
+    """Utterances the legacy loops give an intent but the word index gives none."""
+    matcher = KeywordMatcher(ai_service.intents, scan_limit=0)
+    return [
+        message for message in UTTERANCES
+        if legacy_analyze(ai_service, PhoneService(), message)[0] and not matcher.match(message)
+    ]
+
+
+def grow_keyword_tables(ai_service, phone_service, extra_per_group):
+    """Pad every table with synthetic keywords to show how each approach scales."""
+    for intent, keywords in ai_service.intents.items():
+        keywords.extend(f'{intent} term {i}' if i % 3 == 0 else f'{intent}{i}' for i in range(extra_per_group))
+    ai_service.intent_keyword_counts = {intent: len(keywords) for intent, keywords in ai_service.intents.items()}
+    phone_service.routing_rules['emergency_keywords'].extend(f'emergency{i}' for i in range(extra_per_group))
+    phone_service.emergency_matcher = KeywordMatcher({
+        EMERGENCY_SCREEN: phone_service.routing_rules['emergency_keywords']
+    })
+
+
+def time_both(ai_service, phone_service, matcher, iterations):
+    def run_legacy():
+        for message in UTTERANCES:
+            legacy_analyze(ai_service, phone_service, message)
+
+    def run_compiled():
+        for message in UTTERANCES:
+            compiled_analyze(ai_service, phone_service, matcher, message)
+
+    number = iterations // len(UTTERANCES) or 1
+    legacy_seconds = min(timeit.repeat(run_legacy, number=number, repeat=5))
+    compiled_seconds = min(timeit.repeat(run_compiled, number=number, repeat=5))
+    calls = number * len(UTTERANCES)
+    return legacy_seconds / calls * 1e6, compiled_seconds / calls * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    ai_service = AIReceptionistService()
+    phone_service = PhoneService()
+    matcher = build_matcher(ai_service, phone_service)
+
+    keyword_count = sum(len(k) for k in ai_service.intents.values()) + len(phone_service.routing_rules['emergency_keywords'])
+    print(f"{'keywords':>9}  {'legacy us':>10}  {'compiled us':>12}  {'speedup':>8}")
+    legacy_us, compiled_us = time_both(ai_service, phone_service, matcher, iterations)
+    print(f"{keyword_count:>9}  {legacy_us:>10.2f}  {compiled_us:>12.2f}  {legacy_us / compiled_us:>7.2f}x"
+          f"  ({'substring scan' if matcher.scan else 'word index'})")
+
+    print("\nDifferences from the legacy loops:")
+    differences = 0
+    for message in UTTERANCES:
+        legacy = legacy_analyze(ai_service, phone_service, message)
+        compiled = compiled_analyze(ai_service, phone_service, matcher, message)
+        if legacy != compiled:
+            differences += 1
+            print(f"  {message!r}\n    legacy:   {legacy}\n    compiled: {compiled}")
+    if not differences:
+        print("  none")
+
+    print("\nEmergency screen misses vs legacy substring check:")
+    misses = emergency_misses(phone_service.routing_rules['emergency_keywords'])
+    for message in misses:
+        print(f"  {message!r}")
+    if not misses:
+        print("  none")
+
+    print("\nIntent misses vs legacy substring check (word index):")
+    missed_intents = intent_misses(ai_service)
+    for message in missed_intents:
+        print(f"  {message!r}")
+    if not missed_intents:
+        print("  none")
+
+    # Same utterances against larger tables (e.g. per-practice service catalogues)
+    print(f"\nScaled keyword tables:\n{'keywords':>9}  {'legacy us':>10}  {'compiled us':>12}  {'speedup':>8}")
+    for extra_per_group in (50, 200):
+        scaled_ai = AIReceptionistService()
+        scaled_phone = PhoneService()
+        grow_keyword_tables(scaled_ai, scaled_phone, extra_per_group)
+        scaled_matcher = build_matcher(scaled_ai, scaled_phone)
+        keyword_count = sum(len(k) for k in scaled_ai.intents.values()) + len(scaled_phone.routing_rules['emergency_keywords'])
+        legacy_us, compiled_us = time_both(scaled_ai, scaled_phone, scaled_matcher, iterations // 10)
+        print(f"{keyword_count:>9}  {legacy_us:>10.2f}  {compiled_us:>12.2f}  {legacy_us / compiled_us:>7.2f}x"
+              f"  ({'substring scan' if scaled_matcher.scan else 'word index'})")
+
+    if misses or missed_intents:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: memoized / template TwiML vs building and serializing a VoiceResponse
+tree on every webhook (TwilioIntegrationService response builders).
+
+Reports per-call time for each response variant and end-to-end time of the
+/api/twilio/outbound-twiml webhook through the Flask test client, and checks
+that both approaches produce byte-identical TwiML.
+
+Usage (from ai-receptionist/):
+    python benchmarks/twiml_benchmark.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark-no-network')
+os.environ.setdefault('CALL_SESSION_DB', '')
+
+import logging
+
+from flask import Flask
+
+from src.services.twilio_integration import TwilioIntegrationService
+
+logging.disable(logging.INFO)
+
+MESSAGES = [
+    "I'd be happy to help you schedule that. What day works best for you?",
+    "Our hours are Monday through Friday, 8 AM to 6 PM. Is there anything else?",
+    "Dr. Smith's consultation is $150 & includes labs <fasting required>.",
+]
+
+
+class LegacyTwilioIntegrationService(TwilioIntegrationService):
+    """Builds and serializes the VoiceResponse tree on every call, as before memoization."""
+
+    def create_incoming_call_response(self, caller_id: str = None) -> str:
+        return self._build_incoming_call_response()
+
+    def create_ai_response(self, ai_message: str, should_continue: bool = True) -> str:
+        return self._build_ai_response(ai_message, should_continue)
+
+    def create_transfer_response(self, transfer_type: str = 'reception') -> str:
+        return self._build_transfer_response(transfer_type)
+
+
+def variants():
+    message = MESSAGES[0]
+    return {
+        'incoming_call': lambda service: service.create_incoming_call_response('+14845550199'),
+        'ai_response (continue)': lambda service: service.create_ai_response(message, True),
+        'ai_response (end)': lambda service: service.create_ai_response(message, False),
+        'transfer (reception)': lambda service: service.create_transfer_response('reception'),
+        'transfer (emergency)': lambda service: service.create_transfer_response('emergency'),
+    }
+
+
+def per_call_us(func, iterations):
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def check_identical(legacy, cached):
+    mismatches = 0
+    for name, build in variants().items():
+        if build(legacy) != build(cached):
+            mismatches += 1
+            print(f"  MISMATCH: {name}")
+    for message in MESSAGES:
+        for should_continue in (True, False):
+            if legacy.create_ai_response(message, should_continue) != cached.create_ai_response(message, should_continue):
+                mismatches += 1
+                print(f"  MISMATCH: ai_response {message!r} continue={should_continue}")
+    print("  all responses identical" if not mismatches else f"  {mismatches} mismatches")
+
+
+def webhook_app():
+    from src.models.user import db
+    from src.routes import twilio_voice
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    app.register_blueprint(twilio_voice.twilio_voice_bp, url_prefix='/api/twilio')
+    return app, twilio_voice
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    legacy = LegacyTwilioIntegrationService()
+    cached = TwilioIntegrationService()
+
+    print("Output check:")
+    check_identical(legacy, cached)
+
+    print(f"\n{'response':<24}  {'tree us':>8}  {'cached us':>10}  {'speedup':>8}")
+    for name, build in variants().items():
+        legacy_us = per_call_us(lambda: build(legacy), iterations)
+        cached_us = per_call_us(lambda: build(cached), iterations)
+        print(f"{name:<24}  {legacy_us:>8.2f}  {cached_us:>10.2f}  {legacy_us / cached_us:>7.2f}x")
+
+    # End to end through Flask: request parsing, routing and the response object included
+    app, twilio_voice = webhook_app()
+    client = app.test_client()
+    url = '/api/twilio/outbound-twiml?message=' + MESSAGES[1].replace(' ', '+')
+
+    def request_once():
+        response = client.get(url)
+        assert response.status_code == 200
+
+    print(f"\n{'webhook':<24}  {'tree us':>8}  {'cached us':>10}  {'speedup':>8}")
+    twilio_voice.twilio_service = legacy
+    legacy_us = per_call_us(request_once, iterations // 5)
+    twilio_voice.twilio_service = cached
+    cached_us = per_call_us(request_once, iterations // 5)
+    print(f"{'outbound-twiml':<24}  {legacy_us:>8.2f}  {cached_us:>10.2f}  {legacy_us / cached_us:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
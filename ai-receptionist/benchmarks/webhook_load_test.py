@@ -0,0 +1,353 @@
+"""
+Load test: N concurrent synthetic phone conversations against the Twilio webhooks,
+with no real calls, OpenAI requests or CRM.
+
+- A local stub plays OpenAI (chat completions, with configurable latency, jitter
+  and error rate) and the CRM API (unknown callers, open schedule).
+- The app runs in a threaded HTTP server (or, with --asgi, as src/asgi.py under
+  uvicorn) on a throwaway database, queue and session store, with the post-call
+  worker draining summaries alongside.
+- Each conversation posts /api/twilio/incoming-call, a few /process-speech
+  turns and a final /call-status, as Twilio would.
+
+Reports latency percentiles and error rates per webhook (an error is a non-200,
+a connection failure or the apology TwiML the routes fall back to), plus SQLite
+write contention on the main database: time spent in write statements, slow
+writes and 'database is locked' errors.
+
+Usage (from ai-receptionist/):
+    python benchmarks/webhook_load_test.py [--conversations 100] [--concurrency 20]
+        [--turns 4] [--openai-latency-ms 300] [--openai-jitter-ms 200]
+        [--openai-error-rate 0.0] [--crm-latency-ms 20] [--no-worker] [--asgi]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+import requests
+
+UTTERANCES = [
+    "Hi, I'd like to schedule an appointment for hormone optimization next Tuesday morning",
+    "What are your hours and is there parking at the Hamilton Blvd location?",
+    "How much does the weight loss program cost and does insurance cover it?",
+    "Tell me about peptide therapy, what is the treatment like?",
+    "I'm not sure, I was just calling to ask a question",
+    "Can I reschedule my visit to a different time, maybe later in the afternoon?",
+    "my name is Jane Doe and my number is 484-555-0199",
+    "okay thank you",
+]
+
+# Apology TwiML the webhooks return when they catch an exception
+FALLBACK_PHRASES = ["experiencing technical difficulties", "didn't understand that clearly"]
+
+WRITE_STATEMENT = re.compile(r'^\s*(INSERT|UPDATE|DELETE)', re.IGNORECASE)
+
+SLOW_WRITE_MS = 100
+
+
+class FakeUpstream:
+    """OpenAI-compatible chat completions under /v1 and a minimal CRM API under /api"""
+
+    def __init__(self, openai_latency_ms, openai_jitter_ms, openai_error_rate, crm_latency_ms):
+        self.openai_latency_ms = openai_latency_ms
+        self.openai_jitter_ms = openai_jitter_ms
+        self.openai_error_rate = openai_error_rate
+        self.crm_latency_ms = crm_latency_ms
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._next_id = 1000
+
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                upstream.handle(self, 'GET')
+
+            def do_POST(self):
+                upstream.handle(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='fake-upstream', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def handle(self, handler, method):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length) or b'{}') if length else {}
+        path = urlparse(handler.path).path
+        with self._lock:
+            self.counts[f'{method} {path}'] += 1
+
+        if path.startswith('/v1/'):
+            status, payload = self.openai(path, body)
+        else:
+            status, payload = self.crm(method, path)
+
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def openai(self, path, body):
+        time.sleep((self.openai_latency_ms + random.uniform(0, self.openai_jitter_ms)) / 1000)
+        if path != '/v1/chat/completions':
+            return 404, {'error': {'message': f'{path} is not stubbed', 'type': 'invalid_request_error'}}
+        if random.random() < self.openai_error_rate:
+            return 500, {'error': {'message': 'Simulated upstream error', 'type': 'server_error'}}
+
+        system_prompt = body['messages'][0]['content'] if body.get('messages') else ''
+        if 'classify patient intents' in system_prompt:
+            content = 'general_info'
+        elif body.get('response_format', {}).get('type') == 'json_object':
+            call_ids = re.findall(r'^CALL (\d+)$', body['messages'][-1]['content'], re.MULTILINE)
+            content = json.dumps({call_id: 'Caller asked a general question; no follow-up needed.' for call_id in call_ids})
+        elif 'summar' in system_prompt.lower():
+            content = 'Caller asked a general question; no follow-up needed.'
+        else:
+            content = "Thanks for calling Lehigh Valley Wellness. I can help with that. Is there anything else?"
+
+        return 200, {
+            'id': f'chatcmpl-{random.getrandbits(48):x}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 100, 'completion_tokens': 20, 'total_tokens': 120}
+        }
+
+    def crm(self, method, path):
+        time.sleep(self.crm_latency_ms / 1000)
+        if path == '/api/patients/lookup':
+            return 404, {'success': False, 'error': 'Patient not found'}
+        if path == '/api/appointments':
+            return 200, {'success': True, 'appointments': []}
+        if path == '/api/dashboard/stats':
+            return 200, {'success': True}
+        if method == 'POST' and path in ('/api/patients', '/api/consultation-requests'):
+            with self._lock:
+                self._next_id += 1
+                record_id = self._next_id
+            key = 'patient' if path == '/api/patients' else 'consultation_request'
+            return 201, {'success': True, key: {'id': record_id}}
+        return 404, {'success': False, 'error': f'{method} {path} is not stubbed'}
+
+
+class DatabaseMonitor:
+    """Times write statements on the app's SQLAlchemy engines and counts lock errors"""
+
+    def __init__(self, *engines):
+        self.write_ms = []
+        self.lock_errors = 0
+        self._lock = threading.Lock()
+        for engine in engines:
+            self._watch(engine)
+
+    def _watch(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('load_test_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - conn.info['load_test_started'].pop()) * 1000
+            if WRITE_STATEMENT.match(statement):
+                with self._lock:
+                    self.write_ms.append(elapsed_ms)
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            if context.connection is not None and context.connection.info.get('load_test_started'):
+                context.connection.info['load_test_started'].pop()
+            if 'database is locked' in str(context.original_exception):
+                with self._lock:
+                    self.lock_errors += 1
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_conversation(base_url, index, turns, results):
+    session = requests.Session()
+    call_sid = f'CA{index:032x}'
+    caller = f'+1484555{random.randint(0, 9999):04d}'
+    started = time.time()
+
+    def post(endpoint, data):
+        began = time.perf_counter()
+        try:
+            response = session.post(f'{base_url}/api/twilio/{endpoint}', data={'CallSid': call_sid, 'From': caller, **data},
+                                    timeout=30)
+            body = response.text
+            failed = response.status_code != 200 or any(phrase in body for phrase in FALLBACK_PHRASES)
+        except requests.RequestException:
+            body, failed = '', True
+        results.record(endpoint, (time.perf_counter() - began) * 1000, failed)
+        return body
+
+    post('incoming-call', {'CallStatus': 'ringing'})
+    for turn in range(turns):
+        twiml = post('process-speech', {'SpeechResult': random.choice(UTTERANCES), 'Confidence': '0.92'})
+        # Transfers and goodbyes stop gathering speech, which ends the AI conversation
+        if '<Gather' not in twiml:
+            break
+    post('call-status', {'CallStatus': 'completed', 'CallDuration': str(int(time.time() - started) + 30)})
+
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed_ms, failed):
+        with self._lock:
+            self.latencies[endpoint].append(elapsed_ms)
+            if failed:
+                self.errors[endpoint] += 1
+
+
+def wait_for_post_call_jobs(queue, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        stats = queue.stats()
+        if not stats.get('pending') and not stats.get('running'):
+            return stats
+        time.sleep(0.5)
+    return queue.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Twilio webhooks against local fakes')
+    parser.add_argument('--conversations', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20, help='conversations in progress at once')
+    parser.add_argument('--turns', type=int, default=4, help='speech turns per conversation')
+    parser.add_argument('--openai-latency-ms', type=float, default=300)
+    parser.add_argument('--openai-jitter-ms', type=float, default=200)
+    parser.add_argument('--openai-error-rate', type=float, default=0.0, help='fraction of completions answered with HTTP 500')
+    parser.add_argument('--crm-latency-ms', type=float, default=20)
+    parser.add_argument('--no-worker', action='store_true', help="don't run the post-call worker during the test")
+    parser.add_argument('--asgi', action='store_true', help='serve src/asgi.py under uvicorn instead of the WSGI server')
+    parser.add_argument('--verbose', action='store_true', help='keep the app logs')
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(args.openai_latency_ms, args.openai_jitter_ms, args.openai_error_rate, args.crm_latency_ms)
+    upstream.start()
+
+    # Everything the app persists goes to a scratch directory
+    scratch = tempfile.mkdtemp(prefix='receptionist-load-')
+    os.environ.update({
+        'OPENAI_API_KEY': 'load-test',
+        'OPENAI_BASE_URL': f'{upstream.url}/v1',
+        'CRM_API_URL': f'{upstream.url}/api',
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'app.db')}",
+        'CALL_SESSION_DB': os.path.join(scratch, 'call_sessions.db'),
+        'POST_CALL_QUEUE_DB': os.path.join(scratch, 'post_call_jobs.db'),
+        'INTENT_CACHE_DB': '',
+        'TTS_PROVIDER': 'simulated',
+        'TTS_CACHE_DIR': os.path.join(scratch, 'tts_cache'),
+    })
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.user import db
+    from src.routes import twilio_voice
+    from src.services.post_call_worker import start_worker_thread
+
+    if args.asgi:
+        import uvicorn
+        from src import asgi
+        from src.routes import async_voice
+
+        with app.app_context():
+            monitor = DatabaseMonitor(db.engine, async_voice.async_db.engine.sync_engine)
+        server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=0, log_level='warning'))
+        threading.Thread(target=server.run, name='receptionist', daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        base_url = f'http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}'
+    else:
+        with app.app_context():
+            monitor = DatabaseMonitor(db.engine)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='receptionist', daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+    if not args.no_worker:
+        start_worker_thread(app, twilio_voice.post_call_queue)
+
+    print(f"{args.conversations} conversations, {args.concurrency} concurrent, up to {args.turns} turns each; "
+          f"OpenAI {args.openai_latency_ms:.0f}+{args.openai_jitter_ms:.0f}ms, error rate {args.openai_error_rate:.0%}")
+    print(f"scratch data in {scratch}\n")
+
+    results = Results()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(run_conversation, base_url, index, args.turns, results)
+                       for index in range(args.conversations)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    total_requests = sum(len(latencies) for latencies in results.latencies.values())
+    print(f"{'webhook':<16}  {'requests':>8}  {'errors':>7}  {'p50 ms':>8}  {'p90 ms':>8}  {'p99 ms':>8}  {'max ms':>8}")
+    for endpoint in ('incoming-call', 'process-speech', 'call-status'):
+        latencies = results.latencies[endpoint]
+        error_rate = results.errors[endpoint] / len(latencies) if latencies else 0.0
+        print(f"{endpoint:<16}  {len(latencies):>8}  {error_rate:>7.1%}  {percentile(latencies, 0.5):>8.1f}  "
+              f"{percentile(latencies, 0.9):>8.1f}  {percentile(latencies, 0.99):>8.1f}  "
+              f"{max(latencies, default=0):>8.1f}")
+    print(f"\n{total_requests} requests in {elapsed:.1f}s ({total_requests / elapsed:.1f} req/s)")
+
+    if not args.no_worker:
+        print(f"post-call queue after draining: {wait_for_post_call_jobs(twilio_voice.post_call_queue, 60)}")
+
+    writes = monitor.write_ms
+    slow_writes = sum(1 for write_ms in writes if write_ms > SLOW_WRITE_MS)
+    print(f"\nmain database: {len(writes)} write statements, p50 {percentile(writes, 0.5):.2f}ms, "
+          f"p99 {percentile(writes, 0.99):.2f}ms, max {max(writes, default=0):.1f}ms; "
+          f"{slow_writes} slower than {SLOW_WRITE_MS}ms (waiting on the write lock), "
+          f"{monitor.lock_errors} 'database is locked' errors")
+    print(f"upstream requests: {dict(upstream.counts)}")
+
+    if args.asgi:
+        server.should_exit = True
+    else:
+        server.shutdown()
+    upstream.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Call patients to confirm their upcoming appointments.
+
+Creates a campaign from the CRM's scheduled appointments in a date range
+(default: tomorrow) and places the calls with bounded concurrency and
+calls-per-second pacing. Call status arrives through the /api/twilio/call-status
+callback, so the web app must be reachable at BASE_URL while this runs.
+
+If the runner stops or crashes, start it again with --resume to finish the
+campaign without calling anyone twice.
+
+Usage (from ai-receptionist/):
+    python scripts/confirmation_campaign.py [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+        [--concurrency 5] [--calls-per-second 1]
+    python scripts/confirmation_campaign.py --resume CAMPAIGN_ID
+    python scripts/confirmation_campaign.py --status CAMPAIGN_ID
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+from src.models.user import db
+from src.models.campaign import ConfirmationCampaign
+from src.services.crm_integration import CRMIntegrationService
+from src.services.twilio_integration import TwilioIntegrationService
+from src.services.confirmation_campaign import ConfirmationCampaignRunner
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main():
+    tomorrow = date.today() + timedelta(days=1)
+    parser = argparse.ArgumentParser(description='Run an appointment confirmation call campaign')
+    parser.add_argument('--start', type=parse_date, default=tomorrow, help='first appointment date (default tomorrow)')
+    parser.add_argument('--end', type=parse_date, help='last appointment date (default --start)')
+    parser.add_argument('--resume', type=int, metavar='CAMPAIGN_ID', help='continue an unfinished campaign')
+    parser.add_argument('--status', type=int, metavar='CAMPAIGN_ID', help='print campaign progress and exit')
+    parser.add_argument('--concurrency', type=int, help='calls in progress at once (default CAMPAIGN_CONCURRENCY)')
+    parser.add_argument('--calls-per-second', type=float, help='call request rate (default CAMPAIGN_CALLS_PER_SECOND)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.status:
+            campaign = db.session.get(ConfirmationCampaign, args.status)
+            print(json.dumps(campaign.to_dict() if campaign else {'error': 'Campaign not found'}, indent=2))
+            return
+
+        runner = ConfirmationCampaignRunner.from_env(TwilioIntegrationService(), CRMIntegrationService())
+        if args.concurrency:
+            runner.max_concurrency = args.concurrency
+        if args.calls_per_second:
+            runner.calls_per_second = args.calls_per_second
+
+        campaign_id = args.resume or runner.create_campaign(args.start, args.end or args.start).id
+        print(f"Running campaign {campaign_id}")
+
+        stop_event = threading.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *_: stop_event.set())
+        print(json.dumps(runner.run(campaign_id, stop_event), indent=2))
+
+if __name__ == '__main__':
+    main()
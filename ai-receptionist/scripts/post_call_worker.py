@@ -0,0 +1,55 @@
+"""
+Process post-call jobs: conversation summaries and CRM call logs queued by
+the Twilio status webhook.
+
+Run one or more of these next to the web workers; they share the SQLite queue
+at POST_CALL_QUEUE_DB (default src/database/post_call_jobs.db).
+
+Usage (from ai-receptionist/):
+    python scripts/post_call_worker.py [--poll-interval 1.0] [--once] [--stats]
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+from src.services.ai_service import AIReceptionistService
+from src.services.crm_integration import CRMIntegrationService
+from src.services.post_call_queue import PostCallQueue
+from src.services.post_call_worker import PostCallWorker
+
+def main():
+    parser = argparse.ArgumentParser(description='Process queued post-call jobs')
+    parser.add_argument('--poll-interval', type=float, default=float(os.getenv('POST_CALL_POLL_SECONDS', '1')))
+    parser.add_argument('--once', action='store_true', help='drain the jobs that are due now, then exit')
+    parser.add_argument('--stats', action='store_true', help='print queue counts and exit')
+    args = parser.parse_args()
+
+    queue = PostCallQueue.from_env()
+    if args.stats:
+        print(json.dumps(queue.stats(), indent=2))
+        return
+
+    worker = PostCallWorker(queue, AIReceptionistService(), CRMIntegrationService())
+
+    with app.app_context():
+        if args.once:
+            processed = 0
+            while worker.run_once():
+                processed += 1
+            print(f"Processed {processed} jobs")
+            return
+
+        stop_event = threading.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *_: stop_event.set())
+        worker.run_forever(args.poll_interval, stop_event)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Summarize ended calls that don't have a summary yet, several calls per LLM
+request with a bounded number of requests in flight.
+
+Run it from cron (or with --loop) to catch up after call spikes, e.g. the
+morning after an after-hours surge, without holding up the webhooks.
+
+Usage (from ai-receptionist/):
+    python scripts/summarize_calls.py [--limit 500] [--since-hours 168]
+        [--concurrency 4] [--batch-tokens 6000] [--loop SECONDS]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+from src.services.ai_service import AIReceptionistService
+from src.services.batch_summarizer import BatchSummarizer
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize ended calls in batches')
+    parser.add_argument('--limit', type=int, default=500, help='most calls to summarize per run')
+    parser.add_argument('--since-hours', type=float, default=168, help='only calls that ended within this window')
+    parser.add_argument('--concurrency', type=int, help='LLM requests in flight (default BATCH_SUMMARY_CONCURRENCY)')
+    parser.add_argument('--batch-tokens', type=int, help='prompt token budget per request (default BATCH_SUMMARY_TOKENS)')
+    parser.add_argument('--loop', type=float, metavar='SECONDS', help='keep running, pausing between sweeps')
+    args = parser.parse_args()
+
+    summarizer = BatchSummarizer.from_env(AIReceptionistService())
+    if args.concurrency:
+        summarizer.max_concurrency = args.concurrency
+    if args.batch_tokens:
+        summarizer.batch_tokens = args.batch_tokens
+
+    with app.app_context():
+        while True:
+            result = summarizer.run(args.limit, datetime.utcnow() - timedelta(hours=args.since_hours))
+            print(json.dumps(result))
+            # A full run that made progress means more calls are waiting; go again straight away
+            if result['calls'] >= args.limit and result['summarized']:
+                continue
+            if args.loop is None:
+                break
+            time.sleep(args.loop)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Train the local intent classifier from labeled patient turns.
+
+Patient turns in conversation_turns carry the intent the receptionist settled
+on (keyword match or LLM). Low-confidence fallbacks are skipped. The model is
+written to INTENT_MODEL_PATH (default src/database/intent_model.json) together
+with an accuracy / latency report on a held-out split.
+
+Usage (from ai-receptionist/):
+    python scripts/train_intent_classifier.py [--min-confidence 0.5] [--limit 50000]
+        [--holdout 0.2] [--epochs 30] [--threshold 0.7] [--output path]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'training-no-network')
+
+from src.main import app
+from src.models.call import ConversationTurn
+from src.services.ai_service import AIReceptionistService
+from src.services.intent_classifier import IntentClassifier
+
+def load_examples(min_confidence, limit):
+    known_intents = set(AIReceptionistService().intents)
+    turns = ConversationTurn.query.filter(
+        ConversationTurn.speaker == 'patient',
+        ConversationTurn.intent.in_(known_intents),
+        ConversationTurn.confidence_score >= min_confidence
+    ).order_by(ConversationTurn.id.desc()).limit(limit).all()
+    return [turn.message for turn in turns], [turn.intent for turn in turns]
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the local intent classifier')
+    parser.add_argument('--min-confidence', type=float, default=0.5)
+    parser.add_argument('--limit', type=int, default=50000)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.getenv('INTENT_CLASSIFIER_THRESHOLD', '0.7')))
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    with app.app_context():
+        messages, labels = load_examples(args.min_confidence, args.limit)
+
+    if len(set(labels)) < 2 or len(messages) < 20:
+        print(f"Not enough labeled patient turns to train ({len(messages)} turns, {len(set(labels))} intents)")
+        return 1
+
+    examples = list(zip(messages, labels))
+    random.Random(13).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout))
+    train, test = examples[:split], examples[split:]
+
+    started = time.perf_counter()
+    model = IntentClassifier.train([m for m, _ in train], [l for _, l in train], epochs=args.epochs)
+    training_seconds = time.perf_counter() - started
+
+    report = model.evaluate([m for m, _ in test], [l for _, l in test], args.threshold)
+    report['training_examples'] = len(train)
+    report['training_seconds'] = round(training_seconds, 2)
+    model.report = report
+    model.save(args.output)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+ASGI entry point for high-concurrency deployments:
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+
+The conversational webhooks (incoming-call and process-speech under
+/api/voice and /api/twilio) are served as async views from
+src/routes/async_voice.py, so a call waiting on OpenAI, the CRM or the
+database holds no thread and one process can carry hundreds of concurrent
+calls. Every other route (call status, end-call, dashboards, static files)
+is passed to the Flask app through a WSGI bridge on a small thread pool.
+`python src/main.py` still runs the all-Flask server.
+"""
+
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import contextlib
+import logging
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from src.main import app as flask_app
+from src.routes import async_voice
+from src.routes import voice as voice_routes
+from src.routes import twilio_voice as twilio_routes
+
+logger = logging.getLogger(__name__)
+
+async_voice.async_db.init_app(flask_app)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    voice_routes.start_tts_prewarm()
+    yield
+    await voice_routes.crm_service.http.aclose()
+    await twilio_routes.crm_service.http.aclose()
+    await async_voice.async_db.dispose()
+
+app = Starlette(
+    routes=[
+        *async_voice.routes,
+        # Threads for the Flask routes only; async views don't use them
+        Mount('/', app=WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_WSGI_THREADS', '10'))))
+    ],
+    lifespan=lifespan
+)
@@ -7,6 +7,7 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
 from src.models.call import Call, ConversationTurn, CallAnalytics
+from src.models.campaign import ConfirmationCampaign, CampaignCall
 from src.routes.user import user_bp
 from src.routes.voice import voice_bp
 from src.routes.twilio_voice import twilio_voice_bp
@@ -23,10 +24,12 @@ app.register_blueprint(voice_bp, url_prefix='/api/voice')
 app.register_blueprint(twilio_voice_bp, url_prefix='/api/twilio')
 
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
+    # Creates missing tables only; columns and indexes added to existing tables
+    # come from scripts/migrate_schema.py, run once per deploy
     db.create_all()
 
 @app.route('/', defaults={'path': ''})
@@ -47,4 +50,9 @@ def serve(path):
 
 
 if __name__ == '__main__':
+    # The development server drains post-call jobs itself; in production run scripts/post_call_worker.py
+    from src.services.post_call_worker import start_worker_thread
+    start_worker_thread(app)
+    from src.routes.voice import start_tts_prewarm
+    start_tts_prewarm()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,13 +1,12 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.models.user import db
 from datetime import datetime
 import json
 
-db = SQLAlchemy()
-
 class Call(db.Model):
     __tablename__ = 'calls'
     
     id = db.Column(db.Integer, primary_key=True)
+    external_call_id = db.Column(db.String(64), index=True)  # telephony provider ID, e.g. Twilio CallSid
     phone_number = db.Column(db.String(20), nullable=False)
     caller_name = db.Column(db.String(100))
     call_type = db.Column(db.String(20), nullable=False)  # inbound, outbound
@@ -19,6 +18,8 @@ class Call(db.Model):
     # AI Conversation Data
     conversation_transcript = db.Column(db.Text)
     conversation_summary = db.Column(db.Text)
+    summarized_at = db.Column(db.DateTime, index=True)  # set once conversation_summary holds the post-call summary
+    summary_claimed_at = db.Column(db.DateTime)  # set while a worker or batch run is summarizing the call
     intent_detected = db.Column(db.String(100))
     entities_extracted = db.Column(db.Text)  # JSON string
     
@@ -42,6 +43,7 @@ class Call(db.Model):
     def to_dict(self):
         return {
             'id': self.id,
+            'external_call_id': self.external_call_id,
             'phone_number': self.phone_number,
             'caller_name': self.caller_name,
             'call_type': self.call_type,
@@ -79,13 +81,14 @@ class ConversationTurn(db.Model):
     turn_number = db.Column(db.Integer, nullable=False)
     speaker = db.Column(db.String(10), nullable=False)  # 'patient' or 'ai'
     message = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # AI Processing Data
     intent = db.Column(db.String(100))
     entities = db.Column(db.Text)  # JSON string
     confidence_score = db.Column(db.Float)
     processing_time = db.Column(db.Float)  # in milliseconds
+    stage_timings = db.Column(db.Text)  # JSON string: per-stage ms and LLM tokens (TurnTimer.to_dict)
     
     call = db.relationship('Call', backref=db.backref('conversation_turns', lazy=True))
     
@@ -102,6 +105,16 @@ class ConversationTurn(db.Model):
             'confidence_score': self.confidence_score,
             'processing_time': self.processing_time
         }
+    
+    def set_stage_timings(self, timings_dict):
+        """Store the turn's stage timings as JSON string"""
+        self.stage_timings = json.dumps(timings_dict)
+    
+    def get_stage_timings(self):
+        """Retrieve the turn's stage timings as dictionary"""
+        if self.stage_timings:
+            return json.loads(self.stage_timings)
+        return {}
 
 class CallAnalytics(db.Model):
     __tablename__ = 'call_analytics'
@@ -120,6 +133,7 @@ class CallAnalytics(db.Model):
     ai_handled_calls = db.Column(db.Integer, default=0)
     human_transfer_calls = db.Column(db.Integer, default=0)
     average_ai_confidence = db.Column(db.Float, default=0.0)
+    ai_confidence_samples = db.Column(db.Integer, default=0)  # calls averaged into average_ai_confidence
     average_call_duration = db.Column(db.Float, default=0.0)
     
     # Appointment Metrics
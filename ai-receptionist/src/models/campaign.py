@@ -0,0 +1,79 @@
+from src.models.user import db
+from datetime import datetime
+
+class ConfirmationCampaign(db.Model):
+    __tablename__ = 'confirmation_campaigns'
+
+    id = db.Column(db.Integer, primary_key=True)
+    start_date = db.Column(db.Date, nullable=False)  # appointment date range, inclusive
+    end_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, running, completed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+
+    calls = db.relationship('CampaignCall', backref='campaign', lazy='dynamic')
+
+    def to_dict(self):
+        counts = dict(
+            db.session.query(CampaignCall.status, db.func.count(CampaignCall.id))
+            .filter_by(campaign_id=self.id).group_by(CampaignCall.status).all()
+        )
+        return {
+            'id': self.id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'status': self.status,
+            'total_calls': sum(counts.values()),
+            'calls_by_status': counts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class CampaignCall(db.Model):
+    __tablename__ = 'campaign_calls'
+
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('confirmation_campaigns.id'), nullable=False)
+    appointment_id = db.Column(db.Integer, nullable=False)  # CRM appointment ID
+    patient_name = db.Column(db.String(100))
+    phone_number = db.Column(db.String(20))
+    appointment_date = db.Column(db.String(10))
+    appointment_time = db.Column(db.String(8))
+    service_type = db.Column(db.String(100))
+
+    # pending -> dialing -> queued/initiated/ringing/in-progress -> completed, busy, no-answer,
+    # failed, canceled; or error (call could not be placed) / skipped (nothing to dial)
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    call_sid = db.Column(db.String(64), index=True)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(500))
+    dialing_at = db.Column(db.DateTime)
+    ended_at = db.Column(db.DateTime)
+    call_duration = db.Column(db.Integer)  # in seconds
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('campaign_id', 'appointment_id', name='uq_campaign_calls_appointment'),
+        db.Index('ix_campaign_calls_campaign_status', 'campaign_id', 'status'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'campaign_id': self.campaign_id,
+            'appointment_id': self.appointment_id,
+            'patient_name': self.patient_name,
+            'phone_number': self.phone_number,
+            'appointment_date': self.appointment_date,
+            'appointment_time': self.appointment_time,
+            'service_type': self.service_type,
+            'status': self.status,
+            'call_sid': self.call_sid,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'call_duration': self.call_duration,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None
+        }
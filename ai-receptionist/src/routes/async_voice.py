@@ -0,0 +1,506 @@
+"""
+Async versions of the conversational voice webhooks, served by the ASGI app
+(src/asgi.py) in place of the Flask views with the same paths:
+
+    /api/voice/incoming-call, /api/voice/process-speech,
+    /api/twilio/incoming-call, /api/twilio/process-speech
+
+They behave like the views in voice.py and twilio_voice.py and share their
+services and turn bookkeeping (src/services/call_turns.py), but await OpenAI,
+the CRM and the database, so a call waiting on any of them holds no thread.
+Short blocking work (session store, TTS cache, speech-to-text) runs in the
+loop's thread pool.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from sqlalchemy import select
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.routes import voice as voice_routes
+from src.routes import twilio_voice as twilio_routes
+from src.services.async_db import AsyncDatabase
+from src.services.call_rollups import CallAnalyticsRollup
+from src.services.call_turns import (
+    apply_appointment_result, build_speech_turns, finish_speech_turns, mark_transferred, new_call_session,
+    recent_turns_query, schedule_consultation_async, turn_count_query, update_call_for_turn
+)
+from src.services.keyword_matcher import EMERGENCY_SCREEN
+from src.services.turn_timing import TurnTimer
+from src.models.call import Call, ConversationTurn
+
+logger = logging.getLogger(__name__)
+
+# Initialized by src/asgi.py with the Flask app's database
+async_db = AsyncDatabase()
+call_rollups = CallAnalyticsRollup()
+
+async def voice_incoming_call(request):
+    """
+    Handle incoming phone calls and initiate AI conversation (async /api/voice/incoming-call).
+    """
+    phone_service, crm_service = voice_routes.phone_service, voice_routes.crm_service
+    try:
+        call_data, form = await read_body(request)
+        caller_number = call_data.get('From', form.get('From', 'Unknown'))
+        call_sid = call_data.get('CallSid', form.get('CallSid', f'call_{datetime.now().strftime("%Y%m%d_%H%M%S")}'))
+
+        logger.info(f"Incoming call from {caller_number}, CallSid: {call_sid}")
+
+        call_response = phone_service.handle_incoming_call({
+            'from': caller_number,
+            'call_id': call_sid
+        })
+
+        async with async_db.session() as session:
+            call_record = Call(
+                phone_number=caller_number,
+                call_type='inbound',
+                call_status='answered',
+                call_start_time=datetime.utcnow(),
+                conversation_summary='Call initiated',
+                intent_detected='initial_greeting'
+            )
+            session.add(call_record)
+            await session.execute(call_rollups.call_started_upsert(call_record, async_db.dialect))
+            await session.commit()
+
+            patient_data = await crm_service.find_patient_by_phone_async(caller_number)
+            if patient_data:
+                call_record.patient_id = patient_data['id']
+                call_record.caller_name = f"{patient_data['first_name']} {patient_data['last_name']}"
+                await session.commit()
+
+            greeting = call_response.get('greeting_message', 'Thank you for calling Lehigh Valley Wellness.')
+            tts_result = await asyncio.to_thread(phone_service.convert_text_to_speech, greeting, call_sid)
+
+            session.add(ConversationTurn(
+                call_id=call_record.id,
+                turn_number=1,
+                speaker='ai',
+                message=greeting,
+                intent='greeting',
+                confidence_score=1.0
+            ))
+            await session.commit()
+
+        return JSONResponse({
+            'call_id': call_sid,
+            'status': 'answered',
+            'greeting': greeting,
+            'audio_url': tts_result.get('audio_url'),
+            'next_action': 'listen_for_speech'
+        })
+
+    except Exception as e:
+        logger.error(f"Error handling incoming call: {e}")
+        return JSONResponse({
+            'error': str(e),
+            'status': 'error',
+            'message': 'Failed to handle incoming call'
+        }, status_code=500)
+
+async def voice_process_speech(request):
+    """
+    Process speech input from caller and generate AI response (async /api/voice/process-speech).
+    """
+    phone_service = voice_routes.phone_service
+    try:
+        timer = TurnTimer()
+        data, _ = await read_body(request)
+        call_id = data.get('call_id')
+        speech_text = data.get('speech_text', '')
+        audio_data = data.get('audio_data')
+
+        if not call_id:
+            return JSONResponse({'error': 'Missing call_id'}, status_code=400)
+
+        logger.info(f"Processing speech for call {call_id}: {speech_text[:50]}...")
+
+        async with async_db.session() as session:
+            call_record = await session.scalar(select(Call).where(Call.id == call_id).limit(1))
+            if not call_record:
+                return JSONResponse({'error': 'Call not found'}, status_code=404)
+
+            if audio_data and not speech_text:
+                with timer.stage('stt'):
+                    stt_result = await asyncio.to_thread(phone_service.convert_speech_to_text, audio_data, call_id)
+                if stt_result['success']:
+                    speech_text = stt_result['transcript']
+                else:
+                    return JSONResponse({
+                        'error': 'Speech recognition failed',
+                        'details': stt_result.get('error')
+                    }, status_code=500)
+
+            if not speech_text:
+                return JSONResponse({'error': 'No speech text provided'}, status_code=400)
+
+            with timer.stage('emergency'):
+                keyword_matches = voice_routes.keyword_matcher.match(speech_text)
+                is_emergency, emergency_reason = phone_service.detect_emergency_in_speech(
+                    speech_text, keyword_matches.get(EMERGENCY_SCREEN, set())
+                )
+            if is_emergency:
+                logger.warning(f"Emergency detected in call {call_id}: {emergency_reason}")
+                phone_service.transfer_call(call_id, 'emergency', emergency_reason)
+
+                call_record.intent_detected = 'emergency'
+                rollup = mark_transferred(call_record, emergency_reason, async_db.dialect)
+                if rollup is not None:
+                    await session.execute(rollup)
+                await session.commit()
+
+                return JSONResponse({
+                    'call_id': call_id,
+                    'action': 'transfer',
+                    'transfer_type': 'emergency',
+                    'reason': emergency_reason,
+                    'message': 'Transferring to emergency services'
+                })
+
+            # End the read transaction so the connection goes back to the pool
+            # while the turn waits on OpenAI and the CRM
+            await session.commit()
+
+            stream = bool(data.get('stream'))
+            call_record_id = call_record.id
+            call_metadata = {'phone_number': call_record.phone_number, 'caller_name': call_record.caller_name}
+
+            with timer.stage('history'):
+                call_session = await load_call_session(voice_routes.call_sessions, call_record_id, call_metadata)
+            history_list, turn_count = call_session['turns'], call_session['turn_count']
+
+            caller_name, phone_number = call_record.caller_name, call_record.phone_number
+
+            async def schedule_appointment(entities):
+                return await schedule_consultation_async(voice_routes.crm_service, caller_name, phone_number,
+                                                         entities, speech_text, check_availability=True)
+
+            turn = await voice_routes.turn_pipeline.run_turn_async(
+                speech_text,
+                keyword_matches,
+                history_list,
+                schedule_appointment=None if stream else schedule_appointment,
+                generate_response=not stream
+            )
+            timer.add_pipeline(turn)
+            intent, confidence, entities = turn['intent'], turn['confidence'], turn['entities']
+
+            should_transfer, transfer_reason = voice_routes.ai_service.should_transfer_to_human(
+                intent, confidence, turn_count
+            )
+
+            response_data = {
+                'call_id': call_id,
+                'intent': intent,
+                'confidence': confidence,
+                'entities': entities,
+                'should_transfer': should_transfer,
+                'transfer_reason': transfer_reason
+            }
+
+            if stream:
+                return StreamingResponse(
+                    stream_speech_response(
+                        call_record, speech_text, intent, confidence, entities,
+                        history_list, turn_count, should_transfer, transfer_reason, response_data, timer
+                    ),
+                    media_type='application/x-ndjson'
+                )
+
+            ai_response = turn['ai_response']
+            response_data['ai_response'] = ai_response
+
+            if turn['appointment_result'] is not None:
+                # Committed with the turn below
+                apply_appointment_result(call_record, turn['appointment_result'])
+                response_data['appointment_result'] = turn['appointment_result']
+
+            with timer.stage('tts'):
+                tts_result = await asyncio.to_thread(phone_service.convert_text_to_speech, ai_response, call_id)
+            response_data['audio_url'] = tts_result.get('audio_url')
+
+            await record_speech_turn(session, voice_routes.call_sessions, call_record, speech_text, intent,
+                                     confidence, entities, turn_count, ai_response, should_transfer,
+                                     transfer_reason, timer)
+
+        return JSONResponse(response_data)
+
+    except Exception as e:
+        logger.error(f"Error processing speech: {e}")
+        return JSONResponse({
+            'error': str(e),
+            'message': 'Failed to process speech'
+        }, status_code=500)
+
+async def twilio_incoming_call(request):
+    """
+    Handle incoming calls from Twilio webhook (async /api/twilio/incoming-call).
+    """
+    twilio_service = twilio_routes.twilio_service
+    try:
+        _, form = await read_body(request)
+        caller_number = form.get('From', 'Unknown')
+        call_sid = form.get('CallSid', f'call_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
+        logger.info(f"Twilio incoming call: {call_sid} from {caller_number}")
+
+        if not twilio_service.validate_webhook(form):
+            logger.warning(f"Invalid webhook request for call {call_sid}")
+            return PlainTextResponse('Unauthorized', status_code=401)
+
+        async with async_db.session() as session:
+            call_record = Call(
+                phone_number=caller_number,
+                call_type='inbound',
+                call_status='answered',
+                call_start_time=datetime.utcnow(),
+                conversation_summary='Incoming call initiated',
+                intent_detected='initial_greeting',
+                external_call_id=call_sid
+            )
+            session.add(call_record)
+            await session.execute(call_rollups.call_started_upsert(call_record, async_db.dialect))
+            await session.commit()
+
+            patient_data = await twilio_routes.crm_service.find_patient_by_phone_async(caller_number)
+            if patient_data:
+                call_record.patient_id = patient_data['id']
+                call_record.caller_name = f"{patient_data['first_name']} {patient_data['last_name']}"
+                await session.commit()
+                logger.info(f"Found existing patient: {call_record.caller_name}")
+
+            twiml_response = twilio_service.create_incoming_call_response(caller_number)
+
+            session.add(ConversationTurn(
+                call_id=call_record.id,
+                turn_number=1,
+                speaker='ai',
+                message='Initial greeting and emergency notice',
+                intent='greeting',
+                confidence_score=1.0
+            ))
+            await session.commit()
+
+        logger.info(f"Generated TwiML response for call {call_sid}")
+        return Response(twiml_response, media_type='text/xml')
+
+    except Exception as e:
+        logger.error(f"Error handling Twilio incoming call: {e}")
+        fallback_response = twilio_service.create_ai_response(
+            "I apologize, but I'm experiencing technical difficulties. Please call back in a few minutes.",
+            should_continue=False
+        )
+        return Response(fallback_response, media_type='text/xml')
+
+async def twilio_process_speech(request):
+    """
+    Process speech input from Twilio and generate AI response (async /api/twilio/process-speech).
+    """
+    twilio_service = twilio_routes.twilio_service
+    try:
+        timer = TurnTimer()
+        _, form = await read_body(request)
+        call_sid = form.get('CallSid')
+        speech_result = form.get('SpeechResult', '')
+        confidence = float(form.get('Confidence', 0.0))
+
+        logger.info(f"Processing speech for call {call_sid}: {speech_result[:50]}...")
+
+        if not call_sid:
+            logger.error("Missing CallSid in speech processing request")
+            return PlainTextResponse('Bad Request', status_code=400)
+
+        async with async_db.session() as session:
+            call_record = await session.scalar(select(Call).where(Call.external_call_id == call_sid).limit(1))
+            if not call_record:
+                logger.error(f"Call record not found for CallSid: {call_sid}")
+                call_record = Call(
+                    phone_number=form.get('From', 'Unknown'),
+                    call_type='inbound',
+                    call_status='in_progress',
+                    call_start_time=datetime.utcnow(),
+                    external_call_id=call_sid
+                )
+                session.add(call_record)
+                await session.execute(call_rollups.call_started_upsert(call_record, async_db.dialect))
+                await session.commit()
+
+            with timer.stage('emergency'):
+                keyword_matches = twilio_routes.keyword_matcher.match(speech_result)
+                is_emergency = bool(keyword_matches.get(EMERGENCY_SCREEN))
+
+            if is_emergency:
+                logger.warning(f"Emergency detected in call {call_sid}: {speech_result}")
+
+                call_record.intent_detected = 'emergency'
+                rollup = mark_transferred(call_record, 'Emergency situation detected', async_db.dialect)
+                if rollup is not None:
+                    await session.execute(rollup)
+                await session.commit()
+
+                return Response(twilio_service.create_transfer_response('emergency'), media_type='text/xml')
+
+            await session.commit()
+
+            call_record_id = call_record.id
+            call_metadata = {'phone_number': call_record.phone_number, 'external_call_id': call_sid}
+
+            with timer.stage('history'):
+                call_session = await load_call_session(twilio_routes.call_sessions, call_record_id, call_metadata)
+            turn_count = call_session['turn_count']
+
+            caller_name, phone_number = call_record.caller_name, call_record.phone_number
+
+            async def schedule_appointment(entities):
+                return await schedule_consultation_async(twilio_routes.crm_service, caller_name, phone_number,
+                                                         entities, speech_result)
+
+            turn = await twilio_routes.turn_pipeline.run_turn_async(
+                speech_result,
+                keyword_matches,
+                call_session['turns'],
+                schedule_appointment=schedule_appointment
+            )
+            timer.add_pipeline(turn)
+            intent, ai_confidence, entities = turn['intent'], turn['confidence'], turn['entities']
+            ai_response = turn['ai_response']
+            appointment_result = turn['appointment_result']
+            apply_appointment_result(call_record, appointment_result)
+
+            should_transfer, transfer_reason = twilio_routes.ai_service.should_transfer_to_human(
+                intent, ai_confidence, turn_count
+            )
+
+            await record_speech_turn(session, twilio_routes.call_sessions, call_record, speech_result, intent,
+                                     ai_confidence, entities, turn_count, ai_response, should_transfer,
+                                     transfer_reason, timer, speech_confidence=confidence)
+
+        if appointment_result and appointment_result['success']:
+            ai_response += " I've created your consultation request and you'll receive a confirmation call within 24 hours."
+
+        if should_transfer:
+            return Response(twilio_service.create_transfer_response('reception'), media_type='text/xml')
+
+        should_continue = intent not in ['goodbye', 'end_call']
+        return Response(twilio_service.create_ai_response(ai_response, should_continue), media_type='text/xml')
+
+    except Exception as e:
+        logger.error(f"Error processing Twilio speech: {e}")
+        fallback_response = twilio_service.create_ai_response(
+            "I apologize, but I didn't understand that clearly. Could you please repeat your request?",
+            should_continue=True
+        )
+        return Response(fallback_response, media_type='text/xml')
+
+async def read_body(request):
+    """(JSON body, form fields) of a webhook request; whichever wasn't sent is empty"""
+    body = await request.body()
+    content_type = request.headers.get('content-type', '')
+    if 'application/json' in content_type:
+        data = json.loads(body) if body else {}
+        return (data if isinstance(data, dict) else {}), {}
+    if 'application/x-www-form-urlencoded' in content_type:
+        return {}, dict(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+    return {}, {}
+
+async def load_call_session(call_sessions, call_id: int, metadata: dict) -> dict:
+    """call_turns.load_call_session on the async database"""
+    session_data = await asyncio.to_thread(call_sessions.get, call_id)
+    if session_data is None:
+        async with async_db.session() as session:
+            recent_turns = (await session.scalars(recent_turns_query(call_id, call_sessions.max_turns))).all()
+            session_data = new_call_session(recent_turns, await session.scalar(turn_count_query(call_id)), metadata)
+        await asyncio.to_thread(call_sessions.put, call_id, session_data['turns'], session_data['turn_count'],
+                                metadata)
+    return session_data
+
+async def record_speech_turn(session, call_sessions, call_record: Call, speech_text: str, intent: str,
+                             confidence: float, entities: dict, previous_turns: int, ai_response: str,
+                             should_transfer: bool, transfer_reason: str, timer: TurnTimer,
+                             speech_confidence: float = None):
+    """call_turns.record_speech_turn in the view's AsyncSession"""
+    db_started = time.perf_counter()
+
+    patient_turn, ai_turn = build_speech_turns(call_record, previous_turns, speech_text, intent, confidence,
+                                               entities, ai_response, speech_confidence)
+    session.add_all([patient_turn, ai_turn])
+    await session.flush()
+
+    rollup = update_call_for_turn(call_record, intent, confidence, entities, should_transfer, transfer_reason,
+                                  async_db.dialect)
+    if rollup is not None:
+        await session.execute(rollup)
+
+    new_turns = finish_speech_turns(patient_turn, ai_turn, timer, db_started)
+    await session.commit()
+    await asyncio.to_thread(call_sessions.append_turns, call_record.id, new_turns)
+
+async def stream_speech_response(call_record: Call, speech_text: str, intent: str, confidence: float,
+                                 entities: dict, history_list: list, turn_count: int, should_transfer: bool,
+                                 transfer_reason: str, response_data: dict, timer: TurnTimer):
+    """
+    NDJSON events for a streamed turn, as in voice.stream_speech_response: the
+    turn analysis, each sentence with its TTS audio, then a final summary.
+    """
+    yield json.dumps({'event': 'turn', **response_data}) + '\n'
+
+    ai_service, phone_service = voice_routes.ai_service, voice_routes.phone_service
+    sentences = []
+    usage = {}
+    try:
+        waiting_since = time.perf_counter()
+        async for sentence in ai_service.stream_response_async(speech_text, intent, entities, history_list, usage):
+            timer.add('llm', (time.perf_counter() - waiting_since) * 1000)
+            sentences.append(sentence)
+            with timer.stage('tts'):
+                tts_result = await asyncio.to_thread(phone_service.convert_text_to_speech, sentence, call_record.id)
+            yield json.dumps({
+                'event': 'sentence',
+                'index': len(sentences) - 1,
+                'text': sentence,
+                'audio_url': tts_result.get('audio_url')
+            }) + '\n'
+            waiting_since = time.perf_counter()
+        timer.add('llm', (time.perf_counter() - waiting_since) * 1000)
+        timer.add_usage(usage)
+
+        ai_response = ' '.join(sentences)
+        done = {'event': 'done', 'call_id': call_record.id, 'ai_response': ai_response}
+        if intent == 'appointment_scheduling' and entities:
+            done['appointment_result'] = await schedule_consultation_async(
+                voice_routes.crm_service, call_record.caller_name, call_record.phone_number, entities,
+                speech_text, check_availability=True
+            )
+            apply_appointment_result(call_record, done['appointment_result'])
+
+        # The view's session is closed by now; the call record joins a new one
+        async with async_db.session() as session:
+            session.add(call_record)
+            await record_speech_turn(session, voice_routes.call_sessions, call_record, speech_text, intent,
+                                     confidence, entities, turn_count, ai_response, should_transfer,
+                                     transfer_reason, timer)
+        yield json.dumps(done) + '\n'
+
+    except Exception as e:
+        logger.error(f"Error streaming speech response: {e}")
+        yield json.dumps({'event': 'error', 'error': str(e), 'message': 'Failed to process speech'}) + '\n'
+
+# Browser clients get the same CORS headers as from the Flask app
+cors = [Middleware(CORSMiddleware, allow_origins=['*'])]
+
+routes = [
+    Route('/api/voice/incoming-call', voice_incoming_call, methods=['POST'], middleware=cors),
+    Route('/api/voice/process-speech', voice_process_speech, methods=['POST'], middleware=cors),
+    Route('/api/twilio/incoming-call', twilio_incoming_call, methods=['POST'], middleware=cors),
+    Route('/api/twilio/process-speech', twilio_process_speech, methods=['POST'], middleware=cors)
+]
@@ -5,13 +5,24 @@ Handles Twilio webhook endpoints for voice calls
 
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
-import json
 import logging
 
 from src.services.ai_service import AIReceptionistService
 from src.services.twilio_integration import TwilioIntegrationService
 from src.services.crm_integration import CRMIntegrationService
+from src.services.keyword_matcher import KeywordMatcher, EMERGENCY_SCREEN
+from src.services.turn_pipeline import TurnPipeline
+from src.services.call_session_store import CallSessionStore
+from src.services.post_call_queue import PostCallQueue
+from src.services.post_call_worker import enqueue_call_completed
+from src.services.call_rollups import CallAnalyticsRollup, MISSED_CALL_STATUSES
+from src.services.call_turns import (
+    load_call_session, mark_transferred, record_speech_turn, schedule_consultation, apply_appointment_result
+)
+from src.services.turn_timing import TurnTimer
+from src.services.confirmation_campaign import record_campaign_call_status
 from src.models.call import Call, ConversationTurn, CallAnalytics, db
+from src.models.campaign import ConfirmationCampaign, CampaignCall
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +34,21 @@ twilio_voice_bp = Blueprint('twilio_voice', __name__)
 ai_service = AIReceptionistService()
 twilio_service = TwilioIntegrationService()
 crm_service = CRMIntegrationService()
+call_sessions = CallSessionStore.from_env()
+post_call_queue = PostCallQueue.from_env()
+call_rollups = CallAnalyticsRollup()
+
+# Keywords that immediately transfer a Twilio call to emergency services
+EMERGENCY_KEYWORDS = ['emergency', 'urgent', 'chest pain', 'can\'t breathe', 'bleeding', 'help']
+
+# Runs the independent stages of each turn concurrently
+turn_pipeline = TurnPipeline(ai_service)
+
+# Intent and emergency keywords in one compiled matcher so each utterance is scanned once
+keyword_matcher = KeywordMatcher({
+    **ai_service.intents,
+    EMERGENCY_SCREEN: EMERGENCY_KEYWORDS
+})
 
 @twilio_voice_bp.route('/incoming-call', methods=['POST'])
 def handle_twilio_incoming_call():
@@ -54,6 +80,7 @@ def handle_twilio_incoming_call():
             external_call_id=call_sid
         )
         db.session.add(call_record)
+        call_rollups.call_started(call_record)
         db.session.commit()
         
         # Look up patient by phone number
@@ -102,6 +129,8 @@ def handle_twilio_speech():
     Process speech input from Twilio and generate AI response.
     """
     try:
+        timer = TurnTimer()
+        
         # Get Twilio speech data
         call_sid = request.form.get('CallSid')
         speech_result = request.form.get('SpeechResult', '')
@@ -126,82 +155,64 @@ def handle_twilio_speech():
                 external_call_id=call_sid
             )
             db.session.add(call_record)
+            call_rollups.call_started(call_record)
             db.session.commit()
         
         # Check for emergency keywords
-        emergency_keywords = ['emergency', 'urgent', 'chest pain', 'can\'t breathe', 'bleeding', 'help']
-        is_emergency = any(keyword in speech_result.lower() for keyword in emergency_keywords)
+        with timer.stage('emergency'):
+            keyword_matches = keyword_matcher.match(speech_result)
+            is_emergency = bool(keyword_matches.get(EMERGENCY_SCREEN))
         
         if is_emergency:
             logger.warning(f"Emergency detected in call {call_sid}: {speech_result}")
             
             # Update call record
             call_record.intent_detected = 'emergency'
-            call_record.human_transfer_required = True
-            call_record.transfer_reason = 'Emergency situation detected'
+            rollup = mark_transferred(call_record, 'Emergency situation detected')
+            if rollup is not None:
+                db.session.execute(rollup)
             db.session.commit()
             
             # Return emergency transfer TwiML
             emergency_response = twilio_service.create_transfer_response('emergency')
             return emergency_response, 200, {'Content-Type': 'text/xml'}
         
-        # Process with AI service
-        intent, ai_confidence = ai_service.detect_intent(speech_result)
-        entities = ai_service.extract_entities(speech_result, intent)
-        
-        # Get conversation history
-        conversation_history = ConversationTurn.query.filter_by(
-            call_id=call_record.id
-        ).order_by(ConversationTurn.turn_number).all()
-        history_list = [turn.to_dict() for turn in conversation_history]
-        
-        # Generate AI response
-        ai_response = ai_service.generate_response(speech_result, intent, entities, history_list)
+        # History comes from the session store on this thread; the pipeline's
+        # stages may outlive a timeout, so they never touch db.session or call_record
+        call_record_id = call_record.id
+        call_metadata = {'phone_number': call_record.phone_number, 'external_call_id': call_sid}
+        with timer.stage('history'):
+            session = load_call_session(call_sessions, call_record_id, call_metadata)
+        turn_count = session['turn_count']
+        
+        # Intent, then response generation/CRM scheduling, run concurrently
+        caller_name, phone_number = call_record.caller_name, call_record.phone_number
+        turn = turn_pipeline.run_turn(
+            speech_result,
+            keyword_matches,
+            session['turns'],
+            schedule_appointment=lambda entities: schedule_consultation(
+                crm_service, caller_name, phone_number, entities, speech_result
+            )
+        )
+        timer.add_pipeline(turn)
+        intent, ai_confidence, entities = turn['intent'], turn['confidence'], turn['entities']
+        ai_response = turn['ai_response']
+        appointment_result = turn['appointment_result']
         
         # Check if human transfer is needed
         should_transfer, transfer_reason = ai_service.should_transfer_to_human(
-            intent, ai_confidence, len(conversation_history)
-        )
-        
-        # Log patient's speech turn
-        patient_turn = ConversationTurn(
-            call_id=call_record.id,
-            turn_number=len(conversation_history) + 1,
-            speaker='patient',
-            message=speech_result,
-            intent=intent,
-            entities=json.dumps(entities),
-            confidence_score=confidence
-        )
-        db.session.add(patient_turn)
-        
-        # Log AI response turn
-        ai_turn = ConversationTurn(
-            call_id=call_record.id,
-            turn_number=len(conversation_history) + 2,
-            speaker='ai',
-            message=ai_response,
-            intent=f'response_to_{intent}',
-            confidence_score=0.9
+            intent, ai_confidence, turn_count
         )
-        db.session.add(ai_turn)
         
-        # Update call record
-        call_record.intent_detected = intent
-        call_record.ai_confidence_score = ai_confidence
-        call_record.set_entities(entities)
-        
-        if should_transfer:
-            call_record.human_transfer_required = True
-            call_record.transfer_reason = transfer_reason
-        
-        db.session.commit()
+        apply_appointment_result(call_record, appointment_result)
+        record_speech_turn(call_sessions, call_record, speech_result, intent, ai_confidence, entities,
+                           turn_count, ai_response, should_transfer, transfer_reason, timer,
+                           speech_confidence=confidence)
         
         # Handle appointment scheduling
-        if intent == 'appointment_scheduling' and entities:
-            appointment_result = handle_appointment_scheduling(call_record, entities, speech_result)
-            if appointment_result['success']:
-                ai_response += f" I've created your consultation request and you'll receive a confirmation call within 24 hours."
+        if appointment_result and appointment_result['success']:
+            ai_response += f" I've created your consultation request and you'll receive a confirmation call within 24 hours."
         
         # Determine if conversation should continue
         should_continue = not should_transfer and intent not in ['goodbye', 'end_call']
@@ -236,42 +247,31 @@ def handle_call_status():
         
         logger.info(f"Call status update: {call_sid} - {call_status}")
         
+        # Confirmation campaign calls also track their own progress
+        campaign_call_updated = record_campaign_call_status(
+            call_sid, call_status, call_duration, request.args.get('campaign_call_id', type=int)
+        )
+        
         # Find call record
         call_record = Call.query.filter_by(external_call_id=call_sid).first()
         if call_record:
             call_record.call_status = call_status
             
-            if call_status == 'completed':
+            # Twilio may repeat a final status; only the first one ends the call
+            ended = call_status == 'completed' or call_status in MISSED_CALL_STATUSES
+            if ended and call_record.call_end_time is None:
                 call_record.call_end_time = datetime.utcnow()
                 call_record.call_duration = int(call_duration) if call_duration else 0
-                
-                # Generate conversation summary
-                conversation_turns = ConversationTurn.query.filter_by(
-                    call_id=call_record.id
-                ).order_by(ConversationTurn.turn_number).all()
-                
-                if conversation_turns:
-                    conversation_summary = ai_service.generate_conversation_summary(
-                        [turn.to_dict() for turn in conversation_turns]
-                    )
-                    call_record.conversation_summary = conversation_summary
-                
-                # Log to CRM
-                crm_log_data = {
-                    'call_id': call_record.id,
-                    'patient_id': call_record.patient_id,
-                    'phone_number': call_record.phone_number,
-                    'conversation_summary': call_record.conversation_summary,
-                    'intent_detected': call_record.intent_detected,
-                    'outcome': 'completed',
-                    'appointment_created': call_record.appointment_created,
-                    'follow_up_required': call_record.follow_up_required
-                }
-                
-                crm_result = crm_service.log_call_interaction(crm_log_data)
-                logger.info(f"Call logged to CRM: {crm_result['success']}")
+                call_rollups.call_ended(call_record, answered=call_status == 'completed')
             
             db.session.commit()
+            
+            # Summary and CRM logging run on the post-call worker so the webhook returns immediately
+            if call_status == 'completed':
+                enqueue_call_completed(post_call_queue, call_record.id)
+                call_sessions.discard(call_record.id)
+        elif campaign_call_updated:
+            db.session.commit()
         
         return "OK", 200
         
@@ -327,6 +327,7 @@ def make_outbound_call():
                 external_call_id=call_result['call_sid']
             )
             db.session.add(call_record)
+            call_rollups.call_started(call_record)
             db.session.commit()
             
             return jsonify({
@@ -344,47 +345,27 @@ def make_outbound_call():
             'message': 'Failed to make outbound call'
         }), 500
 
-def handle_appointment_scheduling(call_record: Call, entities: dict, patient_message: str) -> dict:
+@twilio_voice_bp.route('/campaigns/<int:campaign_id>', methods=['GET'])
+def get_campaign(campaign_id):
     """
-    Handle appointment scheduling logic during a call.
+    Progress of an appointment confirmation campaign; ?calls=1 includes every call.
     """
     try:
-        # Extract scheduling information
-        service_type = entities.get('service_type', 'wellness_consultation')
-        preferred_date = entities.get('preferred_date', '')
-        preferred_time = entities.get('preferred_time', '')
-        patient_name = entities.get('patient_name', call_record.caller_name or '')
-        
-        # Create consultation request
-        request_data = {
-            'first_name': patient_name.split()[0] if patient_name else '',
-            'last_name': ' '.join(patient_name.split()[1:]) if len(patient_name.split()) > 1 else '',
-            'phone': call_record.phone_number,
-            'service_type': service_type,
-            'preferred_date': preferred_date,
-            'preferred_time': preferred_time,
-            'reason_for_visit': patient_message,
-            'source': 'ai_receptionist_call'
-        }
-        
-        consultation_result = crm_service.create_consultation_request(request_data)
-        
-        if consultation_result['success']:
-            call_record.appointment_created = True
-            call_record.appointment_id = consultation_result['request_id']
-            call_record.follow_up_required = True
-            db.session.commit()
-        
-        return {
-            'success': consultation_result['success'],
-            'request_id': consultation_result.get('request_id'),
-            'message': consultation_result.get('message', 'Consultation request processed')
-        }
+        campaign = db.session.get(ConfirmationCampaign, campaign_id)
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        response_data = {'success': True, 'campaign': campaign.to_dict()}
+        if request.args.get('calls'):
+            response_data['calls'] = [
+                campaign_call.to_dict()
+                for campaign_call in campaign.calls.order_by(CampaignCall.appointment_date, CampaignCall.appointment_time)
+            ]
+        return jsonify(response_data), 200
         
     except Exception as e:
-        logger.error(f"Error handling appointment scheduling: {e}")
-        return {
-            'success': False,
+        logger.error(f"Error getting campaign {campaign_id}: {e}")
+        return jsonify({
             'error': str(e),
-            'message': 'Failed to process appointment request'
-        }
+            'message': 'Failed to get campaign'
+        }), 500
@@ -1,11 +1,23 @@
-from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, send_from_directory
+from datetime import datetime, timedelta
 import json
 import logging
+import re
+import threading
+import time
 
 from src.services.ai_service import AIReceptionistService
 from src.services.phone_service import PhoneService
 from src.services.crm_integration import CRMIntegrationService
+from src.services.keyword_matcher import KeywordMatcher, EMERGENCY_SCREEN
+from src.services.turn_pipeline import TurnPipeline
+from src.services.call_session_store import CallSessionStore
+from src.services.post_call_queue import PostCallQueue
+from src.services.call_rollups import CallAnalyticsRollup
+from src.services.call_turns import (
+    load_call_session, mark_transferred, record_speech_turn, schedule_consultation, apply_appointment_result
+)
+from src.services.turn_timing import TurnTimer, summarize_turn_timings
 from src.models.call import Call, ConversationTurn, CallAnalytics, db
 
 # Configure logging
@@ -18,6 +30,47 @@ voice_bp = Blueprint('voice', __name__)
 ai_service = AIReceptionistService()
 phone_service = PhoneService()
 crm_service = CRMIntegrationService()
+call_sessions = CallSessionStore.from_env()
+post_call_queue = PostCallQueue.from_env()
+call_rollups = CallAnalyticsRollup()
+
+AUDIO_FILENAME = re.compile(r'^[0-9a-f]{64}\.wav$')
+
+# Runs the independent stages of each turn concurrently
+turn_pipeline = TurnPipeline(ai_service)
+
+# Intent and emergency keywords in one compiled matcher so each utterance is scanned once
+keyword_matcher = KeywordMatcher({
+    **ai_service.intents,
+    EMERGENCY_SCREEN: phone_service.routing_rules['emergency_keywords']
+})
+
+_tts_prewarm_thread = None
+_tts_prewarm_lock = threading.Lock()
+
+def start_tts_prewarm() -> threading.Thread:
+    """
+    Render greetings and fallback responses into the TTS cache in the background.
+    Runs once per process: at server start where there is a hook for it (the ASGI
+    lifespan, the development server), otherwise on the first request.
+    """
+    global _tts_prewarm_thread
+    with _tts_prewarm_lock:
+        if _tts_prewarm_thread is None:
+            _tts_prewarm_thread = threading.Thread(
+                target=phone_service.prewarm_tts,
+                args=(phone_service.fixed_phrases() + ai_service.fixed_phrases(),),
+                name='tts-prewarm',
+                daemon=True
+            )
+            _tts_prewarm_thread.start()
+        return _tts_prewarm_thread
+
+@voice_bp.before_app_request
+def prewarm_tts_on_first_request():
+    # WSGI servers such as gunicorn have no startup hook of their own
+    if _tts_prewarm_thread is None:
+        start_tts_prewarm()
 
 @voice_bp.route('/incoming-call', methods=['POST'])
 def handle_incoming_call():
@@ -48,6 +101,7 @@ def handle_incoming_call():
             intent_detected='initial_greeting'
         )
         db.session.add(call_record)
+        call_rollups.call_started(call_record)
         db.session.commit()
         
         # Look up patient by phone number
@@ -100,6 +154,7 @@ def process_speech():
     Process speech input from caller and generate AI response.
     """
     try:
+        timer = TurnTimer()
         data = request.get_json() or {}
         call_id = data.get('call_id')
         speech_text = data.get('speech_text', '')
@@ -117,7 +172,8 @@ def process_speech():
         
         # If audio_data provided, convert speech to text
         if audio_data and not speech_text:
-            stt_result = phone_service.convert_speech_to_text(audio_data, call_id)
+            with timer.stage('stt'):
+                stt_result = phone_service.convert_speech_to_text(audio_data, call_id)
             if stt_result['success']:
                 speech_text = stt_result['transcript']
             else:
@@ -130,7 +186,11 @@ def process_speech():
             return jsonify({'error': 'No speech text provided'}), 400
         
         # Check for emergency
-        is_emergency, emergency_reason = phone_service.detect_emergency_in_speech(speech_text)
+        with timer.stage('emergency'):
+            keyword_matches = keyword_matcher.match(speech_text)
+            is_emergency, emergency_reason = phone_service.detect_emergency_in_speech(
+                speech_text, keyword_matches.get(EMERGENCY_SCREEN, set())
+            )
         if is_emergency:
             logger.warning(f"Emergency detected in call {call_id}: {emergency_reason}")
             
@@ -139,8 +199,9 @@ def process_speech():
             
             # Update call record
             call_record.intent_detected = 'emergency'
-            call_record.human_transfer_required = True
-            call_record.transfer_reason = emergency_reason
+            rollup = mark_transferred(call_record, emergency_reason)
+            if rollup is not None:
+                db.session.execute(rollup)
             db.session.commit()
             
             return jsonify({
@@ -151,76 +212,69 @@ def process_speech():
                 'message': 'Transferring to emergency services'
             }), 200
         
-        # Detect intent and extract entities
-        intent, confidence = ai_service.detect_intent(speech_text)
-        entities = ai_service.extract_entities(speech_text, intent)
-        
-        # Get conversation history
-        conversation_history = ConversationTurn.query.filter_by(call_id=call_record.id).order_by(ConversationTurn.turn_number).all()
-        history_list = [turn.to_dict() for turn in conversation_history]
-        
-        # Generate AI response
-        ai_response = ai_service.generate_response(speech_text, intent, entities, history_list)
+        # History comes from the session store on this thread; the pipeline's
+        # stages may outlive a timeout, so they never touch db.session or call_record
+        stream = bool(data.get('stream'))
+        call_metadata = {'phone_number': call_record.phone_number, 'caller_name': call_record.caller_name}
+        with timer.stage('history'):
+            session = load_call_session(call_sessions, call_record.id, call_metadata)
+        history_list, turn_count = session['turns'], session['turn_count']
+        
+        # Intent, then response generation/CRM scheduling, run concurrently
+        caller_name, phone_number = call_record.caller_name, call_record.phone_number
+        turn = turn_pipeline.run_turn(
+            speech_text,
+            keyword_matches,
+            history_list,
+            schedule_appointment=None if stream else (
+                lambda entities: schedule_consultation(crm_service, caller_name, phone_number, entities, speech_text,
+                                                       check_availability=True)
+            ),
+            generate_response=not stream
+        )
+        timer.add_pipeline(turn)
+        intent, confidence, entities = turn['intent'], turn['confidence'], turn['entities']
         
         # Check if human transfer is needed
         should_transfer, transfer_reason = ai_service.should_transfer_to_human(
-            intent, confidence, len(conversation_history)
+            intent, confidence, turn_count
         )
         
-        # Log patient's speech turn
-        patient_turn = ConversationTurn(
-            call_id=call_record.id,
-            turn_number=len(conversation_history) + 1,
-            speaker='patient',
-            message=speech_text,
-            intent=intent,
-            entities=json.dumps(entities),
-            confidence_score=confidence
-        )
-        db.session.add(patient_turn)
-        
-        # Log AI response turn
-        ai_turn = ConversationTurn(
-            call_id=call_record.id,
-            turn_number=len(conversation_history) + 2,
-            speaker='ai',
-            message=ai_response,
-            intent=f'response_to_{intent}',
-            confidence_score=0.9
-        )
-        db.session.add(ai_turn)
-        
-        # Update call record
-        call_record.intent_detected = intent
-        call_record.ai_confidence_score = confidence
-        call_record.set_entities(entities)
-        
-        if should_transfer:
-            call_record.human_transfer_required = True
-            call_record.transfer_reason = transfer_reason
-        
-        db.session.commit()
-        
-        # Handle specific intents
         response_data = {
             'call_id': call_id,
             'intent': intent,
             'confidence': confidence,
             'entities': entities,
-            'ai_response': ai_response,
             'should_transfer': should_transfer,
             'transfer_reason': transfer_reason
         }
         
-        # Process appointment scheduling
-        if intent == 'appointment_scheduling' and entities:
-            appointment_result = handle_appointment_scheduling(call_record, entities, speech_text)
-            response_data['appointment_result'] = appointment_result
+        # Streaming mode: newline-delimited JSON, one event per sentence as soon as it's spoken-ready
+        if stream:
+            return Response(
+                stream_with_context(stream_speech_response(
+                    call_record, speech_text, intent, confidence, entities,
+                    history_list, turn_count, should_transfer, transfer_reason, response_data, timer
+                )),
+                mimetype='application/x-ndjson'
+            )
         
-        # Convert AI response to speech
-        tts_result = phone_service.convert_text_to_speech(ai_response, call_id)
+        ai_response = turn['ai_response']
+        response_data['ai_response'] = ai_response
+        
+        if turn['appointment_result'] is not None:
+            # Committed with the turn below
+            apply_appointment_result(call_record, turn['appointment_result'])
+            response_data['appointment_result'] = turn['appointment_result']
+        
+        # Convert AI response to speech (before the DB write, so the turn's timings include it)
+        with timer.stage('tts'):
+            tts_result = phone_service.convert_text_to_speech(ai_response, call_id)
         response_data['audio_url'] = tts_result.get('audio_url')
         
+        record_speech_turn(call_sessions, call_record, speech_text, intent, confidence, entities,
+                           turn_count, ai_response, should_transfer, transfer_reason, timer)
+        
         return jsonify(response_data), 200
         
     except Exception as e:
@@ -262,13 +316,18 @@ def end_call():
         else:
             call_duration = 0
         
-        # Update call record
+        # Update call record (the rollup counts each call's end once)
+        already_ended = call_record.call_end_time is not None
         call_record.call_end_time = datetime.utcnow()
         call_record.call_duration = int(call_duration)
         call_record.call_status = 'completed'
         call_record.conversation_summary = conversation_summary
+        call_record.summarized_at = datetime.utcnow()
+        if not already_ended:
+            call_rollups.call_ended(call_record)
         
         db.session.commit()
+        call_sessions.discard(call_record.id)
         
         # Log interaction to CRM
         crm_log_data = {
@@ -328,8 +387,9 @@ def transfer_call():
         transfer_result = phone_service.transfer_call(call_id, transfer_type, reason)
         
         # Update call record
-        call_record.human_transfer_required = True
-        call_record.transfer_reason = reason
+        rollup = mark_transferred(call_record, reason)
+        if rollup is not None:
+            db.session.execute(rollup)
         call_record.call_status = 'transferred'
         
         db.session.commit()
@@ -381,6 +441,7 @@ def make_outbound_call():
                 intent_detected=call_type
             )
             db.session.add(call_record)
+            call_rollups.call_started(call_record)
             db.session.commit()
             
             return jsonify({
@@ -398,84 +459,122 @@ def make_outbound_call():
             'message': 'Failed to make outbound call'
         }), 500
 
-def handle_appointment_scheduling(call_record: Call, entities: dict, patient_message: str) -> dict:
+def stream_speech_response(call_record: Call, speech_text: str, intent: str, confidence: float,
+                           entities: dict, history_list: list, turn_count: int, should_transfer: bool,
+                           transfer_reason: str, response_data: dict, timer: TurnTimer):
     """
-    Handle appointment scheduling logic during a call.
+    Yield NDJSON events for a streamed turn: the turn analysis, then each sentence
+    with its TTS audio as soon as the sentence is complete, then a final summary.
+    The 'llm' stage is the time spent waiting for sentences, excluding TTS.
     """
+    yield json.dumps({'event': 'turn', **response_data}) + '\n'
+    
+    sentences = []
+    usage = {}
     try:
-        # Extract scheduling information
-        service_type = entities.get('service_type', 'wellness_consultation')
-        preferred_date = entities.get('preferred_date', '')
-        preferred_time = entities.get('preferred_time', '')
-        patient_name = entities.get('patient_name', call_record.caller_name or '')
-        
-        # Check availability if date/time provided
-        availability_result = None
-        if preferred_date:
-            availability_result = crm_service.check_appointment_availability(
-                preferred_date, preferred_time, service_type
+        waiting_since = time.perf_counter()
+        for sentence in ai_service.stream_response(speech_text, intent, entities, history_list, usage):
+            timer.add('llm', (time.perf_counter() - waiting_since) * 1000)
+            sentences.append(sentence)
+            with timer.stage('tts'):
+                tts_result = phone_service.convert_text_to_speech(sentence, call_record.id)
+            yield json.dumps({
+                'event': 'sentence',
+                'index': len(sentences) - 1,
+                'text': sentence,
+                'audio_url': tts_result.get('audio_url')
+            }) + '\n'
+            waiting_since = time.perf_counter()
+        timer.add('llm', (time.perf_counter() - waiting_since) * 1000)
+        timer.add_usage(usage)
+        
+        ai_response = ' '.join(sentences)
+        record_speech_turn(call_sessions, call_record, speech_text, intent, confidence, entities,
+                           turn_count, ai_response, should_transfer, transfer_reason, timer)
+        
+        done = {'event': 'done', 'call_id': call_record.id, 'ai_response': ai_response}
+        if intent == 'appointment_scheduling' and entities:
+            done['appointment_result'] = schedule_consultation(
+                crm_service, call_record.caller_name, call_record.phone_number, entities, speech_text,
+                check_availability=True
             )
-        
-        # Create consultation request
-        request_data = {
-            'first_name': patient_name.split()[0] if patient_name else '',
-            'last_name': ' '.join(patient_name.split()[1:]) if len(patient_name.split()) > 1 else '',
-            'phone': call_record.phone_number,
-            'service_type': service_type,
-            'preferred_date': preferred_date,
-            'preferred_time': preferred_time,
-            'reason_for_visit': patient_message,
-            'source': 'ai_receptionist_call'
-        }
-        
-        consultation_result = crm_service.create_consultation_request(request_data)
-        
-        if consultation_result['success']:
-            call_record.appointment_created = True
-            call_record.appointment_id = consultation_result['request_id']
-            call_record.follow_up_required = True
-            db.session.commit()
-        
-        return {
-            'success': consultation_result['success'],
-            'request_id': consultation_result.get('request_id'),
-            'availability': availability_result,
-            'message': 'Appointment request processed'
-        }
+            if apply_appointment_result(call_record, done['appointment_result']):
+                db.session.commit()
+        yield json.dumps(done) + '\n'
         
     except Exception as e:
-        logger.error(f"Error handling appointment scheduling: {e}")
-        return {
-            'success': False,
-            'error': str(e),
-            'message': 'Failed to process appointment request'
-        }
+        logger.error(f"Error streaming speech response: {e}")
+        db.session.rollback()
+        yield json.dumps({'event': 'error', 'error': str(e), 'message': 'Failed to process speech'}) + '\n'
+
+@voice_bp.route('/audio/<filename>', methods=['GET'])
+def serve_tts_audio(filename):
+    """
+    Serve cached TTS audio. Files are content-addressed, so they never change.
+    """
+    if not AUDIO_FILENAME.match(filename) or not phone_service.tts_cache.contains(filename[:-4]):
+        return jsonify({'error': 'Audio not found'}), 404
+    
+    response = send_from_directory(phone_service.tts_cache.cache_dir, filename, mimetype='audio/wav')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @voice_bp.route('/call-analytics', methods=['GET'])
 def get_call_analytics():
     """
     Get call analytics and performance metrics.
+    
+    Served from the daily CallAnalytics rollups (?days=N, default today), so the
+    cost doesn't grow with call history.
     """
     try:
-        # Get analytics from phone service
-        analytics = phone_service.get_call_analytics()
+        days = min(max(request.args.get('days', 1, type=int), 1), 366)
+        end_day = datetime.utcnow().date()
+        start_day = end_day - timedelta(days=days - 1)
+        totals, daily = call_rollups.summary(start_day, end_day)
         
-        # Get database analytics
-        total_calls = Call.query.count()
-        answered_calls = Call.query.filter_by(call_status='completed').count()
-        transferred_calls = Call.query.filter_by(human_transfer_required=True).count()
+        analytics = {
+            'success': True,
+            'analytics': {
+                'total_calls': totals['total_calls'],
+                'answered_calls': totals['answered_calls'],
+                'missed_calls': totals['missed_calls'],
+                'average_call_duration': round(totals['average_call_duration'] / 60, 1),  # minutes
+                'ai_handled_calls': totals['ai_handled_calls'],
+                'transferred_calls': totals['human_transfer_calls'],
+                'emergency_calls': totals['emergency_intents'],
+                'appointment_calls': totals['scheduling_intents'],
+                'appointments_scheduled': totals['appointments_scheduled'],
+                'appointment_success_rate': totals['appointment_success_rate'],
+                'information_calls': totals['information_intents'],
+                'billing_calls': totals['billing_intents'],
+                'average_ai_confidence': totals['average_ai_confidence']
+            },
+            'date_range': {'start': start_day.isoformat(), 'end': end_day.isoformat()}
+        }
         
         db_analytics = {
-            'total_calls_db': total_calls,
-            'answered_calls_db': answered_calls,
-            'transferred_calls_db': transferred_calls,
-            'ai_success_rate': (answered_calls - transferred_calls) / max(answered_calls, 1) * 100
+            'total_calls_db': totals['total_calls'],
+            'answered_calls_db': totals['answered_calls'],
+            'transferred_calls_db': totals['human_transfer_calls'],
+            'ai_success_rate': totals['ai_handled_calls'] / max(totals['answered_calls'], 1) * 100,
+            'daily': daily
         }
         
         return jsonify({
             'success': True,
             'phone_analytics': analytics,
-            'database_analytics': db_analytics
+            'database_analytics': db_analytics,
+            'intent_cache': ai_service.intent_cache.stats(),
+            'response_streaming': ai_service.streaming_metrics(),
+            'tts_cache': phone_service.tts_cache.stats(),
+            'post_call_queue': post_call_queue.stats(),
+            'caller_cache': crm_service.caller_cache.stats(),
+            'intent_classifier': {
+                'loaded': ai_service.intent_classifier is not None,
+                'threshold': ai_service.intent_classifier_threshold,
+                'report': ai_service.intent_classifier.report if ai_service.intent_classifier else None
+            }
         }), 200
         
     except Exception as e:
@@ -485,6 +584,34 @@ def get_call_analytics():
             'message': 'Failed to get call analytics'
         }), 500
 
+@voice_bp.route('/turn-timings', methods=['GET'])
+def get_turn_timings():
+    """
+    Where callers' wait time goes: per-stage latency (STT, emergency check,
+    intent, entities, LLM, TTS, DB writes...) and LLM tokens of recent turns,
+    overall and by hour (?hours=N, default 24).
+    """
+    try:
+        hours = min(max(request.args.get('hours', 24, type=int), 1), 24 * 31)
+        since = datetime.utcnow() - timedelta(hours=hours)
+        rows = db.session.query(ConversationTurn.timestamp, ConversationTurn.stage_timings).filter(
+            ConversationTurn.timestamp >= since,
+            ConversationTurn.stage_timings.isnot(None)
+        ).all()
+
+        return jsonify({
+            'success': True,
+            'since': since.isoformat(),
+            **summarize_turn_timings((timestamp, json.loads(timings)) for timestamp, timings in rows)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error getting turn timings: {e}")
+        return jsonify({
+            'error': str(e),
+            'message': 'Failed to get turn timings'
+        }), 500
+
 @voice_bp.route('/test-services', methods=['GET'])
 def test_services():
     """
@@ -1,10 +1,19 @@
 import openai
 import json
-import re
+import os
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Set, Tuple, Optional
 import logging
 
+from src.services.keyword_matcher import KeywordMatcher
+from src.services.entity_scanner import EntityScanner
+from src.services.intent_cache import IntentCache
+from src.services.intent_classifier import IntentClassifier
+from src.services.sentence_stream import aiter_sentences, iter_sentences
+from src.services.token_budget import count_message_tokens
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,6 +26,8 @@ class AIReceptionistService:
     
     def __init__(self):
         self.client = openai.OpenAI()
+        # Used by the async turn pipeline (src/services/turn_pipeline.py) and the ASGI webhooks
+        self.async_client = openai.AsyncOpenAI()
         self.conversation_context = {}
         
         # Define intents and their patterns
@@ -47,6 +58,20 @@ class AIReceptionistService:
             ]
         }
         
+        # All intent keywords compiled once so each message is scanned in a single pass
+        self.keyword_matcher = KeywordMatcher(self.intents)
+        self.intent_keyword_counts = {intent: len(keywords) for intent, keywords in self.intents.items()}
+        
+        # LLM classifications of utterances that matched no keywords
+        self.intent_cache = IntentCache.from_env()
+        
+        # Locally trained classifier (scripts/train_intent_classifier.py), if a model exists
+        self.intent_classifier = IntentClassifier.load()
+        self.intent_classifier_threshold = float(os.getenv('INTENT_CLASSIFIER_THRESHOLD', '0.7'))
+        
+        # Time-to-first-sentence (ms) of recent streamed responses
+        self.first_sentence_times = deque(maxlen=500)
+        
         # Service information
         self.services = {
             'psychiatry': {
@@ -81,6 +106,9 @@ class AIReceptionistService:
             }
         }
 
+        # Entity patterns compiled once and run as a single scan per message
+        self.entity_scanner = EntityScanner(self.services)
+
         # Practice information
         self.practice_info = {
             'name': 'Lehigh Valley Wellness',
@@ -89,173 +117,186 @@ class AIReceptionistService:
             'hours': 'Monday-Friday: 8:00 AM - 6:00 PM',
             'website': 'lehighvalleywellness.org'
         }
+        
+        # Static prompt prefix, identical on every turn so the provider can cache it
+        self.static_system_message = {"role": "system", "content": self._build_static_system_prompt()}
+        self.static_prompt_tokens = count_message_tokens([self.static_system_message])
+        # Max prompt tokens (system prompt + history + turn) per response request
+        self.prompt_token_budget = int(os.getenv('PROMPT_TOKEN_BUDGET', '2000'))
     
-    def detect_intent(self, message: str) -> Tuple[str, float]:
+    def detect_intent(self, message: str,
+                      keyword_matches: Optional[Dict[str, Set[str]]] = None) -> Tuple[str, float]:
         """
-        Detect the intent of a patient message using keyword matching and AI analysis.
+        Detect the intent of a patient message using keyword matching, the local
+        classifier and, for low-confidence messages, AI analysis.
+        Pass keyword_matches from a shared KeywordMatcher to reuse an existing scan.
         Returns tuple of (intent, confidence_score)
         """
-        message_lower = message.lower()
-        intent_scores = {}
-        
-        # Keyword-based intent detection
-        for intent, keywords in self.intents.items():
-            score = 0
-            for keyword in keywords:
-                if keyword in message_lower:
-                    score += 1
-            if score > 0:
-                intent_scores[intent] = score / len(keywords)
+        intent_scores, local_result = self._detect_intent_locally(message, keyword_matches)
+        if local_result:
+            return local_result
         
         # If no clear intent from keywords, use AI analysis
         if not intent_scores:
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": """You are an AI assistant helping to classify patient intents for a medical practice. 
-                            Classify the following message into one of these categories:
-                            - appointment_scheduling: Patient wants to schedule a new appointment
-                            - appointment_modification: Patient wants to change/cancel existing appointment
-                            - service_inquiry: Patient asking about services, treatments, or procedures
-                            - billing_inquiry: Patient asking about costs, insurance, or billing
-                            - general_info: Patient asking about practice hours, location, contact info
-                            - emergency: Patient has urgent medical need or emergency
-                            
-                            Respond with only the category name."""
-                        },
-                        {"role": "user", "content": message}
-                    ],
-                    max_tokens=50,
-                    temperature=0.1
-                )
-                
-                ai_intent = response.choices[0].message.content.strip().lower()
-                if ai_intent in self.intents:
-                    return ai_intent, 0.8
+                response = self.client.chat.completions.create(**self._intent_request(message))
+                ai_result = self._read_intent_response(message, response)
+                if ai_result:
+                    return ai_result
                     
             except Exception as e:
                 logger.error(f"Error in AI intent detection: {e}")
         
-        # Return highest scoring intent or default
-        if intent_scores:
-            best_intent = max(intent_scores, key=intent_scores.get)
-            return best_intent, intent_scores[best_intent]
-        
-        return 'general_info', 0.3
+        return self._best_intent(intent_scores)
     
-    def extract_entities(self, message: str, intent: str) -> Dict:
+    async def detect_intent_async(self, message: str,
+                                  keyword_matches: Optional[Dict[str, Set[str]]] = None) -> Tuple[str, float]:
         """
-        Extract relevant entities from the message based on the detected intent.
+        Same as detect_intent, but the LLM fallback uses the async client so it can
+        run alongside other turn stages.
         """
-        entities = {}
-        message_lower = message.lower()
+        intent_scores, local_result = self._detect_intent_locally(message, keyword_matches)
+        if local_result:
+            return local_result
         
-        # Extract dates and times
-        date_patterns = [
-            r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
-            r'(tomorrow|today|next week|this week)',
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}'
-        ]
-        
-        time_patterns = [
-            r'(\d{1,2}:\d{2}\s*(?:am|pm))',
-            r'(\d{1,2}\s*(?:am|pm))',
-            r'(morning|afternoon|evening)',
-            r'(early|late)\s+(morning|afternoon)'
-        ]
+        if not intent_scores:
+            try:
+                response = await self.async_client.chat.completions.create(**self._intent_request(message))
+                ai_result = self._read_intent_response(message, response)
+                if ai_result:
+                    return ai_result
+                    
+            except Exception as e:
+                logger.error(f"Error in AI intent detection: {e}")
         
-        for pattern in date_patterns:
-            matches = re.findall(pattern, message_lower)
-            if matches:
-                entities['preferred_date'] = matches[0]
-                break
+        return self._best_intent(intent_scores)
+    
+    def _detect_intent_locally(self, message: str,
+                               keyword_matches: Optional[Dict[str, Set[str]]] = None
+                               ) -> Tuple[Dict[str, float], Optional[Tuple[str, float]]]:
+        """
+        Keyword scores plus a result from the cache or local classifier when the
+        keywords found nothing. A None result means the LLM should be asked.
+        """
+        intent_scores = self.score_intents(message, keyword_matches)
+        if intent_scores:
+            return intent_scores, self._best_intent(intent_scores)
         
-        for pattern in time_patterns:
-            matches = re.findall(pattern, message_lower)
-            if matches:
-                entities['preferred_time'] = matches[0]
-                break
+        cached_intent = self.intent_cache.get(message)
+        if cached_intent in self.intents:
+            return intent_scores, (cached_intent, 0.8)
         
-        # Extract service types
-        for service_key, service_info in self.services.items():
-            service_keywords = service_info['name'].lower().split()
-            if any(keyword in message_lower for keyword in service_keywords):
-                entities['service_type'] = service_key
-                break
+        # Local model first; only low-confidence predictions go to the LLM
+        if self.intent_classifier:
+            local_intent, probability = self.intent_classifier.predict(message)
+            if local_intent in self.intents and probability >= self.intent_classifier_threshold:
+                return intent_scores, (local_intent, probability)
         
-        # Extract patient information
-        phone_pattern = r'(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})'
-        phone_matches = re.findall(phone_pattern, message)
-        if phone_matches:
-            entities['phone_number'] = phone_matches[0]
+        return intent_scores, None
+    
+    def _intent_request(self, message: str) -> Dict:
+        return {
+            'model': "gpt-3.5-turbo",
+            'messages': [
+                {
+                    "role": "system",
+                    "content": """You are an AI assistant helping to classify patient intents for a medical practice. 
+                    Classify the following message into one of these categories:
+                    - appointment_scheduling: Patient wants to schedule a new appointment
+                    - appointment_modification: Patient wants to change/cancel existing appointment
+                    - service_inquiry: Patient asking about services, treatments, or procedures
+                    - billing_inquiry: Patient asking about costs, insurance, or billing
+                    - general_info: Patient asking about practice hours, location, contact info
+                    - emergency: Patient has urgent medical need or emergency
+                    
+                    Respond with only the category name."""
+                },
+                {"role": "user", "content": message}
+            ],
+            'max_tokens': 50,
+            'temperature': 0.1
+        }
+    
+    def _read_intent_response(self, message: str, response) -> Optional[Tuple[str, float]]:
+        ai_intent = response.choices[0].message.content.strip().lower()
+        if ai_intent in self.intents:
+            self.intent_cache.set(message, ai_intent)
+            return ai_intent, 0.8
+        return None
+    
+    def _best_intent(self, intent_scores: Dict[str, float]) -> Tuple[str, float]:
+        """Return highest scoring intent or default"""
+        if intent_scores:
+            best_intent = max(intent_scores, key=intent_scores.get)
+            return best_intent, intent_scores[best_intent]
         
-        name_pattern = r'my name is ([a-zA-Z\s]+)'
-        name_matches = re.findall(name_pattern, message_lower)
-        if name_matches:
-            entities['patient_name'] = name_matches[0].strip()
+        return 'general_info', 0.3
+    
+    def score_intents(self, message: str,
+                      keyword_matches: Optional[Dict[str, Set[str]]] = None) -> Dict[str, float]:
+        """
+        Score each intent by the fraction of its keywords found in the message.
+        """
+        if keyword_matches is None:
+            keyword_matches = self.keyword_matcher.match(message)
         
-        return entities
+        return {
+            intent: len(keyword_matches[intent]) / keyword_count
+            for intent, keyword_count in self.intent_keyword_counts.items()
+            if intent in keyword_matches
+        }
+    
+    def extract_entities(self, message: str, intent: str) -> Dict:
+        """
+        Extract relevant entities from the message based on the detected intent.
+        Dates are normalized to YYYY-MM-DD and clock times to HH:MM; the spoken
+        phrases are kept in preferred_date_text / preferred_time_text.
+        """
+        return self.entity_scanner.scan(message)
     
     def generate_response(self, message: str, intent: str, entities: Dict, 
-                         conversation_history: List[Dict] = None) -> str:
+                         conversation_history: List[Dict] = None, usage: Optional[Dict] = None) -> str:
         """
         Generate an appropriate response based on the message, intent, and entities.
+        Pass a dict as usage to receive the completion's prompt/completion token counts.
         """
-        if conversation_history is None:
-            conversation_history = []
-        
         # Handle emergency situations first
         if intent == 'emergency':
             return self._handle_emergency_response()
         
         # Generate context-aware response using AI
         try:
-            system_prompt = f"""You are a professional AI receptionist for {self.practice_info['name']},
-            a wellness practice offering hormone optimization, medical weight loss, psychiatry,
-            peptide therapy, and wellness consultations.
-            
-            Practice Information:
-            - Phone: {self.practice_info['phone']}
-            - Hours: {self.practice_info['hours']}
-            - Location: {self.practice_info['address']}
-            
-            Services and Pricing:
-            {json.dumps(self.services, indent=2)}
-            
-            Guidelines:
-            - Be professional, warm, and helpful
-            - For appointment scheduling, ask for preferred date/time and service type
-            - Provide accurate service information and pricing
-            - For billing questions, direct to billing department
-            - Always offer to help further
-            - Keep responses concise but informative
-            - If you can't help, offer to transfer to staff
-            
-            Current conversation intent: {intent}
-            Extracted information: {json.dumps(entities)}
-            """
-            
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Add conversation history
-            for turn in conversation_history[-6:]:  # Last 6 turns for context
-                messages.append({
-                    "role": "user" if turn['speaker'] == 'patient' else "assistant",
-                    "content": turn['message']
-                })
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._build_response_messages(message, intent, entities, conversation_history),
+                max_tokens=300,
+                temperature=0.7
+            )
+            self._record_usage(usage, response.usage)
             
-            messages.append({"role": "user", "content": message})
+            return response.choices[0].message.content.strip()
             
-            response = self.client.chat.completions.create(
+        except Exception as e:
+            logger.error(f"Error generating AI response: {e}")
+            return self._get_fallback_response(intent)
+    
+    async def generate_response_async(self, message: str, intent: str, entities: Dict,
+                                      conversation_history: List[Dict] = None,
+                                      usage: Optional[Dict] = None) -> str:
+        """
+        Same as generate_response, using the async client.
+        """
+        if intent == 'emergency':
+            return self._handle_emergency_response()
+        
+        try:
+            response = await self.async_client.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=messages,
+                messages=self._build_response_messages(message, intent, entities, conversation_history),
                 max_tokens=300,
                 temperature=0.7
             )
+            self._record_usage(usage, response.usage)
             
             return response.choices[0].message.content.strip()
             
@@ -263,6 +304,175 @@ class AIReceptionistService:
             logger.error(f"Error generating AI response: {e}")
             return self._get_fallback_response(intent)
     
+    def stream_response(self, message: str, intent: str, entities: Dict,
+                        conversation_history: List[Dict] = None,
+                        usage: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Stream the response as complete sentences while the completion is still
+        being generated, so each one can go to TTS immediately.
+        Records time-to-first-sentence for every streamed response; usage is
+        filled in once the stream has finished.
+        """
+        if intent == 'emergency':
+            yield self._handle_emergency_response()
+            return
+        
+        started = time.perf_counter()
+        first_sentence = True
+        try:
+            stream = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._build_response_messages(message, intent, entities, conversation_history),
+                max_tokens=300,
+                temperature=0.7,
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            
+            def deltas():
+                for chunk in stream:
+                    if chunk.choices:
+                        yield chunk.choices[0].delta.content
+                    # The final chunk carries the usage and no choices
+                    self._record_usage(usage, getattr(chunk, 'usage', None))
+            
+            for sentence in iter_sentences(deltas()):
+                if first_sentence:
+                    self.first_sentence_times.append((time.perf_counter() - started) * 1000)
+                    first_sentence = False
+                yield sentence
+                
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {e}")
+            # Only fall back if the caller hasn't heard anything yet
+            if first_sentence:
+                yield self._get_fallback_response(intent)
+    
+    async def stream_response_async(self, message: str, intent: str, entities: Dict,
+                                    conversation_history: List[Dict] = None,
+                                    usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Same as stream_response, using the async client.
+        """
+        if intent == 'emergency':
+            yield self._handle_emergency_response()
+            return
+        
+        started = time.perf_counter()
+        first_sentence = True
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._build_response_messages(message, intent, entities, conversation_history),
+                max_tokens=300,
+                temperature=0.7,
+                stream=True,
+                stream_options={'include_usage': True}
+            )
+            
+            async def deltas():
+                async for chunk in stream:
+                    if chunk.choices:
+                        yield chunk.choices[0].delta.content
+                    self._record_usage(usage, getattr(chunk, 'usage', None))
+            
+            async for sentence in aiter_sentences(deltas()):
+                if first_sentence:
+                    self.first_sentence_times.append((time.perf_counter() - started) * 1000)
+                    first_sentence = False
+                yield sentence
+                
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {e}")
+            if first_sentence:
+                yield self._get_fallback_response(intent)
+    
+    @staticmethod
+    def _record_usage(usage: Optional[Dict], response_usage):
+        if usage is not None and response_usage is not None:
+            usage['prompt_tokens'] = response_usage.prompt_tokens
+            usage['completion_tokens'] = response_usage.completion_tokens
+    
+    def streaming_metrics(self) -> Dict:
+        """Time-to-first-sentence over recent streamed responses (milliseconds)"""
+        samples = sorted(self.first_sentence_times)
+        if not samples:
+            return {'responses': 0}
+        return {
+            'responses': len(samples),
+            'time_to_first_sentence_ms_p50': round(samples[len(samples) // 2], 1),
+            'time_to_first_sentence_ms_p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+            'time_to_first_sentence_ms_last': round(self.first_sentence_times[-1], 1)
+        }
+    
+    def _build_response_messages(self, message: str, intent: str, entities: Dict,
+                                 conversation_history: List[Dict] = None) -> List[Dict]:
+        """
+        Chat messages for response generation. The static system prompt comes
+        first and never changes, then recent history, then the per-turn context
+        and the new message, so providers can reuse the cached prompt prefix.
+        History is trimmed (oldest first) to keep the prompt within budget.
+        """
+        if conversation_history is None:
+            conversation_history = []
+        
+        turn_messages = [
+            {
+                "role": "system",
+                "content": f"Current conversation intent: {intent}\n"
+                           f"Extracted information: {json.dumps(entities, separators=(',', ':'))}"
+            },
+            {"role": "user", "content": message}
+        ]
+        
+        history_messages = [
+            {
+                "role": "user" if turn['speaker'] == 'patient' else "assistant",
+                "content": turn['message']
+            }
+            for turn in conversation_history[-6:]  # Last 6 turns for context
+        ]
+        
+        budget = self.prompt_token_budget - self.static_prompt_tokens - count_message_tokens(turn_messages)
+        while history_messages and count_message_tokens(history_messages) > budget:
+            history_messages.pop(0)
+        
+        return [self.static_system_message] + history_messages + turn_messages
+    
+    def _build_static_system_prompt(self) -> str:
+        """System prompt shared by every turn; built once at startup."""
+        return f"""You are a professional AI receptionist for {self.practice_info['name']},
+a wellness practice offering hormone optimization, medical weight loss, psychiatry,
+peptide therapy, and wellness consultations.
+
+Practice Information:
+- Phone: {self.practice_info['phone']}
+- Hours: {self.practice_info['hours']}
+- Location: {self.practice_info['address']}
+
+Services and Pricing:
+{json.dumps(self.services, separators=(',', ':'))}
+
+Guidelines:
+- Be professional, warm, and helpful
+- For appointment scheduling, ask for preferred date/time and service type
+- Provide accurate service information and pricing
+- For billing questions, direct to billing department
+- Always offer to help further
+- Keep responses concise but informative
+- If you can't help, offer to transfer to staff
+
+The last system message before each patient message gives the detected intent and extracted information for that turn."""
+    
+    def fixed_phrases(self) -> List[str]:
+        """Responses spoken verbatim (fallbacks and the emergency notice), for TTS pre-warming"""
+        phrases = [self._handle_emergency_response()]
+        for intent in list(self.intents) + [None]:
+            phrase = self._get_fallback_response(intent)
+            if phrase not in phrases:
+                phrases.append(phrase)
+        return phrases
+    
     def _handle_emergency_response(self) -> str:
         """Handle emergency situations with appropriate response."""
         return """I understand this may be an emergency situation. If this is a life-threatening emergency, 
@@ -335,8 +545,11 @@ class AIReceptionistService:
         
         return False, ""
     
-    def generate_conversation_summary(self, conversation_turns: List[Dict]) -> str:
-        """Generate a summary of the conversation for CRM logging."""
+    def generate_conversation_summary(self, conversation_turns: List[Dict], fallback_on_error: bool = True) -> str:
+        """
+        Generate a summary of the conversation for CRM logging.
+        With fallback_on_error=False API errors are raised so the caller can retry.
+        """
         if not conversation_turns:
             return "No conversation recorded"
         
@@ -365,5 +578,7 @@ class AIReceptionistService:
             
         except Exception as e:
             logger.error(f"Error generating conversation summary: {e}")
+            if not fallback_on_error:
+                raise
             return f"Conversation with {len(conversation_turns)} exchanges - summary generation failed"
 
@@ -0,0 +1,63 @@
+import os
+import logging
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+logger = logging.getLogger(__name__)
+
+# Async drivers for the database backends the app supports
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg'
+}
+
+def async_database_url(database_url: str) -> str:
+    """The same database as a SQLAlchemy URL with an asyncio driver"""
+    url = make_url(database_url.replace('postgres://', 'postgresql://', 1))
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend} databases; set ASYNC_DATABASE_URL')
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+class AsyncDatabase:
+    """
+    asyncio engine and sessions for the ASGI webhooks (src/asgi.py).
+
+    Uses the Flask app's database and the same model classes as db.Model, so
+    async and sync views read and write the same rows. Sessions don't expire
+    objects on commit: nothing can lazy-load afterwards without an await.
+    Call init_app() before the first session.
+    """
+
+    def __init__(self):
+        self.engine: Optional[AsyncEngine] = None
+        self.session_factory: Optional[async_sessionmaker] = None
+
+    def init_app(self, app):
+        url = os.getenv('ASYNC_DATABASE_URL') or async_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        options = {}
+        if make_url(url).get_backend_name() == 'sqlite':
+            # Wait for the sync app's writers instead of failing with "database is locked"
+            options['connect_args'] = {'timeout': 15}
+        else:
+            options['pool_size'] = int(os.getenv('ASYNC_DB_POOL_SIZE', '20'))
+            options['max_overflow'] = int(os.getenv('ASYNC_DB_MAX_OVERFLOW', '10'))
+            options['pool_pre_ping'] = True
+
+        self.engine = create_async_engine(url, **options)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+        logger.info(f"Async database: {make_url(url).render_as_string(hide_password=True)}")
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def session(self) -> AsyncSession:
+        """New session; use as `async with async_db.session() as session:`"""
+        return self.session_factory()
+
+    async def dispose(self):
+        if self.engine is not None:
+            await self.engine.dispose()
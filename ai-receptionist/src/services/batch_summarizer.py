@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, update
+
+from src.models.call import Call, ConversationTurn, db
+from src.services.token_budget import count_tokens, count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+BATCH_SUMMARY_PROMPT = (
+    "You will receive several phone conversations between patients and the AI receptionist "
+    "of a medical practice, each introduced by a line 'CALL <id>'. Summarize each one separately. "
+    "Include: patient's main request, any appointments scheduled, information provided, and next "
+    "steps. Keep each summary concise and professional (at most 3 sentences). "
+    'Reply with a JSON object mapping each call id (as a string) to its summary, e.g. {"12": "..."}.'
+)
+
+# Completion tokens reserved per call in a batch
+SUMMARY_TOKENS_PER_CALL = 120
+
+# A summary claim older than this is taken to belong to a crashed run and can be taken over
+SUMMARY_CLAIM_SECONDS = 600
+
+def claim_for_summary(call_ids: List[int], lease_seconds: float = SUMMARY_CLAIM_SECONDS) -> List[int]:
+    """
+    Claim unsummarized calls before sending them to the LLM, so the post-call
+    worker and the batch summarizer never summarize the same call twice.
+    Returns the ids that were claimed; calls already summarized or claimed
+    by someone else are left out.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=lease_seconds)
+    claimed = []
+    for call_id in call_ids:
+        result = db.session.execute(
+            update(Call).where(
+                Call.id == call_id,
+                Call.summarized_at.is_(None),
+                or_(Call.summary_claimed_at.is_(None), Call.summary_claimed_at < stale)
+            ).values(summary_claimed_at=now)
+        )
+        if result.rowcount == 1:
+            claimed.append(call_id)
+    db.session.commit()
+    return claimed
+
+def release_summary_claims(call_ids: List[int]):
+    """Give up claims on calls that were not summarized, so the next run can retry them"""
+    if call_ids:
+        db.session.execute(
+            update(Call).where(Call.id.in_(call_ids), Call.summarized_at.is_(None)).values(summary_claimed_at=None)
+        )
+        db.session.commit()
+
+class BatchSummarizer:
+    """
+    Summarizes ended calls that have no summary yet, many per LLM request.
+    Calls are claimed first (claim_for_summary), so one the post-call worker
+    is already summarizing is left to it.
+
+    Transcripts are packed into batches that stay under batch_tokens of prompt
+    (and max_calls_per_batch calls); up to max_concurrency batches are in
+    flight at once. All turns are loaded with one query up front and the
+    summaries are written back with one bulk UPDATE, so the database isn't
+    touched per call.
+
+    Must run inside a Flask app context.
+    """
+
+    def __init__(self, ai_service, max_concurrency: int = 4, batch_tokens: int = 6000,
+                 max_calls_per_batch: int = 10, model: str = 'gpt-3.5-turbo'):
+        self.ai_service = ai_service
+        self.max_concurrency = max_concurrency
+        self.batch_tokens = batch_tokens
+        self.max_calls_per_batch = max_calls_per_batch
+        self.model = model
+
+    @classmethod
+    def from_env(cls, ai_service) -> 'BatchSummarizer':
+        return cls(
+            ai_service,
+            max_concurrency=int(os.getenv('BATCH_SUMMARY_CONCURRENCY', '4')),
+            batch_tokens=int(os.getenv('BATCH_SUMMARY_TOKENS', '6000')),
+            max_calls_per_batch=int(os.getenv('BATCH_SUMMARY_MAX_CALLS', '10'))
+        )
+
+    def run(self, limit: int = 500, since: Optional[datetime] = None) -> Dict:
+        """
+        Summarize up to `limit` unsummarized calls that ended after `since`
+        (default: the last 7 days). Returns counts and timing.
+        """
+        started = time.perf_counter()
+        since = since or datetime.utcnow() - timedelta(days=7)
+
+        transcripts = self._load_transcripts(limit, since)
+        batches = self.make_batches(transcripts)
+        try:
+            summaries = asyncio.run(self._summarize_batches(batches)) if batches else {}
+
+            if summaries:
+                now = datetime.utcnow()
+                db.session.execute(update(Call), [
+                    {'id': call_id, 'conversation_summary': summary, 'summarized_at': now}
+                    for call_id, summary in summaries.items()
+                ])
+                db.session.commit()
+        finally:
+            db.session.rollback()
+            release_summary_claims(list(transcripts))
+
+        result = {
+            'calls': len(transcripts),
+            'batches': len(batches),
+            'summarized': len(summaries),
+            'missing': len(transcripts) - len(summaries),
+            'seconds': round(time.perf_counter() - started, 2)
+        }
+        logger.info(f"Batch summary run: {result}")
+        return result
+
+    def make_batches(self, transcripts: Dict[int, str]) -> List[Dict[int, str]]:
+        """Pack transcripts into batches under the prompt token budget (first fit, in call order)"""
+        overhead = count_tokens(BATCH_SUMMARY_PROMPT) + 10
+        # A single transcript may use the whole budget; longer ones keep their most recent lines
+        per_call_budget = self.batch_tokens - overhead
+
+        batches, batch, batch_tokens = [], {}, overhead
+        for call_id, transcript in transcripts.items():
+            tokens = count_tokens(transcript) + 8  # plus the 'CALL <id>' header
+            if tokens > per_call_budget:
+                transcript = self._truncate(transcript, per_call_budget - 8)
+                tokens = per_call_budget
+
+            if batch and (batch_tokens + tokens > self.batch_tokens or len(batch) >= self.max_calls_per_batch):
+                batches.append(batch)
+                batch, batch_tokens = {}, overhead
+            batch[call_id] = transcript
+            batch_tokens += tokens
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _load_transcripts(self, limit: int, since: datetime) -> Dict[int, str]:
+        call_ids = [call_id for (call_id,) in db.session.query(Call.id).filter(
+            Call.call_end_time.isnot(None),
+            Call.call_end_time >= since,
+            Call.summarized_at.is_(None)
+        ).order_by(Call.call_end_time).limit(limit).all()]
+        # Calls the post-call worker (or another run) is summarizing right now are skipped
+        call_ids = claim_for_summary(call_ids)
+        if not call_ids:
+            return {}
+
+        lines = {call_id: [] for call_id in call_ids}
+        turns = db.session.query(
+            ConversationTurn.call_id, ConversationTurn.speaker, ConversationTurn.message
+        ).filter(ConversationTurn.call_id.in_(call_ids)).order_by(
+            ConversationTurn.call_id, ConversationTurn.turn_number
+        ).all()
+        for call_id, speaker, message in turns:
+            lines[call_id].append(f"{speaker}: {message}")
+
+        # Calls without any turns get the same text generate_conversation_summary would give them
+        empty = [call_id for call_id, call_lines in lines.items() if not call_lines]
+        if empty:
+            db.session.execute(update(Call), [
+                {'id': call_id, 'conversation_summary': 'No conversation recorded', 'summarized_at': datetime.utcnow()}
+                for call_id in empty
+            ])
+            db.session.commit()
+
+        return {call_id: '\n'.join(call_lines) for call_id, call_lines in lines.items() if call_lines}
+
+    async def _summarize_batches(self, batches: List[Dict[int, str]]) -> Dict[int, str]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def summarize(batch):
+            async with semaphore:
+                return await self._summarize_batch(batch)
+
+        summaries = {}
+        for result in await asyncio.gather(*(summarize(batch) for batch in batches)):
+            summaries.update(result)
+        return summaries
+
+    async def _summarize_batch(self, batch: Dict[int, str]) -> Dict[int, str]:
+        """One LLM request for a batch; calls missing from the reply are left for the next run"""
+        messages = [
+            {'role': 'system', 'content': BATCH_SUMMARY_PROMPT},
+            {'role': 'user', 'content': '\n\n'.join(
+                f"CALL {call_id}\n{transcript}" for call_id, transcript in batch.items()
+            )}
+        ]
+        try:
+            response = await self.ai_service.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=SUMMARY_TOKENS_PER_CALL * len(batch),
+                temperature=0.3,
+                response_format={'type': 'json_object'}
+            )
+            reply = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"Batch summary request for {len(batch)} calls "
+                         f"({count_message_tokens(messages)} prompt tokens) failed: {e}")
+            return {}
+
+        summaries = {}
+        for call_id in batch:
+            summary = reply.get(str(call_id))
+            if isinstance(summary, str) and summary.strip():
+                summaries[call_id] = summary.strip()
+        if len(summaries) < len(batch):
+            logger.warning(f"Batch summary reply covered {len(summaries)} of {len(batch)} calls")
+        return summaries
+
+    @staticmethod
+    def _truncate(transcript: str, budget: int) -> str:
+        kept = []
+        for line in reversed(transcript.split('\n')):
+            budget -= count_tokens(line) + 1
+            if budget < 0:
+                break
+            kept.append(line)
+        return '\n'.join(reversed(kept))
@@ -0,0 +1,158 @@
+import logging
+from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.models.call import CallAnalytics, db
+
+logger = logging.getLogger(__name__)
+
+# Twilio statuses for calls that never connected
+MISSED_CALL_STATUSES = ['no-answer', 'busy', 'failed', 'canceled', 'missed']
+
+# CallAnalytics intent columns
+INTENT_COLUMNS = {
+    'appointment_scheduling': 'scheduling_intents',
+    'appointment_modification': 'scheduling_intents',
+    'service_inquiry': 'information_intents',
+    'general_info': 'information_intents',
+    'billing_inquiry': 'billing_intents',
+    'emergency': 'emergency_intents'
+}
+
+class CallAnalyticsRollup:
+    """
+    Keeps the daily CallAnalytics rows up to date as calls start, transfer and
+    end, instead of recounting the calls table.
+
+    Each event is a single INSERT ... ON CONFLICT (date) DO UPDATE whose SET
+    clause is computed from the stored row (counter + 1, running averages),
+    so concurrent workers never lose updates. Statements run in the caller's
+    session and are committed with the call record they describe.
+
+    A call is attributed to the day it started (UTC). Callers fire each event
+    once per call, on the state change (e.g. the first 'completed' status).
+
+    The *_upsert methods return the statement instead of executing it, for
+    callers with their own session (the ASGI webhooks' AsyncSession).
+    """
+
+    def call_started(self, call):
+        db.session.execute(self.call_started_upsert(call))
+
+    def call_transferred(self, call):
+        db.session.execute(self.call_transferred_upsert(call))
+
+    def call_ended(self, call, answered: bool = True):
+        db.session.execute(self.call_ended_upsert(call, answered))
+
+    def call_started_upsert(self, call, dialect: Optional[str] = None):
+        direction = 'outbound_calls' if call.call_type == 'outbound' else 'inbound_calls'
+        return self._upsert(self._day(call), {'total_calls': 1, direction: 1}, dialect=dialect)
+
+    def call_transferred_upsert(self, call, dialect: Optional[str] = None):
+        return self._upsert(self._day(call), {'human_transfer_calls': 1}, dialect=dialect)
+
+    def call_ended_upsert(self, call, answered: bool = True, dialect: Optional[str] = None):
+        counters = {'answered_calls' if answered else 'missed_calls': 1}
+        averages = []
+
+        if answered:
+            averages.append(('average_call_duration', 'answered_calls', float(call.call_duration or 0)))
+            if not call.human_transfer_required:
+                counters['ai_handled_calls'] = 1
+
+        if call.ai_confidence_score is not None:
+            counters['ai_confidence_samples'] = 1
+            averages.append(('average_ai_confidence', 'ai_confidence_samples', float(call.ai_confidence_score)))
+
+        counters[INTENT_COLUMNS.get(call.intent_detected, 'other_intents')] = 1
+        if call.appointment_created:
+            counters['appointments_scheduled'] = 1
+
+        return self._upsert(self._day(call), counters, averages, dialect=dialect)
+
+    def summary(self, start_day: date, end_day: date) -> Tuple[Dict, List[Dict]]:
+        """Totals over a date range (inclusive) and the daily rows; reads at most one row per day"""
+        rows = CallAnalytics.query.filter(
+            CallAnalytics.date >= start_day, CallAnalytics.date <= end_day
+        ).order_by(CallAnalytics.date).all()
+
+        def total(column):
+            return sum(getattr(row, column) or 0 for row in rows)
+
+        def weighted_average(column, weight):
+            weights = total(weight)
+            if not weights:
+                return 0.0
+            return sum((getattr(row, column) or 0) * (getattr(row, weight) or 0) for row in rows) / weights
+
+        totals = {column: total(column) for column in (
+            'total_calls', 'inbound_calls', 'outbound_calls', 'answered_calls', 'missed_calls',
+            'ai_handled_calls', 'human_transfer_calls', 'appointments_scheduled', 'scheduling_intents',
+            'information_intents', 'billing_intents', 'emergency_intents', 'other_intents'
+        )}
+        totals['average_call_duration'] = weighted_average('average_call_duration', 'answered_calls')
+        totals['average_ai_confidence'] = weighted_average('average_ai_confidence', 'ai_confidence_samples')
+        totals['appointment_success_rate'] = (
+            totals['appointments_scheduled'] / totals['scheduling_intents'] * 100
+            if totals['scheduling_intents'] else 0.0
+        )
+        return totals, [row.to_dict() for row in rows]
+
+    def _upsert(self, day: date, counters: Dict[str, int], averages: Optional[List[Tuple[str, str, float]]] = None,
+                dialect: Optional[str] = None):
+        """
+        Upsert of the day's row: add counters, and fold each (average column, sample
+        count column, value) into its running average. Sample count columns must
+        also be incremented in counters.
+        """
+        columns = CallAnalytics.__table__.c
+        now = datetime.utcnow()
+
+        def current(name):
+            return func.coalesce(columns[name], 0)
+
+        inserted = dict(counters)
+        updated = {name: current(name) + delta for name, delta in counters.items()}
+
+        for average_column, count_column, value in averages or []:
+            inserted[average_column] = value
+            updated[average_column] = (
+                (current(average_column) * current(count_column) + value) / (current(count_column) + 1)
+            )
+
+        if 'scheduling_intents' in counters or 'appointments_scheduled' in counters:
+            scheduling = current('scheduling_intents') + counters.get('scheduling_intents', 0)
+            appointments = current('appointments_scheduled') + counters.get('appointments_scheduled', 0)
+            updated['appointment_success_rate'] = case(
+                (scheduling > 0, appointments * 100.0 / scheduling), else_=0.0
+            )
+            inserted_scheduling = counters.get('scheduling_intents', 0)
+            inserted['appointment_success_rate'] = (
+                counters.get('appointments_scheduled', 0) * 100.0 / inserted_scheduling if inserted_scheduling else 0.0
+            )
+
+        insert = self._insert_for_dialect(dialect)(CallAnalytics.__table__).values(
+            date=day, created_at=now, updated_at=now, **inserted
+        )
+        return insert.on_conflict_do_update(
+            index_elements=[columns.date],
+            set_={**updated, 'updated_at': now}
+        )
+
+    @staticmethod
+    def _insert_for_dialect(dialect: Optional[str] = None):
+        dialect = dialect or db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return postgresql_insert
+        if dialect == 'sqlite':
+            return sqlite_insert
+        raise NotImplementedError(f'Call analytics upserts are not implemented for {dialect}')
+
+    @staticmethod
+    def _day(call) -> date:
+        return (call.call_start_time or datetime.utcnow()).date()
@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'call_sessions.db')
+
+class CallSessionStore:
+    """
+    Per-call conversation state: the most recent turns (bounded), the total
+    turn count and a little call metadata.
+
+    Turn handling reads and appends one session instead of re-querying and
+    deserializing every ConversationTurn of the call, so its cost no longer
+    grows with the length of the conversation. Sessions expire after
+    ttl_seconds without activity.
+
+    With a db_path (the default) sessions live in a SQLite table, keyed by
+    call id, so every worker sees the same state. Without one they are kept
+    in process memory, which is only correct for a single worker.
+    """
+
+    def __init__(self, max_turns: int = 12, ttl_seconds: int = 3600, db_path: Optional[str] = None):
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._sessions = {}  # call_id -> (session, expires_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if self.db_path:
+            try:
+                self._create_table()
+            except sqlite3.Error as e:
+                logger.error(f"Call session database unavailable, using memory only: {e}")
+                self.db_path = None
+
+    @classmethod
+    def from_env(cls) -> 'CallSessionStore':
+        db_path = os.getenv('CALL_SESSION_DB', DEFAULT_SESSION_DB)
+        return cls(
+            max_turns=int(os.getenv('CALL_SESSION_MAX_TURNS', '12')),
+            ttl_seconds=int(os.getenv('CALL_SESSION_TTL_SECONDS', '3600')),
+            db_path=db_path or None
+        )
+
+    def get(self, call_id) -> Optional[Dict]:
+        """
+        Return {'turns': [...], 'turn_count': n, 'metadata': {...}} or None if
+        the call has no live session.
+        """
+        key = str(call_id)
+        now = time.time()
+
+        if self.db_path:
+            try:
+                row = self._connection().execute(
+                    'SELECT data FROM call_sessions WHERE call_id = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+                return json.loads(row[0]) if row else None
+            except sqlite3.Error as e:
+                logger.warning(f"Call session read failed for {key}: {e}")
+                return None
+
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            session, expires_at = entry
+            if expires_at <= now:
+                del self._sessions[key]
+                return None
+            return {'turns': list(session['turns']), 'turn_count': session['turn_count'],
+                    'metadata': dict(session['metadata'])}
+
+    def put(self, call_id, turns: List[Dict], turn_count: int, metadata: Optional[Dict] = None):
+        """Replace a call's session, e.g. after loading it from the database"""
+        self._write(str(call_id), {
+            'turns': list(turns)[-self.max_turns:],
+            'turn_count': turn_count,
+            'metadata': metadata or {}
+        })
+
+    def append_turns(self, call_id, turns: List[Dict]) -> bool:
+        """
+        Append new turns to an existing session. Returns False if there is no
+        live session, so the next read falls back to the database.
+        """
+        key = str(call_id)
+
+        if self.db_path:
+            try:
+                connection = self._connection()
+                # BEGIN IMMEDIATE takes the write lock first so concurrent appends can't interleave
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    row = connection.execute(
+                        'SELECT data FROM call_sessions WHERE call_id = ? AND expires_at > ?', (key, time.time())
+                    ).fetchone()
+                    if not row:
+                        connection.execute('ROLLBACK')
+                        return False
+                    session = json.loads(row[0])
+                    session['turns'] = (session['turns'] + list(turns))[-self.max_turns:]
+                    session['turn_count'] += len(turns)
+                    self._upsert(connection, key, session)
+                    connection.execute('COMMIT')
+                    return True
+                except Exception:
+                    connection.execute('ROLLBACK')
+                    raise
+            except sqlite3.Error as e:
+                logger.warning(f"Call session append failed for {key}: {e}")
+                self.discard(call_id)
+                return False
+
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None or entry[1] <= time.time():
+                self._sessions.pop(key, None)
+                return False
+            session = entry[0]
+            session['turns'].extend(turns)
+            session['turn_count'] += len(turns)
+            self._sessions[key] = (session, time.time() + self.ttl_seconds)
+            return True
+
+    def discard(self, call_id):
+        """Drop a call's session (call ended, or state may be out of date)"""
+        key = str(call_id)
+        if self.db_path:
+            try:
+                with self._connection() as connection:
+                    connection.execute('DELETE FROM call_sessions WHERE call_id = ?', (key,))
+            except sqlite3.Error as e:
+                logger.warning(f"Call session delete failed for {key}: {e}")
+            return
+
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def _write(self, key: str, session: Dict):
+        if self.db_path:
+            try:
+                with self._connection() as connection:
+                    self._upsert(connection, key, session)
+                    # Opportunistically clear out sessions of calls that went quiet
+                    connection.execute('DELETE FROM call_sessions WHERE expires_at <= ?', (time.time(),))
+            except sqlite3.Error as e:
+                logger.warning(f"Call session write failed for {key}: {e}")
+            return
+
+        with self._lock:
+            self._sessions[key] = ({
+                'turns': deque(session['turns'], maxlen=self.max_turns),
+                'turn_count': session['turn_count'],
+                'metadata': session['metadata']
+            }, time.time() + self.ttl_seconds)
+
+            now = time.time()
+            for expired_key in [k for k, (_, expires_at) in self._sessions.items() if expires_at <= now]:
+                del self._sessions[expired_key]
+
+    def _upsert(self, connection: sqlite3.Connection, key: str, session: Dict):
+        connection.execute(
+            'INSERT OR REPLACE INTO call_sessions (call_id, data, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(session), time.time() + self.ttl_seconds)
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _create_table(self):
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS call_sessions ('
+            'call_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_call_sessions_expires_at ON call_sessions (expires_at)')
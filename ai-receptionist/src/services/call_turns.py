@@ -0,0 +1,218 @@
+"""
+Turn bookkeeping shared by the Flask voice webhooks (voice.py, twilio_voice.py)
+and their async versions (async_voice.py).
+
+The helpers build turn records, change the call record and return rollup
+statements and CRM payloads without doing any I/O themselves, so each view
+only adds its own (awaited or blocking) flush, execute and commit around them.
+The blocking flows used by both Flask blueprints live here too.
+"""
+
+import json
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from src.models.call import Call, ConversationTurn, db
+from src.services.call_rollups import CallAnalyticsRollup
+from src.services.turn_timing import TurnTimer
+
+logger = logging.getLogger(__name__)
+
+call_rollups = CallAnalyticsRollup()
+
+def recent_turns_query(call_id: int, limit: int):
+    """The call's most recent turns, newest first"""
+    return select(ConversationTurn).where(ConversationTurn.call_id == call_id).order_by(
+        ConversationTurn.turn_number.desc()
+    ).limit(limit)
+
+def turn_count_query(call_id: int):
+    return select(func.count(ConversationTurn.id)).where(ConversationTurn.call_id == call_id)
+
+def new_call_session(recent_turns: List[ConversationTurn], turn_count: int, metadata: dict) -> dict:
+    """Session store entry for turns loaded newest first from recent_turns_query"""
+    return {
+        'turns': [turn.to_dict() for turn in reversed(recent_turns)],
+        'turn_count': turn_count,
+        'metadata': metadata
+    }
+
+def load_call_session(call_sessions, call_id: int, metadata: dict) -> dict:
+    """
+    Recent turns and turn count of a call from the session store, loading them
+    from the database only when the call has no live session.
+    """
+    session = call_sessions.get(call_id)
+    if session is None:
+        recent_turns = db.session.scalars(recent_turns_query(call_id, call_sessions.max_turns)).all()
+        session = new_call_session(recent_turns, db.session.scalar(turn_count_query(call_id)), metadata)
+        call_sessions.put(call_id, session['turns'], session['turn_count'], metadata)
+    return session
+
+def mark_transferred(call_record: Call, reason: str, dialect: Optional[str] = None):
+    """
+    Flag the call for a human transfer. Returns the rollup statement to execute
+    with the change the first time a call is transferred, otherwise None.
+    """
+    rollup = None
+    if not call_record.human_transfer_required:
+        rollup = call_rollups.call_transferred_upsert(call_record, dialect)
+    call_record.human_transfer_required = True
+    call_record.transfer_reason = reason
+    return rollup
+
+def build_speech_turns(call_record: Call, previous_turns: int, speech_text: str, intent: str, confidence: float,
+                       entities: dict, ai_response: str,
+                       speech_confidence: Optional[float] = None) -> Tuple[ConversationTurn, ConversationTurn]:
+    """
+    The patient turn and AI reply of one exchange. The patient turn gets
+    speech_confidence (the recognizer's) if given, otherwise the intent confidence.
+    """
+    patient_turn = ConversationTurn(
+        call_id=call_record.id,
+        turn_number=previous_turns + 1,
+        speaker='patient',
+        message=speech_text,
+        intent=intent,
+        entities=json.dumps(entities),
+        confidence_score=confidence if speech_confidence is None else speech_confidence
+    )
+    ai_turn = ConversationTurn(
+        call_id=call_record.id,
+        turn_number=previous_turns + 2,
+        speaker='ai',
+        message=ai_response,
+        intent=f'response_to_{intent}',
+        confidence_score=0.9
+    )
+    return patient_turn, ai_turn
+
+def update_call_for_turn(call_record: Call, intent: str, confidence: float, entities: dict,
+                         should_transfer: bool, transfer_reason: str, dialect: Optional[str] = None):
+    """Apply a turn's outcome to the call record; returns a transfer rollup statement or None"""
+    call_record.intent_detected = intent
+    call_record.ai_confidence_score = confidence
+    call_record.set_entities(entities)
+    if should_transfer:
+        return mark_transferred(call_record, transfer_reason, dialect)
+    return None
+
+def finish_speech_turns(patient_turn: ConversationTurn, ai_turn: ConversationTurn, timer: TurnTimer,
+                        db_started: float) -> List[Dict]:
+    """
+    Store the turn's stage timings on the AI turn and return both turns as
+    session store dicts. The turns must be flushed (ids, timestamps); the 'db'
+    stage covers the inserts and updates but not the commit that persists them.
+    """
+    timer.add('db', (time.perf_counter() - db_started) * 1000)
+    timings = timer.to_dict()
+    ai_turn.processing_time = timings['total']
+    ai_turn.set_stage_timings(timings)
+    return [patient_turn.to_dict(), ai_turn.to_dict()]
+
+def record_speech_turn(call_sessions, call_record: Call, speech_text: str, intent: str, confidence: float,
+                       entities: dict, previous_turns: int, ai_response: str, should_transfer: bool,
+                       transfer_reason: str, timer: TurnTimer, speech_confidence: Optional[float] = None):
+    """
+    Log the patient turn and AI reply and update the call record, committing
+    any appointment fields set during the turn with them.
+    """
+    db_started = time.perf_counter()
+
+    patient_turn, ai_turn = build_speech_turns(call_record, previous_turns, speech_text, intent, confidence,
+                                               entities, ai_response, speech_confidence)
+    db.session.add_all([patient_turn, ai_turn])
+    # Flush to assign ids/timestamps so the turns can go to the session store without reloading
+    db.session.flush()
+
+    rollup = update_call_for_turn(call_record, intent, confidence, entities, should_transfer, transfer_reason)
+    if rollup is not None:
+        db.session.execute(rollup)
+
+    new_turns = finish_speech_turns(patient_turn, ai_turn, timer, db_started)
+    db.session.commit()
+    call_sessions.append_turns(call_record.id, new_turns)
+
+def consultation_request_data(caller_name: Optional[str], phone_number: str, entities: dict,
+                              patient_message: str) -> dict:
+    """CRMIntegrationService.create_consultation_request data for a scheduling turn"""
+    patient_name = entities.get('patient_name', caller_name or '')
+    return {
+        'first_name': patient_name.split()[0] if patient_name else '',
+        'last_name': ' '.join(patient_name.split()[1:]) if len(patient_name.split()) > 1 else '',
+        'phone': phone_number,
+        'service_type': entities.get('service_type', 'wellness_consultation'),
+        'preferred_date': entities.get('preferred_date', ''),
+        'preferred_time': entities.get('preferred_time', ''),
+        'reason_for_visit': patient_message,
+        'source': 'ai_receptionist_call'
+    }
+
+def scheduling_result(consultation_result: dict, check_availability: bool = False,
+                      availability_result: Optional[dict] = None) -> dict:
+    result = {
+        'success': consultation_result['success'],
+        'request_id': consultation_result.get('request_id'),
+        'message': consultation_result.get('message', 'Consultation request processed')
+    }
+    if check_availability:
+        result['availability'] = availability_result
+        result['message'] = 'Appointment request processed'
+    return result
+
+def scheduling_error(e: Exception) -> dict:
+    logger.error(f"Error handling appointment scheduling: {e}")
+    return {
+        'success': False,
+        'error': str(e),
+        'message': 'Failed to process appointment request'
+    }
+
+def schedule_consultation(crm_service, caller_name: Optional[str], phone_number: str, entities: dict,
+                          patient_message: str, check_availability: bool = False) -> dict:
+    """
+    Create a CRM consultation request for a scheduling turn, checking the
+    requested slot first if asked. Only calls the CRM, so it can run as a turn
+    pipeline stage; apply_appointment_result() records the outcome on the call.
+    """
+    try:
+        request_data = consultation_request_data(caller_name, phone_number, entities, patient_message)
+        availability_result = None
+        if check_availability and request_data['preferred_date']:
+            availability_result = crm_service.check_appointment_availability(
+                request_data['preferred_date'], request_data['preferred_time'], request_data['service_type']
+            )
+        consultation_result = crm_service.create_consultation_request(request_data)
+        return scheduling_result(consultation_result, check_availability, availability_result)
+    except Exception as e:
+        return scheduling_error(e)
+
+async def schedule_consultation_async(crm_service, caller_name: Optional[str], phone_number: str, entities: dict,
+                                      patient_message: str, check_availability: bool = False) -> dict:
+    """schedule_consultation for the ASGI webhooks"""
+    try:
+        request_data = consultation_request_data(caller_name, phone_number, entities, patient_message)
+        availability_result = None
+        if check_availability and request_data['preferred_date']:
+            availability_result = await crm_service.check_appointment_availability_async(
+                request_data['preferred_date'], request_data['preferred_time'], request_data['service_type']
+            )
+        consultation_result = await crm_service.create_consultation_request_async(request_data)
+        return scheduling_result(consultation_result, check_availability, availability_result)
+    except Exception as e:
+        return scheduling_error(e)
+
+def apply_appointment_result(call_record: Call, appointment_result: Optional[dict]) -> bool:
+    """
+    Record a successful consultation request on the call (not committed).
+    Returns True if the call record changed.
+    """
+    if not appointment_result or not appointment_result.get('success'):
+        return False
+    call_record.appointment_created = True
+    call_record.appointment_id = appointment_result['request_id']
+    call_record.follow_up_required = True
+    return True
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+def normalize_phone(phone: str) -> Optional[str]:
+    """
+    Normalize a phone number to E.164 (+14845550199), the form the CRM indexes.
+    Numbers without a country code are taken as US numbers.
+    """
+    if not phone:
+        return None
+    digits = ''.join(filter(str.isdigit, phone))
+    if phone.strip().startswith('+'):
+        return f'+{digits}' if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return f'+1{digits}'
+    if len(digits) == 11 and digits[0] == '1':
+        return f'+{digits}'
+    return None
+
+# CRM base URL -> cache shared by every CRMIntegrationService in the process
+_shared_caches: Dict[str, 'CallerLookupCache'] = {}
+_shared_caches_lock = threading.Lock()
+
+class CallerLookupCache:
+    """
+    In-process LRU cache of caller ID (E.164 phone) -> CRM patient record.
+
+    Unknown numbers are cached too (negative caching) with a shorter TTL, so
+    repeat calls from new callers don't hit the CRM either, while a patient
+    registered in the meantime is picked up soon after. Use shared() so a
+    patient created through one service instance replaces the "unknown
+    caller" entry every other instance sees.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 900, negative_ttl_seconds: int = 120):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        self._entries = OrderedDict()  # phone -> (patient or None, expires_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def shared(cls, crm_base_url: str) -> 'CallerLookupCache':
+        """The process-wide cache for a CRM, created from the environment on first use"""
+        crm_base_url = crm_base_url.rstrip('/')
+        with _shared_caches_lock:
+            cache = _shared_caches.get(crm_base_url)
+            if cache is None:
+                cache = _shared_caches[crm_base_url] = cls.from_env()
+            return cache
+
+    @classmethod
+    def from_env(cls) -> 'CallerLookupCache':
+        return cls(
+            max_entries=int(os.getenv('CALLER_CACHE_SIZE', '10000')),
+            ttl_seconds=int(os.getenv('CALLER_CACHE_TTL_SECONDS', '900')),
+            negative_ttl_seconds=int(os.getenv('CALLER_CACHE_NEGATIVE_TTL_SECONDS', '120'))
+        )
+
+    def get(self, phone: str) -> Tuple[bool, Optional[Dict]]:
+        """Return (cached, patient); patient is None for a cached unknown caller"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry is not None:
+                patient, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(phone)
+                    self.hits += 1
+                    if patient is None:
+                        self.negative_hits += 1
+                    return True, patient
+                del self._entries[phone]
+            self.misses += 1
+            return False, None
+
+    def put(self, phone: str, patient: Optional[Dict]):
+        ttl = self.ttl_seconds if patient is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[phone] = (patient, time.monotonic() + ttl)
+            self._entries.move_to_end(phone)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, phone: str):
+        with self._lock:
+            self._entries.pop(phone, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'negative_ttl_seconds': self.negative_ttl_seconds,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,384 @@
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Set
+
+from src.models.call import Call, db
+from src.models.campaign import ConfirmationCampaign, CampaignCall
+from src.services.call_rollups import CallAnalyticsRollup
+
+logger = logging.getLogger(__name__)
+
+# Twilio call statuses in the order a call moves through them; callbacks can
+# arrive out of order, so a status never replaces a later one
+CALL_STATUS_ORDER = ['pending', 'dialing', 'queued', 'initiated', 'ringing', 'in-progress']
+FINAL_STATUSES = ['completed', 'busy', 'no-answer', 'failed', 'canceled', 'error', 'skipped']
+ACTIVE_STATUSES = CALL_STATUS_ORDER[1:]
+
+def record_campaign_call_status(call_sid: str, call_status: str, call_duration=None,
+                                campaign_call_id=None) -> bool:
+    """
+    Apply a Twilio status callback to the campaign call it belongs to, if any.
+    campaign_call_id comes from the callback URL; it lets a callback that
+    arrives before the runner has stored the call's sid adopt the sid.
+    Runs in the caller's session; the caller commits.
+    """
+    campaign_call = CampaignCall.query.filter_by(call_sid=call_sid).first()
+    if campaign_call is None and campaign_call_id:
+        campaign_call = CampaignCall.query.filter_by(id=campaign_call_id, status='dialing', call_sid=None).first()
+        if campaign_call is not None:
+            campaign_call.call_sid = call_sid
+    if campaign_call is None or campaign_call.status in FINAL_STATUSES:
+        return False
+
+    if call_status in FINAL_STATUSES:
+        campaign_call.status = call_status
+        campaign_call.ended_at = datetime.utcnow()
+        campaign_call.call_duration = int(call_duration) if call_duration else 0
+    elif call_status in CALL_STATUS_ORDER and (
+        CALL_STATUS_ORDER.index(call_status) > CALL_STATUS_ORDER.index(campaign_call.status)
+    ):
+        campaign_call.status = call_status
+    return True
+
+class CallPacer:
+    """
+    Spaces out call requests to stay under Twilio's calls-per-second limit.
+    A 429 halves the rate for a while; successful calls bring it back up.
+    """
+
+    def __init__(self, calls_per_second: float):
+        self.min_interval = 1.0 / calls_per_second
+        self.interval = self.min_interval
+        self.next_at = 0.0
+
+    def wait_time(self) -> float:
+        return max(0.0, self.next_at - time.monotonic())
+
+    def sent(self):
+        self.next_at = time.monotonic() + self.interval
+
+    def throttled(self):
+        self.interval = min(self.interval * 2, 30.0)
+        self.next_at = time.monotonic() + self.interval
+
+    def succeeded(self):
+        self.interval = max(self.min_interval, self.interval * 0.9)
+
+class ConfirmationCampaignRunner:
+    """
+    Places appointment confirmation calls for a CRM date range.
+
+    - At most max_concurrency calls are in progress at once (from the request
+      to Twilio until the final status callback), and requests are paced to
+      calls_per_second, slowing down when Twilio answers 429.
+    - Every call's state lives in the campaign_calls table and is updated by
+      the /call-status callback, whose URL carries the campaign call id. A
+      runner that crashes can be started again with the same campaign: calls
+      that were being requested are matched by their callbacks, or looked up
+      in Twilio, instead of being dialed twice.
+    - Requests that fail with a 429, 5xx or network error are retried up to
+      max_attempts times; busy / no-answer outcomes are final.
+
+    Must run inside a Flask app context.
+    """
+
+    def __init__(self, twilio_service, crm_service, max_concurrency: int = 5, calls_per_second: float = 1.0,
+                 max_attempts: int = 3, retry_seconds: int = 60, stale_after_seconds: int = 900,
+                 callback_url: Optional[str] = None, poll_interval: float = 1.0):
+        self.twilio_service = twilio_service
+        self.crm_service = crm_service
+        self.max_concurrency = max_concurrency
+        self.calls_per_second = calls_per_second
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.stale_after_seconds = stale_after_seconds
+        self.callback_url = callback_url or f"{os.getenv('BASE_URL', 'https://your-domain.com')}/api/twilio/call-status"
+        self.poll_interval = poll_interval
+        self.call_rollups = CallAnalyticsRollup()
+
+    @classmethod
+    def from_env(cls, twilio_service, crm_service) -> 'ConfirmationCampaignRunner':
+        return cls(
+            twilio_service,
+            crm_service,
+            max_concurrency=int(os.getenv('CAMPAIGN_CONCURRENCY', '5')),
+            calls_per_second=float(os.getenv('CAMPAIGN_CALLS_PER_SECOND', '1')),
+            max_attempts=int(os.getenv('CAMPAIGN_MAX_ATTEMPTS', '3')),
+            retry_seconds=int(os.getenv('CAMPAIGN_RETRY_SECONDS', '60')),
+            stale_after_seconds=int(os.getenv('CAMPAIGN_STALE_SECONDS', '900'))
+        )
+
+    def create_campaign(self, start_date: date, end_date: date) -> ConfirmationCampaign:
+        """Snapshot the CRM's scheduled appointments in the range into a new campaign"""
+        result = self.crm_service.list_appointments(start_date.isoformat(), end_date.isoformat())
+        if not result['success']:
+            raise RuntimeError(f"Could not load appointments from the CRM: {result.get('error')}")
+
+        # Appointments already confirmed by an earlier campaign aren't called again
+        confirmed = {appointment_id for (appointment_id,) in db.session.query(CampaignCall.appointment_id).filter(
+            CampaignCall.appointment_id.in_([appointment['id'] for appointment in result['appointments']]),
+            CampaignCall.status == 'completed'
+        ).all()}
+
+        campaign = ConfirmationCampaign(start_date=start_date, end_date=end_date)
+        db.session.add(campaign)
+        db.session.flush()
+
+        seen = set()
+        for appointment in result['appointments']:
+            if appointment['id'] in seen:
+                continue
+            seen.add(appointment['id'])
+
+            campaign_call = CampaignCall(
+                campaign_id=campaign.id,
+                appointment_id=appointment['id'],
+                patient_name=appointment.get('patient_name'),
+                phone_number=appointment.get('patient_phone'),
+                appointment_date=appointment.get('appointment_date'),
+                appointment_time=(appointment.get('appointment_time') or '')[:5],
+                service_type=appointment.get('service_type'),
+                status='pending'
+            )
+            if not campaign_call.phone_number:
+                campaign_call.status, campaign_call.last_error = 'skipped', 'No phone number on file'
+            elif appointment['id'] in confirmed:
+                campaign_call.status, campaign_call.last_error = 'skipped', 'Already confirmed by an earlier campaign'
+            db.session.add(campaign_call)
+
+        db.session.commit()
+        logger.info(f"Created confirmation campaign {campaign.id} with {len(seen)} appointments "
+                    f"({start_date} to {end_date})")
+        return campaign
+
+    def run(self, campaign_id: int, stop_event: Optional[threading.Event] = None) -> Dict:
+        """Place the campaign's remaining calls and wait for them to finish; safe to re-run after a crash"""
+        stop_event = stop_event or threading.Event()
+        campaign = db.session.get(ConfirmationCampaign, campaign_id)
+        if campaign is None:
+            raise ValueError(f'Campaign {campaign_id} not found')
+
+        campaign.status = 'running'
+        campaign.started_at = campaign.started_at or datetime.utcnow()
+        db.session.commit()
+
+        self._recover_dialing(campaign_id)
+        last_recover = time.monotonic()
+
+        pacer = CallPacer(self.calls_per_second)
+        in_flight = {}  # placement future -> campaign call id
+        last_reconcile = 0.0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='campaign-dial') as pool:
+            while not stop_event.is_set():
+                for future in [future for future in in_flight if future.done()]:
+                    self._placed(in_flight.pop(future), future.result(), pacer)
+
+                if time.monotonic() - last_reconcile > 60:
+                    self._reconcile_stale(campaign_id)
+                    last_reconcile = time.monotonic()
+
+                # Calls still 'dialing' that this runner didn't send: retry lookups that failed
+                if time.monotonic() - last_recover > self.retry_seconds:
+                    self._recover_dialing(campaign_id, exclude=set(in_flight.values()))
+                    last_recover = time.monotonic()
+
+                # See the callbacks' updates made by the web app
+                db.session.expire_all()
+                active = CampaignCall.query.filter(
+                    CampaignCall.campaign_id == campaign_id, CampaignCall.status.in_(ACTIVE_STATUSES)
+                ).count()
+
+                if active < self.max_concurrency and pacer.wait_time() == 0:
+                    campaign_call = self._next_due(campaign_id)
+                    if campaign_call is not None:
+                        in_flight[pool.submit(self._dial, campaign_call.to_dict())] = campaign_call.id
+                        pacer.sent()
+                        continue
+
+                if not in_flight and active == 0 and not self._has_pending(campaign_id):
+                    campaign.status = 'completed'
+                    campaign.completed_at = datetime.utcnow()
+                    db.session.commit()
+                    break
+
+                stop_event.wait(min(self.poll_interval, pacer.wait_time() or self.poll_interval))
+
+            # Stopped early: let requests already sent to Twilio finish and record them
+            for future, campaign_call_id in in_flight.items():
+                self._placed(campaign_call_id, future.result(), pacer)
+
+        stats = campaign.to_dict()
+        logger.info(f"Confirmation campaign {campaign_id}: {stats['calls_by_status']}")
+        return stats
+
+    def _next_due(self, campaign_id: int) -> Optional[CampaignCall]:
+        """Claim the next pending call (earliest appointment first) by marking it dialing"""
+        campaign_call = CampaignCall.query.filter(
+            CampaignCall.campaign_id == campaign_id,
+            CampaignCall.status == 'pending',
+            db.or_(CampaignCall.next_attempt_at.is_(None), CampaignCall.next_attempt_at <= datetime.utcnow())
+        ).order_by(CampaignCall.appointment_date, CampaignCall.appointment_time, CampaignCall.id).first()
+        if campaign_call is None:
+            return None
+
+        campaign_call.status = 'dialing'
+        campaign_call.dialing_at = datetime.utcnow()
+        campaign_call.attempts = (campaign_call.attempts or 0) + 1
+        db.session.commit()
+        return campaign_call
+
+    def _has_pending(self, campaign_id: int) -> bool:
+        return db.session.query(CampaignCall.query.filter_by(campaign_id=campaign_id, status='pending').exists()).scalar()
+
+    def _dial(self, campaign_call: Dict) -> Dict:
+        # Runs on a pool thread: Twilio request only, the database is written by the run loop
+        separator = '&' if '?' in self.callback_url else '?'
+        return self.twilio_service.make_appointment_confirmation_call(
+            campaign_call['phone_number'],
+            {
+                'date': campaign_call['appointment_date'],
+                'time': campaign_call['appointment_time'],
+                'service': campaign_call['service_type'],
+                'patient_name': (campaign_call['patient_name'] or '').split(' ')[0]
+            },
+            callback_url=f"{self.callback_url}{separator}campaign_call_id={campaign_call['id']}"
+        )
+
+    def _placed(self, campaign_call_id: int, result: Dict, pacer: CallPacer):
+        campaign_call = db.session.get(CampaignCall, campaign_call_id)
+
+        if result['success']:
+            pacer.succeeded()
+            campaign_call.call_sid = result['call_sid']
+            # A callback may have been applied before this (matched by the campaign call id in its URL)
+            if campaign_call.status == 'dialing':
+                campaign_call.status = result.get('status') or 'queued'
+            self._add_call_record(campaign_call)
+            db.session.commit()
+            return
+
+        http_status = result.get('http_status')
+        if http_status == 429:
+            pacer.throttled()
+        retryable = http_status is None or http_status == 429 or http_status >= 500
+        campaign_call.last_error = (result.get('error') or '')[:500]
+        if retryable and campaign_call.attempts < self.max_attempts:
+            campaign_call.status = 'pending'
+            # Throttled requests go back in line right away; the pacer spaces them out
+            delay = 0 if http_status == 429 else self.retry_seconds * 2 ** (campaign_call.attempts - 1)
+            campaign_call.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        else:
+            campaign_call.status = 'error'
+            campaign_call.ended_at = datetime.utcnow()
+            logger.warning(f"Confirmation call for appointment {campaign_call.appointment_id} "
+                           f"failed after {campaign_call.attempts} attempts: {campaign_call.last_error}")
+        db.session.commit()
+
+    def _add_call_record(self, campaign_call: CampaignCall):
+        call_record = Call(
+            phone_number=campaign_call.phone_number,
+            caller_name=campaign_call.patient_name,
+            call_type='outbound',
+            call_status='initiated',
+            call_start_time=datetime.utcnow(),
+            conversation_summary='Outbound appointment_confirmation call',
+            intent_detected='appointment_confirmation',
+            appointment_id=str(campaign_call.appointment_id),
+            external_call_id=campaign_call.call_sid
+        )
+        db.session.add(call_record)
+        self.call_rollups.call_started(call_record)
+
+    def _recover_dialing(self, campaign_id: int, exclude: Optional[Set[int]] = None):
+        """
+        Calls left 'dialing' by a crashed runner may or may not have reached
+        Twilio. Adopt the call if a callback or Twilio has it, otherwise dial
+        again. Calls that can't be settled yet stay 'dialing' for a later pass;
+        after stale_after_seconds they are given up as errors so the run ends.
+        """
+        dialing = CampaignCall.query.filter(
+            CampaignCall.campaign_id == campaign_id,
+            CampaignCall.status == 'dialing',
+            CampaignCall.id.notin_(exclude or set())
+        ).all()
+        for campaign_call in dialing:
+            if campaign_call.call_sid:
+                # A callback matched it by id; its status has been applied already
+                self._adopt(campaign_call, campaign_call.call_sid, 'queued')
+                continue
+
+            since = (campaign_call.dialing_at or datetime.utcnow()) - timedelta(seconds=60)
+            try:
+                calls = self.twilio_service.find_recent_calls(campaign_call.phone_number, since)
+            except Exception as e:
+                # Can't tell; try again on a later pass rather than risk calling twice
+                logger.error(f"Could not check Twilio for appointment {campaign_call.appointment_id}: {e}")
+                self._give_up_if_stale(campaign_call, f'Could not check Twilio: {e}')
+                continue
+
+            # Calls other campaign calls already own can't be this one
+            claimed = {sid for (sid,) in db.session.query(CampaignCall.call_sid).filter(
+                CampaignCall.call_sid.in_([call['call_sid'] for call in calls])
+            ).all()}
+            candidates = [call for call in calls if call['call_sid'] not in claimed]
+            if not candidates:
+                campaign_call.status = 'pending'
+                campaign_call.next_attempt_at = None
+                campaign_call.attempts = max((campaign_call.attempts or 1) - 1, 0)
+                continue
+
+            # Another unsettled call to the same number (e.g. a family member's
+            # appointment) could own any of them; wait for the callbacks
+            siblings = CampaignCall.query.filter(
+                CampaignCall.id != campaign_call.id,
+                CampaignCall.phone_number == campaign_call.phone_number,
+                CampaignCall.status == 'dialing',
+                CampaignCall.call_sid.is_(None)
+            ).count()
+            if len(candidates) > 1 or siblings:
+                self._give_up_if_stale(campaign_call, 'Could not tell which Twilio call was this appointment\'s')
+                continue
+
+            status = candidates[0]['status']
+            self._adopt(campaign_call, candidates[0]['call_sid'],
+                        status if status in FINAL_STATUSES + ACTIVE_STATUSES else 'queued')
+        db.session.commit()
+
+    def _adopt(self, campaign_call: CampaignCall, call_sid: str, status: str):
+        campaign_call.call_sid = call_sid
+        if campaign_call.status == 'dialing':
+            campaign_call.status = status
+        if campaign_call.status in FINAL_STATUSES and campaign_call.ended_at is None:
+            campaign_call.ended_at = datetime.utcnow()
+        if not Call.query.filter_by(external_call_id=call_sid).first():
+            self._add_call_record(campaign_call)
+
+    def _give_up_if_stale(self, campaign_call: CampaignCall, reason: str):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after_seconds)
+        if campaign_call.dialing_at is None or campaign_call.dialing_at < cutoff:
+            campaign_call.status = 'error'
+            campaign_call.last_error = reason[:500]
+            campaign_call.ended_at = datetime.utcnow()
+            logger.warning(f"Confirmation call for appointment {campaign_call.appointment_id} "
+                           f"left unresolved: {reason}")
+
+    def _reconcile_stale(self, campaign_id: int):
+        """Fetch the status of calls whose final callback hasn't arrived in stale_after_seconds"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after_seconds)
+        stale = CampaignCall.query.filter(
+            CampaignCall.campaign_id == campaign_id,
+            CampaignCall.status.in_(ACTIVE_STATUSES[1:]),
+            CampaignCall.call_sid.isnot(None),
+            CampaignCall.dialing_at < cutoff
+        ).all()
+        for campaign_call in stale:
+            details = self.twilio_service.get_call_details(campaign_call.call_sid)
+            if details['success']:
+                record_campaign_call_status(campaign_call.call_sid, details['status'], details.get('duration'))
+        if stale:
+            db.session.commit()
@@ -0,0 +1,334 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+import logging
+from typing import Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: the CRM (or a proxy in front of it) is overloaded or restarting.
+# 409 is the CRM still finishing an earlier attempt with the same idempotency key.
+RETRYABLE_STATUSES = {409, 429, 502, 503, 504}
+
+# base URL -> client shared by every CRMIntegrationService in the process
+_shared_clients: Dict[str, 'CRMHttpClient'] = {}
+_shared_clients_lock = threading.Lock()
+
+class CRMUnavailableError(Exception):
+    """The CRM could not be reached in time (timeouts, connection errors, 5xx)"""
+
+class CircuitOpenError(CRMUnavailableError):
+    """Requests are being short-circuited after repeated CRM failures"""
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while instead of making every
+    caller wait for its own timeout.
+
+    closed:     requests flow; failure_threshold consecutive failures open the circuit
+    open:       requests fail immediately until reset_timeout has passed
+    half_open:  one trial request is let through; success closes the circuit,
+                failure opens it again
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up an admitted half-open trial without a verdict, so the next call can try"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    self.times_opened += 1
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def _state(self) -> str:
+        # Caller holds self._lock
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+class CRMHttpClient:
+    """
+    JSON client for the CRM API. Use shared() to get the process-wide client
+    for a base URL, so every service instance and thread reuses one pool and
+    one circuit breaker.
+
+    - One requests.Session with a bounded connection pool, so calls reuse
+      keep-alive connections instead of opening a new one each time.
+    - Every call has a total deadline (default 2.5s) covering all attempts;
+      each attempt gets a short connect timeout and whatever read time is left.
+    - Timeouts, connection errors and retryable statuses are retried up to
+      `retries` times with a short backoff. POSTs are only retried with an
+      Idempotency-Key, which the CRM uses to drop duplicate submissions.
+    - A circuit breaker fails calls immediately while the CRM is down.
+
+    Failures raise CRMUnavailableError; other responses (including 4xx) are
+    returned as (status_code, body).
+
+    get_async/post_async/request_async do the same for asyncio callers (the
+    ASGI webhooks) on an httpx.AsyncClient, sharing the breaker and stats.
+    The async client is created on first use and belongs to that event loop.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, connect_timeout: float = 0.5,
+                 read_timeout: float = 2.0, deadline: float = 2.5, retries: int = 2, backoff: float = 0.1,
+                 pool_size: int = 20, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'User-Agent': 'AI-Receptionist/1.0'
+        })
+        if api_key:
+            self.session.headers['Authorization'] = f'Bearer {api_key}'
+        self.pool_size = pool_size
+        self._async_client = None
+
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.retried = 0
+        self.failures = 0
+
+    @classmethod
+    def shared(cls, base_url: str) -> 'CRMHttpClient':
+        """The process-wide client for base_url, created from the environment on first use"""
+        base_url = base_url.rstrip('/')
+        with _shared_clients_lock:
+            client = _shared_clients.get(base_url)
+            if client is None:
+                client = _shared_clients[base_url] = cls.from_env(base_url)
+            return client
+
+    @classmethod
+    def from_env(cls, base_url: str) -> 'CRMHttpClient':
+        return cls(
+            base_url=base_url,
+            api_key=os.getenv('CRM_API_KEY') or None,
+            connect_timeout=float(os.getenv('CRM_CONNECT_TIMEOUT', '0.5')),
+            read_timeout=float(os.getenv('CRM_READ_TIMEOUT', '2.0')),
+            deadline=float(os.getenv('CRM_DEADLINE_SECONDS', '2.5')),
+            retries=int(os.getenv('CRM_RETRIES', '2')),
+            pool_size=int(os.getenv('CRM_POOL_SIZE', '20')),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('CRM_BREAKER_FAILURES', '5')),
+                reset_timeout=float(os.getenv('CRM_BREAKER_RESET_SECONDS', '30'))
+            )
+        )
+
+    def get(self, path: str, params: Optional[Dict] = None, deadline: Optional[float] = None):
+        return self.request('GET', path, params=params, deadline=deadline)
+
+    def post(self, path: str, json: Dict, idempotency_key: Optional[str] = None,
+             deadline: Optional[float] = None):
+        """POST with an Idempotency-Key (generated if not given) so retries can't duplicate records"""
+        return self.request('POST', path, json=json, deadline=deadline,
+                            headers={'Idempotency-Key': idempotency_key or str(uuid.uuid4())})
+
+    def request(self, method: str, path: str, params: Optional[Dict] = None, json: Optional[Dict] = None,
+                headers: Optional[Dict] = None, deadline: Optional[float] = None):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'CRM circuit open, skipping {method} {path}')
+
+        url = f'{self.base_url}{path}'
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        can_retry = method == 'GET' or bool(headers and headers.get('Idempotency-Key'))
+        attempts = 1 + (self.retries if can_retry else 0)
+        last_error = None
+
+        try:
+            for attempt in range(attempts):
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                if attempt:
+                    with self._stats_lock:
+                        self.retried += 1
+
+                try:
+                    with self._stats_lock:
+                        self.requests_sent += 1
+                    response = self.session.request(
+                        method, url, params=params, json=json, headers=headers,
+                        timeout=(min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+                    )
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    last_error = f'{type(e).__name__}: {e}'
+                else:
+                    if response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+                        self.breaker.record_success()
+                        return response.status_code, self._json(response)
+                    last_error = f'HTTP {response.status_code}'
+
+                # Back off before the next attempt, unless that would use up the deadline
+                pause = self.backoff * (2 ** attempt)
+                if attempt + 1 < attempts and expires_at - time.monotonic() > pause:
+                    time.sleep(pause)
+        except Exception:
+            # Anything else escaping an attempt (redirect loops, broken chunked bodies...)
+            # still settles the breaker, so a half-open trial is never left in flight
+            self.breaker.record_failure()
+            with self._stats_lock:
+                self.failures += 1
+            raise
+
+        self.breaker.record_failure()
+        with self._stats_lock:
+            self.failures += 1
+        logger.warning(f"CRM {method} {path} failed: {last_error or 'deadline exceeded'}")
+        raise CRMUnavailableError(last_error or 'deadline exceeded')
+
+    async def get_async(self, path: str, params: Optional[Dict] = None, deadline: Optional[float] = None):
+        return await self.request_async('GET', path, params=params, deadline=deadline)
+
+    async def post_async(self, path: str, json: Dict, idempotency_key: Optional[str] = None,
+                         deadline: Optional[float] = None):
+        return await self.request_async('POST', path, json=json, deadline=deadline,
+                                        headers={'Idempotency-Key': idempotency_key or str(uuid.uuid4())})
+
+    async def request_async(self, method: str, path: str, params: Optional[Dict] = None,
+                            json: Optional[Dict] = None, headers: Optional[Dict] = None,
+                            deadline: Optional[float] = None):
+        """request() without blocking the event loop"""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'CRM circuit open, skipping {method} {path}')
+
+        client = self._get_async_client()
+        url = f'{self.base_url}{path}'
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        can_retry = method == 'GET' or bool(headers and headers.get('Idempotency-Key'))
+        attempts = 1 + (self.retries if can_retry else 0)
+        last_error = None
+
+        try:
+            for attempt in range(attempts):
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                if attempt:
+                    with self._stats_lock:
+                        self.retried += 1
+
+                try:
+                    with self._stats_lock:
+                        self.requests_sent += 1
+                    response = await client.request(
+                        method, url, params=params, json=json, headers=headers,
+                        timeout=httpx.Timeout(min(self.read_timeout, remaining),
+                                              connect=min(self.connect_timeout, remaining))
+                    )
+                except httpx.TransportError as e:
+                    last_error = f'{type(e).__name__}: {e}'
+                else:
+                    if response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+                        self.breaker.record_success()
+                        return response.status_code, self._json(response)
+                    last_error = f'HTTP {response.status_code}'
+
+                pause = self.backoff * (2 ** attempt)
+                if attempt + 1 < attempts and expires_at - time.monotonic() > pause:
+                    await asyncio.sleep(pause)
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. a turn stage timeout); that says nothing about the CRM
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            # Anything else escaping an attempt (redirect loops, broken chunked bodies...)
+            # still settles the breaker, so a half-open trial is never left in flight
+            self.breaker.record_failure()
+            with self._stats_lock:
+                self.failures += 1
+            raise
+
+        self.breaker.record_failure()
+        with self._stats_lock:
+            self.failures += 1
+        logger.warning(f"CRM {method} {path} failed: {last_error or 'deadline exceeded'}")
+        raise CRMUnavailableError(last_error or 'deadline exceeded')
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                headers=dict(self.session.headers),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+        return self._async_client
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'base_url': self.base_url,
+                'circuit': self.breaker.state,
+                'circuit_opened': self.breaker.times_opened,
+                'short_circuited': self.breaker.rejected,
+                'requests_sent': self.requests_sent,
+                'retried': self.retried,
+                'failures': self.failures
+            }
+
+    @staticmethod
+    def _json(response) -> Dict:
+        try:
+            body = response.json()
+        except ValueError:
+            return {'success': False, 'error': f'Non-JSON response (HTTP {response.status_code})'}
+        return body if isinstance(body, dict) else {'data': body}
@@ -1,14 +1,24 @@
 import requests
 import json
+import os
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urljoin
+from src.services.crm_http_client import CRMHttpClient, CRMUnavailableError
+from src.services.caller_cache import CallerLookupCache, normalize_phone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bookable appointment slots in a standard practice day
+STANDARD_SLOTS = [
+    '09:00 AM', '09:30 AM', '10:00 AM', '10:30 AM',
+    '11:00 AM', '11:30 AM', '02:00 PM', '02:30 PM',
+    '03:00 PM', '03:30 PM', '04:00 PM', '04:30 PM'
+]
+
 class CRMIntegrationService:
     """
     Service for integrating with the existing Lehigh Valley Wellness CRM system.
@@ -16,16 +26,18 @@ class CRMIntegrationService:
     """
     
     def __init__(self, crm_base_url: str = None):
-        # In production, this would be the actual CRM API URL
-        self.crm_base_url = (
-            crm_base_url
-            or "https://5000-iysi7oxkf86lree03ye7v-51054291.manusvm.computer/api"
-        )
-        self.api_timeout = 30
+        self.crm_base_url = crm_base_url or os.getenv('CRM_API_URL', 'http://localhost:5001/api')
+        
+        # Pooled client with short deadlines, retries and a circuit breaker, shared per process
+        self.http = CRMHttpClient.shared(self.crm_base_url)
+        
+        # Caller ID -> patient, so repeat callers are identified without a CRM round trip; shared per process
+        self.caller_cache = CallerLookupCache.shared(self.crm_base_url)
         
         # API endpoints
         self.endpoints = {
             'patients': '/patients',
+            'patient_lookup': '/patients/lookup',
             'appointments': '/appointments',
             'services': '/services',
             'dashboard': '/dashboard/stats',
@@ -40,64 +52,69 @@ class CRMIntegrationService:
             'peptide_therapy': 'Peptide Therapy Consultation',
             'wellness_consultation': 'Wellness Consultation'
         }
-        
-        # Default headers for API requests
-        self.headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'User-Agent': 'AI-Receptionist/1.0'
-        }
     
     def find_patient_by_phone(self, phone_number: str) -> Optional[Dict]:
         """
-        Find a patient in the CRM system by phone number.
+        Find a patient in the CRM system by phone number (caller ID).
+        Known and unknown callers are both cached; CRM failures are not.
         """
         try:
-            # Clean phone number
-            clean_phone = self._clean_phone_number(phone_number)
+            phone = normalize_phone(phone_number)
+            if not phone:
+                return None
             
-            # In production, this would make actual API call
-            # For now, simulate patient lookup
-            simulated_patients = [
-                {
-                    'id': 'pat_001',
-                    'first_name': 'John',
-                    'last_name': 'Smith',
-                    'phone': '(484) 555-0123',
-                    'email': 'john.smith@email.com',
-                    'date_of_birth': '1980-05-15',
-                    'last_visit': '2024-08-15',
-                    'preferred_service': 'hormone_optimization',
-                    'insurance': 'Blue Cross Blue Shield',
-                    'notes': 'Regular patient, prefers morning appointments'
-                },
-                {
-                    'id': 'pat_002',
-                    'first_name': 'Sarah',
-                    'last_name': 'Johnson',
-                    'phone': '(484) 555-0456',
-                    'email': 'sarah.j@email.com',
-                    'date_of_birth': '1975-09-22',
-                    'last_visit': '2024-09-01',
-                    'preferred_service': 'weight_loss',
-                    'insurance': 'Aetna',
-                    'notes': 'New patient, interested in weight loss program'
-                }
-            ]
+            cached, patient = self.caller_cache.get(phone)
+            if cached:
+                return patient
             
-            # Find matching patient
-            for patient in simulated_patients:
-                if self._clean_phone_number(patient['phone']) == clean_phone:
-                    logger.info(f"Found patient: {patient['first_name']} {patient['last_name']}")
-                    return patient
+            status_code, body = self.http.get(self.endpoints['patient_lookup'], params={'phone': phone})
+            return self._read_patient_lookup(phone_number, phone, status_code, body)
             
-            logger.info(f"No patient found for phone number: {phone_number}")
+        except CRMUnavailableError as e:
+            logger.warning(f"Patient lookup skipped for {phone_number}, CRM unavailable: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error finding patient by phone {phone_number}: {e}")
             return None
+    
+    async def find_patient_by_phone_async(self, phone_number: str) -> Optional[Dict]:
+        """
+        find_patient_by_phone for the ASGI webhooks.
+        """
+        try:
+            phone = normalize_phone(phone_number)
+            if not phone:
+                return None
             
+            cached, patient = self.caller_cache.get(phone)
+            if cached:
+                return patient
+            
+            status_code, body = await self.http.get_async(self.endpoints['patient_lookup'], params={'phone': phone})
+            return self._read_patient_lookup(phone_number, phone, status_code, body)
+            
+        except CRMUnavailableError as e:
+            logger.warning(f"Patient lookup skipped for {phone_number}, CRM unavailable: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error finding patient by phone {phone_number}: {e}")
             return None
     
+    def _read_patient_lookup(self, phone_number: str, phone: str, status_code: int, body: Dict) -> Optional[Dict]:
+        if status_code == 404:
+            logger.info(f"No patient found for phone number: {phone_number}")
+            self.caller_cache.put(phone, None)
+            return None
+        
+        if not body.get('success'):
+            logger.warning(f"Patient lookup failed for {phone_number}: {body.get('error')}")
+            return None
+        
+        patient = body['patient']
+        logger.info(f"Found patient: {patient['first_name']} {patient['last_name']}")
+        self.caller_cache.put(phone, patient)
+        return patient
+    
     def create_patient_record(self, patient_data: Dict) -> Dict:
         """
         Create a new patient record in the CRM system.
@@ -112,42 +129,36 @@ class CRMIntegrationService:
                         'error': f'Missing required field: {field}'
                     }
             
-            # Generate patient ID
-            patient_id = f"pat_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            # Prepare patient record
-            patient_record = {
-                'id': patient_id,
-                'first_name': patient_data['first_name'],
-                'last_name': patient_data['last_name'],
+            status_code, body = self.http.post(self.endpoints['patients'], {
+                'firstName': patient_data['first_name'],
+                'lastName': patient_data['last_name'],
+                'email': patient_data.get('email') or self._placeholder_email(patient_data['phone']),
                 'phone': self._clean_phone_number(patient_data['phone']),
-                'email': patient_data.get('email', ''),
-                'date_of_birth': patient_data.get('date_of_birth', ''),
+                'dateOfBirth': patient_data.get('date_of_birth') or None,
                 'insurance': patient_data.get('insurance', ''),
-                'emergency_contact': patient_data.get('emergency_contact', ''),
-                'medical_history': patient_data.get('medical_history', ''),
-                'notes': patient_data.get('notes', 'Created via AI Receptionist'),
-                'created_date': datetime.now().isoformat(),
-                'source': 'ai_receptionist'
-            }
+                'preferredContact': 'phone'
+            })
             
-            # In production, make API call to CRM
-            # response = requests.post(
-            #     urljoin(self.crm_base_url, self.endpoints['patients']),
-            #     json=patient_record,
-            #     headers=self.headers,
-            #     timeout=self.api_timeout
-            # )
+            if not body.get('success'):
+                return {
+                    'success': False,
+                    'error': body.get('error', f'CRM returned HTTP {status_code}'),
+                    'message': 'Failed to create patient record'
+                }
             
-            logger.info(f"Created new patient record: {patient_id}")
+            patient_record = body['patient']
+            logger.info(f"Created patient record: {patient_record['id']}")
+            self._remember_caller(patient_record)
             
             return {
                 'success': True,
-                'patient_id': patient_id,
+                'patient_id': patient_record['id'],
                 'patient_data': patient_record,
-                'message': 'Patient record created successfully'
+                'message': body.get('message', 'Patient record created successfully')
             }
             
+        except CRMUnavailableError as e:
+            return self._unavailable('Failed to create patient record', e)
         except Exception as e:
             logger.error(f"Error creating patient record: {e}")
             return {
@@ -161,50 +172,31 @@ class CRMIntegrationService:
         Create a consultation request in the CRM system.
         """
         try:
-            # Generate request ID
-            request_id = f"req_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            # Map service type
-            service_type = request_data.get('service_type', 'wellness_consultation')
-            service_name = self.service_mapping.get(service_type, 'General Consultation')
-            
-            # Prepare consultation request
-            consultation_request = {
-                'id': request_id,
-                'patient_name': f"{request_data.get('first_name', '')} {request_data.get('last_name', '')}".strip(),
-                'phone': self._clean_phone_number(request_data.get('phone', '')),
-                'email': request_data.get('email', ''),
-                'service_type': service_name,
-                'preferred_date': request_data.get('preferred_date', ''),
-                'preferred_time': request_data.get('preferred_time', ''),
-                'reason_for_visit': request_data.get('reason_for_visit', ''),
-                'insurance': request_data.get('insurance', ''),
-                'emergency_contact': request_data.get('emergency_contact', ''),
-                'medical_history': request_data.get('medical_history', ''),
-                'current_medications': request_data.get('current_medications', ''),
-                'status': 'pending',
-                'source': 'ai_receptionist_call',
-                'created_date': datetime.now().isoformat(),
-                'notes': f"Request created via AI Receptionist phone call"
-            }
-            
-            # In production, make API call to CRM
-            # response = requests.post(
-            #     urljoin(self.crm_base_url, self.endpoints['consultation_requests']),
-            #     json=consultation_request,
-            #     headers=self.headers,
-            #     timeout=self.api_timeout
-            # )
-            
-            logger.info(f"Created consultation request: {request_id} for {service_name}")
+            service_name, payload = self._consultation_payload(request_data)
+            status_code, body = self.http.post(self.endpoints['consultation_requests'], payload)
+            return self._read_consultation_response(service_name, status_code, body)
             
+        except CRMUnavailableError as e:
+            return self._unavailable('Failed to create consultation request', e)
+        except Exception as e:
+            logger.error(f"Error creating consultation request: {e}")
             return {
-                'success': True,
-                'request_id': request_id,
-                'request_data': consultation_request,
-                'message': 'Consultation request created successfully'
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to create consultation request'
             }
+    
+    async def create_consultation_request_async(self, request_data: Dict) -> Dict:
+        """
+        create_consultation_request for the ASGI webhooks.
+        """
+        try:
+            service_name, payload = self._consultation_payload(request_data)
+            status_code, body = await self.http.post_async(self.endpoints['consultation_requests'], payload)
+            return self._read_consultation_response(service_name, status_code, body)
             
+        except CRMUnavailableError as e:
+            return self._unavailable('Failed to create consultation request', e)
         except Exception as e:
             logger.error(f"Error creating consultation request: {e}")
             return {
@@ -213,73 +205,81 @@ class CRMIntegrationService:
                 'message': 'Failed to create consultation request'
             }
     
+    def _consultation_payload(self, request_data: Dict) -> Tuple[str, Dict]:
+        """The CRM service name and request body for a consultation request"""
+        # Map service type
+        service_type = request_data.get('service_type', 'wellness_consultation')
+        service_name = self.service_mapping.get(service_type, 'General Consultation')
+        
+        return service_name, {
+            'firstName': request_data.get('first_name', ''),
+            'lastName': request_data.get('last_name', ''),
+            'email': request_data.get('email') or self._placeholder_email(request_data.get('phone', '')),
+            'phone': self._clean_phone_number(request_data.get('phone', '')),
+            'insurance': request_data.get('insurance', ''),
+            'preferredContact': 'phone',
+            'serviceType': service_name,
+            # The CRM only accepts YYYY-MM-DD / HH:MM; anything else stays in the reason text
+            'preferredDate': self._iso_or_none(request_data.get('preferred_date'), '%Y-%m-%d'),
+            'preferredTime': self._iso_or_none(request_data.get('preferred_time'), '%H:%M'),
+            'reason': self._consultation_reason(request_data),
+            'priority': request_data.get('priority', 'normal')
+        }
+    
+    def _read_consultation_response(self, service_name: str, status_code: int, body: Dict) -> Dict:
+        if not body.get('success'):
+            return {
+                'success': False,
+                'error': body.get('error', f'CRM returned HTTP {status_code}'),
+                'message': 'Failed to create consultation request'
+            }
+        
+        consultation_request = body['consultation_request']
+        if body.get('patient'):
+            self._remember_caller(body['patient'])
+        logger.info(f"Created consultation request: {consultation_request['id']} for {service_name}")
+        
+        return {
+            'success': True,
+            'request_id': consultation_request['id'],
+            'request_data': consultation_request,
+            'patient': body.get('patient'),
+            'message': body.get('message', 'Consultation request created successfully')
+        }
+    
     def check_appointment_availability(self, date: str, time: str = None, 
                                      service_type: str = None) -> Dict:
         """
         Check appointment availability for a specific date and time.
         """
         try:
-            # Parse date
-            try:
-                appointment_date = datetime.strptime(date, '%Y-%m-%d')
-            except ValueError:
-                # Try different date formats
-                for fmt in ['%m/%d/%Y', '%m-%d-%Y', '%B %d, %Y']:
-                    try:
-                        appointment_date = datetime.strptime(date, fmt)
-                        break
-                    except ValueError:
-                        continue
-                else:
-                    return {
-                        'success': False,
-                        'error': 'Invalid date format',
-                        'message': 'Please provide date in MM/DD/YYYY format'
-                    }
+            appointment_date, error = self._bookable_date(date)
+            if error:
+                return error
             
-            # Check if date is in the past
-            if appointment_date.date() < datetime.now().date():
-                return {
-                    'success': False,
-                    'error': 'Past date',
-                    'message': 'Cannot schedule appointments in the past'
-                }
-            
-            # Check if date is too far in future (6 months)
-            max_future_date = datetime.now() + timedelta(days=180)
-            if appointment_date > max_future_date:
-                return {
-                    'success': False,
-                    'error': 'Date too far in future',
-                    'message': 'Cannot schedule appointments more than 6 months in advance'
-                }
-            
-            # Simulate availability check
-            # In production, this would query the actual CRM calendar
-            available_times = [
-                '09:00 AM', '09:30 AM', '10:00 AM', '10:30 AM',
-                '11:00 AM', '11:30 AM', '02:00 PM', '02:30 PM',
-                '03:00 PM', '03:30 PM', '04:00 PM', '04:30 PM'
-            ]
+            available_times, verified = self._open_slots(appointment_date)
+            return self._availability_result(appointment_date, time, available_times, verified)
+                
+        except Exception as e:
+            logger.error(f"Error checking appointment availability: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to check appointment availability'
+            }
+    
+    async def check_appointment_availability_async(self, date: str, time: str = None,
+                                                   service_type: str = None) -> Dict:
+        """
+        check_appointment_availability for the ASGI webhooks.
+        """
+        try:
+            appointment_date, error = self._bookable_date(date)
+            if error:
+                return error
             
-            if time:
-                # Check specific time
-                is_available = time in available_times
-                return {
-                    'success': True,
-                    'date': appointment_date.strftime('%Y-%m-%d'),
-                    'time': time,
-                    'available': is_available,
-                    'message': f'Time slot {time} is {"available" if is_available else "not available"}'
-                }
-            else:
-                # Return all available times
-                return {
-                    'success': True,
-                    'date': appointment_date.strftime('%Y-%m-%d'),
-                    'available_times': available_times,
-                    'message': f'{len(available_times)} time slots available'
-                }
+            available_times, verified = await self._open_slots_async(appointment_date)
+            return self._availability_result(appointment_date, time, available_times, verified)
                 
         except Exception as e:
             logger.error(f"Error checking appointment availability: {e}")
@@ -289,6 +289,68 @@ class CRMIntegrationService:
                 'message': 'Failed to check appointment availability'
             }
     
+    def _bookable_date(self, date: str) -> Tuple[Optional[datetime], Optional[Dict]]:
+        """Parse a requested date; returns (date, None) or (None, error response)"""
+        # Parse date
+        try:
+            appointment_date = datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            # Try different date formats
+            for fmt in ['%m/%d/%Y', '%m-%d-%Y', '%B %d, %Y']:
+                try:
+                    appointment_date = datetime.strptime(date, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                return None, {
+                    'success': False,
+                    'error': 'Invalid date format',
+                    'message': 'Please provide date in MM/DD/YYYY format'
+                }
+        
+        # Check if date is in the past
+        if appointment_date.date() < datetime.now().date():
+            return None, {
+                'success': False,
+                'error': 'Past date',
+                'message': 'Cannot schedule appointments in the past'
+            }
+        
+        # Check if date is too far in future (6 months)
+        max_future_date = datetime.now() + timedelta(days=180)
+        if appointment_date > max_future_date:
+            return None, {
+                'success': False,
+                'error': 'Date too far in future',
+                'message': 'Cannot schedule appointments more than 6 months in advance'
+            }
+        
+        return appointment_date, None
+    
+    def _availability_result(self, appointment_date: datetime, time: Optional[str],
+                             available_times: List[str], verified: bool) -> Dict:
+        if time:
+            # Check specific time; entity extraction gives 'HH:MM', slots are '%I:%M %p'
+            is_available = self._slot_label(time) in available_times
+            return {
+                'success': True,
+                'date': appointment_date.strftime('%Y-%m-%d'),
+                'time': time,
+                'available': is_available,
+                'verified': verified,
+                'message': f'Time slot {time} is {"available" if is_available else "not available"}'
+            }
+        else:
+            # Return all available times
+            return {
+                'success': True,
+                'date': appointment_date.strftime('%Y-%m-%d'),
+                'available_times': available_times,
+                'verified': verified,
+                'message': f'{len(available_times)} time slots available'
+            }
+    
     def get_service_information(self, service_type: str = None) -> Dict:
         """
         Get information about available services.
@@ -404,6 +466,38 @@ class CRMIntegrationService:
                 'message': 'Failed to log call interaction'
             }
     
+    def list_appointments(self, start_date: str, end_date: str, status: str = 'scheduled') -> Dict:
+        """
+        All CRM appointments between two dates (YYYY-MM-DD, inclusive), following
+        the CRM's pagination, with the patient's name and phone on each one.
+        """
+        appointments = []
+        page = 1
+        try:
+            while True:
+                status_code, body = self.http.get(self.endpoints['appointments'], params={
+                    'start_date': start_date, 'end_date': end_date, 'status': status,
+                    'page': page, 'per_page': 100
+                })
+                if not body.get('success'):
+                    return {
+                        'success': False,
+                        'error': body.get('error', f'CRM returned HTTP {status_code}'),
+                        'message': 'Failed to list appointments'
+                    }
+                appointments.extend(body.get('appointments', []))
+                if page >= body.get('pagination', {}).get('pages', 1):
+                    break
+                page += 1
+        except CRMUnavailableError as e:
+            return self._unavailable('Failed to list appointments', e)
+        
+        return {
+            'success': True,
+            'appointments': appointments,
+            'message': f'{len(appointments)} appointments found'
+        }
+    
     def get_practice_information(self) -> Dict:
         """
         Get general practice information for AI responses.
@@ -421,6 +515,101 @@ class CRMIntegrationService:
             'accessibility': 'Wheelchair accessible facility'
         }
     
+    def _open_slots(self, appointment_date: datetime) -> Tuple[List[str], bool]:
+        """
+        Standard slots for the day minus the ones already booked in the CRM.
+        Returns (slots, verified); if the CRM is unavailable all standard slots are
+        returned unverified so the call can continue.
+        """
+        day = appointment_date.strftime('%Y-%m-%d')
+        try:
+            status_code, body = self.http.get(self.endpoints['appointments'], params={
+                'start_date': day, 'end_date': day, 'status': 'scheduled', 'per_page': 100
+            })
+        except CRMUnavailableError as e:
+            logger.warning(f"Availability for {day} not verified, CRM unavailable: {e}")
+            return list(STANDARD_SLOTS), False
+        
+        return self._read_open_slots(day, body)
+    
+    async def _open_slots_async(self, appointment_date: datetime) -> Tuple[List[str], bool]:
+        day = appointment_date.strftime('%Y-%m-%d')
+        try:
+            status_code, body = await self.http.get_async(self.endpoints['appointments'], params={
+                'start_date': day, 'end_date': day, 'status': 'scheduled', 'per_page': 100
+            })
+        except CRMUnavailableError as e:
+            logger.warning(f"Availability for {day} not verified, CRM unavailable: {e}")
+            return list(STANDARD_SLOTS), False
+        
+        return self._read_open_slots(day, body)
+    
+    def _read_open_slots(self, day: str, body: Dict) -> Tuple[List[str], bool]:
+        if not body.get('success'):
+            logger.warning(f"Availability for {day} not verified: {body.get('error')}")
+            return list(STANDARD_SLOTS), False
+        
+        booked = {
+            datetime.strptime(appointment['appointment_time'][:5], '%H:%M').strftime('%I:%M %p')
+            for appointment in body.get('appointments', [])
+            if appointment.get('appointment_time')
+        }
+        return [slot for slot in STANDARD_SLOTS if slot not in booked], True
+    
+    @staticmethod
+    def _slot_label(time: str) -> str:
+        """A requested time ('14:00', '2:00 PM', '2 pm') in the STANDARD_SLOTS format"""
+        value = time.strip().upper()
+        for fmt in ('%H:%M', '%I:%M %p', '%I:%M%p', '%I %p', '%I%p'):
+            try:
+                return datetime.strptime(value, fmt).strftime('%I:%M %p')
+            except ValueError:
+                continue
+        return time
+    
+    def _consultation_reason(self, request_data: Dict) -> str:
+        reason = request_data.get('reason_for_visit', '')
+        # Keep spoken dates/times the CRM can't parse so staff still see them
+        for field, label in (('preferred_date', 'Preferred date'), ('preferred_time', 'Preferred time')):
+            value = request_data.get(field)
+            if value and self._iso_or_none(value, '%Y-%m-%d' if field == 'preferred_date' else '%H:%M') is None:
+                reason = f"{reason}\n{label}: {value}".strip()
+        return f"{reason}\n(Requested via AI Receptionist phone call)".strip()
+    
+    @staticmethod
+    def _iso_or_none(value: Optional[str], fmt: str) -> Optional[str]:
+        if not value:
+            return None
+        try:
+            datetime.strptime(value, fmt)
+            return value
+        except ValueError:
+            return None
+    
+    def _placeholder_email(self, phone: str) -> str:
+        """
+        The CRM keys patients by email, which callers rarely give. Use a stable,
+        undeliverable (.invalid) address per phone number so repeat callers map
+        to the same patient.
+        """
+        digits = ''.join(filter(str.isdigit, phone or ''))[-10:] or 'unknown'
+        return f"caller-{digits}@phone.invalid"
+    
+    def _remember_caller(self, patient: Dict):
+        """Cache a patient just created or matched, replacing any 'unknown caller' entry"""
+        phone = normalize_phone(patient.get('phone') or '')
+        if phone:
+            self.caller_cache.put(phone, patient)
+    
+    def _unavailable(self, message: str, error: Exception) -> Dict:
+        logger.error(f"{message}: CRM unavailable ({error})")
+        return {
+            'success': False,
+            'error': str(error),
+            'crm_unavailable': True,
+            'message': message
+        }
+    
     def _clean_phone_number(self, phone: str) -> str:
         """Clean and format phone number for consistency."""
         if not phone:
@@ -444,20 +633,28 @@ class CRMIntegrationService:
         Test the connection to the CRM system.
         """
         try:
-            # In production, this would make actual API call
-            # response = requests.get(
-            #     urljoin(self.crm_base_url, '/health'),
-            #     headers=self.headers,
-            #     timeout=self.api_timeout
-            # )
+            status_code, body = self.http.get(self.endpoints['dashboard'])
             
             return {
-                'success': True,
+                'success': bool(body.get('success')),
                 'crm_url': self.crm_base_url,
-                'status': 'connected',
-                'message': 'CRM connection successful'
+                'status': 'connected' if body.get('success') else 'error',
+                'http_status': status_code,
+                'client': self.http.stats(),
+                'caller_cache': self.caller_cache.stats(),
+                'message': 'CRM connection successful' if body.get('success') else body.get('error', 'CRM returned an error')
             }
             
+        except CRMUnavailableError as e:
+            logger.error(f"Error testing CRM connection: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'crm_url': self.crm_base_url,
+                'status': 'disconnected',
+                'client': self.http.stats(),
+                'message': 'CRM connection failed'
+            }
         except Exception as e:
             logger.error(f"Error testing CRM connection: {e}")
             return {
@@ -0,0 +1,175 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+
+# Words that end a spoken name ("my name is jane doe and my number is ...")
+NAME_STOP_WORDS = {'and', 'but', 'i', 'im', 'my', 'calling', 'from', 'here', 'with', 'so'}
+
+class EntityScanner:
+    """
+    Extracts date, time, service, phone and name entities from an utterance in a
+    single regex traversal.
+
+    All patterns are compiled once into one alternation of named groups. The
+    first hit of each kind is kept, with the same precedence the per-pattern
+    loops had (e.g. a weekday beats "tomorrow", an exact time beats "morning"),
+    and values are normalized: dates to YYYY-MM-DD, clock times to HH:MM.
+    """
+
+    def __init__(self, services: Dict[str, Dict]):
+        # service name word -> service key, first service wins (same order as before)
+        self.service_words: Dict[str, str] = {}
+        for service_key, service_info in services.items():
+            for word in re.findall(r'[a-z]+', service_info['name'].lower()):
+                self.service_words.setdefault(word, service_key)
+        self.service_order = {service_key: i for i, service_key in enumerate(services)}
+
+        weekday = '|'.join(WEEKDAYS)
+        month = '|'.join(MONTHS)
+        service_alternation = '|'.join(
+            sorted((re.escape(word) for word in self.service_words), key=len, reverse=True)
+        ) or r'(?!)'
+
+        # One leading word boundary for every alternative, so positions inside
+        # words are rejected before any alternative is tried
+        self.pattern = re.compile(r'\b(?:' + '|'.join([
+            r'(?P<phone>\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b)',
+            rf'(?P<weekday>(?:(?P<weekday_next>next|this)\s+)?(?P<weekday_name>{weekday})\b)',
+            r'(?P<relative>(?:tomorrow|today|next week|this week)\b)',
+            r'(?P<numeric_date>(?P<nd_month>\d{1,2})[/-](?P<nd_day>\d{1,2})[/-](?P<nd_year>\d{2,4})\b)',
+            rf'(?P<month_date>(?P<md_month>{month})\s+(?P<md_day>\d{{1,2}})(?:st|nd|rd|th)?\b)',
+            r'(?P<clock>(?P<clock_hour>\d{1,2}):(?P<clock_minute>\d{2})\s*(?P<clock_meridiem>am|pm)\b)',
+            r'(?P<hour>(?P<hour_value>\d{1,2})\s*(?P<hour_meridiem>am|pm)\b)',
+            r'(?P<period>(?:(?P<period_modifier>early|late)\s+)?(?P<period_name>morning|afternoon|evening)\b)',
+            r'(?P<name>my name is\s+(?P<name_value>[a-z]+(?:\s+[a-z]+){0,3}))',
+            rf'(?P<service>(?:{service_alternation})\b)',
+        ]) + ')')
+
+        # Precedence among alternatives of the same entity (lower wins)
+        self.date_rank = {'weekday': 0, 'relative': 1, 'numeric_date': 2, 'month_date': 3}
+        self.time_rank = {'clock': 0, 'hour': 1, 'period': 2}
+
+    def scan(self, message: str, today: Optional[date] = None) -> Dict:
+        """
+        Extract entities from a message.
+        Returns a dict with any of preferred_date, preferred_date_text, preferred_time,
+        preferred_time_text, service_type, phone_number and patient_name.
+        """
+        entities = {}
+        if not message:
+            return entities
+
+        today = today or datetime.now().date()
+        best_date = best_time = best_service = None
+
+        for match in self.pattern.finditer(message.lower()):
+            # lastgroup is the outermost group that matched, i.e. the alternative's name
+            kind = match.lastgroup
+
+            if kind in self.date_rank:
+                if best_date is None or self.date_rank[kind] < self.date_rank[best_date[0]]:
+                    best_date = (kind, match)
+            elif kind in self.time_rank:
+                if best_time is None or self.time_rank[kind] < self.time_rank[best_time[0]]:
+                    best_time = (kind, match)
+            elif kind == 'service':
+                service_key = self.service_words[match.group('service')]
+                if best_service is None or self.service_order[service_key] < self.service_order[best_service]:
+                    best_service = service_key
+            elif kind == 'phone' and 'phone_number' not in entities:
+                start = match.start()
+                # Keep the opening parenthesis of "(484) 555-0199"
+                if start and message[start - 1] == '(':
+                    start -= 1
+                entities['phone_number'] = message[start:match.end()]
+            elif kind == 'name' and 'patient_name' not in entities:
+                name = self._clean_name(match.group('name_value'))
+                if name:
+                    entities['patient_name'] = name
+
+        if best_date is not None:
+            kind, match = best_date
+            entities['preferred_date_text'] = match.group(kind)
+            resolved = self._resolve_date(match, kind, today)
+            entities['preferred_date'] = resolved.isoformat() if resolved else match.group(kind)
+
+        if best_time is not None:
+            kind, match = best_time
+            entities['preferred_time_text'] = match.group(kind)
+            entities['preferred_time'] = self._resolve_time(match, kind)
+
+        if best_service is not None:
+            entities['service_type'] = best_service
+
+        return entities
+
+    @staticmethod
+    def _clean_name(raw: str) -> str:
+        words: List[str] = []
+        for word in raw.split():
+            if word in NAME_STOP_WORDS:
+                break
+            words.append(word)
+        return ' '.join(word.capitalize() for word in words)
+
+    @staticmethod
+    def _resolve_date(match, kind: str, today: date) -> Optional[date]:
+        try:
+            if kind == 'weekday':
+                target = WEEKDAYS.index(match.group('weekday_name'))
+                days_ahead = (target - today.weekday()) % 7 or 7
+                resolved = today + timedelta(days=days_ahead)
+                # "next friday" said on a monday means the friday of the following week
+                if match.group('weekday_next') == 'next' and target > today.weekday():
+                    resolved += timedelta(days=7)
+                return resolved
+
+            if kind == 'relative':
+                phrase = match.group('relative')
+                if phrase == 'today' or phrase == 'this week':
+                    return today
+                if phrase == 'tomorrow':
+                    return today + timedelta(days=1)
+                # next week -> monday of next week
+                return today + timedelta(days=7 - today.weekday())
+
+            if kind == 'numeric_date':
+                year = int(match.group('nd_year'))
+                if year < 100:
+                    year += 2000
+                return date(year, int(match.group('nd_month')), int(match.group('nd_day')))
+
+            if kind == 'month_date':
+                month = MONTHS.index(match.group('md_month')) + 1
+                resolved = date(today.year, month, int(match.group('md_day')))
+                # A month/day already behind us refers to next year
+                if resolved < today:
+                    resolved = date(today.year + 1, month, int(match.group('md_day')))
+                return resolved
+        except ValueError:
+            # e.g. "13/45/2025" or "february 30"
+            return None
+
+        return None
+
+    @staticmethod
+    def _resolve_time(match, kind: str) -> str:
+        if kind in ('clock', 'hour'):
+            if kind == 'clock':
+                hour, minute = int(match.group('clock_hour')), int(match.group('clock_minute'))
+                meridiem = match.group('clock_meridiem')
+            else:
+                hour, minute = int(match.group('hour_value')), 0
+                meridiem = match.group('hour_meridiem')
+            if 1 <= hour <= 12 and minute < 60:
+                hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+                return f"{hour:02d}:{minute:02d}"
+            return match.group(kind)
+
+        period = match.group('period_name')
+        modifier = match.group('period_modifier')
+        return f"{modifier} {period}" if modifier else period
@@ -0,0 +1,177 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Leading filler that doesn't change what the caller wants
+FILLER_WORDS = {'yeah', 'yes', 'yep', 'uh', 'um', 'umm', 'so', 'well', 'ok', 'okay',
+                'hi', 'hello', 'hey', 'oh', 'like', 'just', 'and'}
+
+NON_WORD = re.compile(r"[^a-z0-9' ]+")
+
+class IntentCache:
+    """
+    Cache of normalized utterance -> intent for LLM intent classification.
+
+    An in-process LRU (OrderedDict) with a per-entry TTL sits in front of an
+    optional SQLite table, so every worker pointed at the same INTENT_CACHE_DB
+    file shares classifications. Hits, misses and evictions are counted for
+    the analytics endpoint.
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: int = 86400,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # key -> (intent, expires_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.db_path:
+            try:
+                self._create_table()
+            except sqlite3.Error as e:
+                logger.error(f"Intent cache database unavailable, using memory only: {e}")
+                self.db_path = None
+
+    @classmethod
+    def from_env(cls) -> 'IntentCache':
+        return cls(
+            max_entries=int(os.getenv('INTENT_CACHE_SIZE', '2000')),
+            ttl_seconds=int(os.getenv('INTENT_CACHE_TTL_SECONDS', '86400')),
+            db_path=os.getenv('INTENT_CACHE_DB') or None
+        )
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Lowercase, drop punctuation, collapse whitespace and strip leading filler words"""
+        words = NON_WORD.sub(' ', message.lower()).split()
+        start = 0
+        while start < len(words) - 1 and words[start] in FILLER_WORDS:
+            start += 1
+        return ' '.join(words[start:])
+
+    def get(self, message: str) -> Optional[str]:
+        key = self.normalize(message)
+        if not key:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                intent, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return intent
+                del self._entries[key]
+
+        intent = self._get_shared(key, now)
+        with self._lock:
+            if intent is not None:
+                self.hits += 1
+                self.shared_hits += 1
+                self._remember(key, intent, now + self.ttl_seconds)
+            else:
+                self.misses += 1
+        return intent
+
+    def set(self, message: str, intent: str):
+        key = self.normalize(message)
+        if not key:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, intent, expires_at)
+        self._set_shared(key, intent, expires_at)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'persistent': bool(self.db_path),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _remember(self, key: str, intent: str, expires_at: float):
+        # Caller holds self._lock
+        self._entries[key] = (intent, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _create_table(self):
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS intent_cache ('
+                'utterance TEXT PRIMARY KEY, intent TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_intent_cache_last_used ON intent_cache (last_used)')
+
+    def _get_shared(self, key: str, now: float) -> Optional[str]:
+        if not self.db_path:
+            return None
+        try:
+            with self._connection() as connection:
+                row = connection.execute(
+                    'SELECT intent FROM intent_cache WHERE utterance = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+                if row:
+                    connection.execute('UPDATE intent_cache SET last_used = ? WHERE utterance = ?', (now, key))
+                return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Intent cache read failed: {e}")
+            return None
+
+    def _set_shared(self, key: str, intent: str, expires_at: float):
+        if not self.db_path:
+            return
+        now = time.time()
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO intent_cache (utterance, intent, expires_at, last_used) VALUES (?, ?, ?, ?)',
+                    (key, intent, expires_at, now)
+                )
+                # Drop expired rows and keep the table to the least recently used max_entries
+                connection.execute('DELETE FROM intent_cache WHERE expires_at <= ?', (now,))
+                connection.execute(
+                    'DELETE FROM intent_cache WHERE utterance IN ('
+                    'SELECT utterance FROM intent_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Intent cache write failed: {e}")
@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import random
+import re
+import time
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'intent_model.json')
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def extract_features(message: str) -> List[str]:
+    """Unigrams plus adjacent-word bigrams"""
+    words = TOKEN_PATTERN.findall(message.lower())
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+class IntentClassifier:
+    """
+    TF-IDF + multinomial logistic regression intent classifier.
+
+    Everything is kept as sparse dicts in plain Python: a turn has a few dozen
+    features, so scoring it against every intent is a handful of dict lookups
+    and runs well under a millisecond without NumPy. Models are trained offline
+    (scripts/train_intent_classifier.py) and loaded from JSON.
+    """
+
+    def __init__(self, classes: List[str], idf: Dict[str, float],
+                 weights: Dict[str, Dict[str, float]], bias: Dict[str, float],
+                 report: Optional[Dict] = None):
+        self.classes = classes
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.report = report or {}
+
+    @classmethod
+    def load(cls, path: str = None) -> Optional['IntentClassifier']:
+        """Load a trained model, or return None if there isn't one"""
+        path = path or os.getenv('INTENT_MODEL_PATH', DEFAULT_MODEL_PATH)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as model_file:
+                data = json.load(model_file)
+            return cls(data['classes'], data['idf'], data['weights'], data['bias'], data.get('report'))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load intent model from {path}: {e}")
+            return None
+
+    def save(self, path: str = None):
+        path = path or os.getenv('INTENT_MODEL_PATH', DEFAULT_MODEL_PATH)
+        with open(path, 'w') as model_file:
+            json.dump({
+                'classes': self.classes,
+                'idf': self.idf,
+                'weights': self.weights,
+                'bias': self.bias,
+                'report': self.report
+            }, model_file)
+
+    def vectorize(self, message: str) -> Dict[str, float]:
+        """L2-normalized TF-IDF vector over known features"""
+        counts = Counter(feature for feature in extract_features(message) if feature in self.idf)
+        vector = {feature: count * self.idf[feature] for feature, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            for feature in vector:
+                vector[feature] /= norm
+        return vector
+
+    def predict_proba(self, message: str) -> Dict[str, float]:
+        return self._softmax(self.vectorize(message))
+
+    def predict(self, message: str) -> Tuple[Optional[str], float]:
+        """Return (intent, probability); (None, 0.0) if the message has no known features"""
+        vector = self.vectorize(message)
+        if not vector:
+            return None, 0.0
+        probabilities = self._softmax(vector)
+        intent = max(probabilities, key=probabilities.get)
+        return intent, probabilities[intent]
+
+    def _softmax(self, vector: Dict[str, float]) -> Dict[str, float]:
+        scores = {}
+        for intent in self.classes:
+            intent_weights = self.weights[intent]
+            score = self.bias[intent]
+            for feature, value in vector.items():
+                weight = intent_weights.get(feature)
+                if weight:
+                    score += weight * value
+            scores[intent] = score
+
+        highest = max(scores.values())
+        exps = {intent: math.exp(score - highest) for intent, score in scores.items()}
+        total = sum(exps.values())
+        return {intent: value / total for intent, value in exps.items()}
+
+    @classmethod
+    def train(cls, messages: List[str], labels: List[str], epochs: int = 30,
+              learning_rate: float = 0.5, l2: float = 1e-4, min_df: int = 1,
+              seed: int = 13) -> 'IntentClassifier':
+        """Fit TF-IDF weights and a softmax regression with plain SGD"""
+        document_frequency = Counter()
+        for message in messages:
+            document_frequency.update(set(extract_features(message)))
+
+        total = len(messages)
+        idf = {
+            feature: math.log((1 + total) / (1 + frequency)) + 1
+            for feature, frequency in document_frequency.items()
+            if frequency >= min_df
+        }
+
+        classes = sorted(set(labels))
+        model = cls(classes, idf, {intent: {} for intent in classes}, {intent: 0.0 for intent in classes})
+        examples = [(model.vectorize(message), label) for message, label in zip(messages, labels)]
+
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(examples)
+            step = learning_rate / (1 + epoch * 0.1)
+            for vector, label in examples:
+                probabilities = model._softmax(vector)
+                for intent in classes:
+                    gradient = probabilities[intent] - (1.0 if intent == label else 0.0)
+                    intent_weights = model.weights[intent]
+                    for feature, value in vector.items():
+                        weight = intent_weights.get(feature, 0.0)
+                        intent_weights[feature] = weight - step * (gradient * value + l2 * weight)
+                    model.bias[intent] -= step * gradient
+
+        # Drop weights too small to matter so the model file and lookups stay small
+        for intent in classes:
+            model.weights[intent] = {
+                feature: round(weight, 6)
+                for feature, weight in model.weights[intent].items()
+                if abs(weight) >= 1e-4
+            }
+        return model
+
+    def evaluate(self, messages: List[str], labels: List[str], threshold: float) -> Dict:
+        """Accuracy, coverage at the confidence threshold and per-turn latency"""
+        correct = confident = confident_correct = 0
+        latencies = []
+        per_class = {intent: {'support': 0, 'correct': 0} for intent in self.classes}
+
+        for message, label in zip(messages, labels):
+            started = time.perf_counter()
+            intent, probability = self.predict(message)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+            if label in per_class:
+                per_class[label]['support'] += 1
+            if intent == label:
+                correct += 1
+                per_class[label]['correct'] += 1
+            if probability >= threshold:
+                confident += 1
+                if intent == label:
+                    confident_correct += 1
+
+        latencies.sort()
+        count = len(labels)
+        return {
+            'examples': count,
+            'accuracy': correct / count if count else 0.0,
+            'threshold': threshold,
+            'coverage_at_threshold': confident / count if count else 0.0,
+            'accuracy_at_threshold': confident_correct / confident if confident else 0.0,
+            'latency_ms_p50': latencies[count // 2] if count else 0.0,
+            'latency_ms_p99': latencies[min(count - 1, int(count * 0.99))] if count else 0.0,
+            'per_class_accuracy': {
+                intent: stats['correct'] / stats['support'] if stats['support'] else None
+                for intent, stats in per_class.items()
+            }
+        }
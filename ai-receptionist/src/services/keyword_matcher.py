@@ -0,0 +1,176 @@
+import string
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Group name for emergency screening keywords when combined with intent keywords
+EMERGENCY_SCREEN = 'emergency_screen'
+
+# Up to this many distinct keywords a plain substring scan is faster than
+# indexing the utterance's words (benchmarks/intent_matcher_benchmark.py)
+SCAN_LIMIT = 64
+
+# Punctuation separates words like whitespace does. ASCII text goes through a
+# bytes table (str.translate with a dict is several times slower); the few
+# non-ASCII marks speech transcripts contain are replaced first.
+PUNCTUATION_TO_SPACE = bytes.maketrans(string.punctuation.encode(), b' ' * len(string.punctuation))
+UNICODE_PUNCTUATION = '‘’“”–—…'
+
+# Word endings a keyword still matches with in the word index: "appointments", "prices", "booking"
+INFLECTIONS = ('s', 'es', 'd', 'ed', 'ing')
+
+def inflections(word: str) -> List[str]:
+    """The word and its plural / past / -ing forms."""
+    forms = [word] + [word + ending for ending in INFLECTIONS]
+    if word.endswith('e'):
+        forms.append(word[:-1] + 'ing')
+    elif word.endswith('y'):
+        forms.append(word[:-1] + 'ies')
+    return forms
+
+class KeywordMatcher:
+    """
+    Matches several keyword tables against an utterance in a single pass.
+
+    Tables with up to scan_limit distinct keywords (the shipped ones) are
+    matched like the original keyword loops: each distinct keyword is looked
+    for once as a substring of the lowercased utterance, so a keyword shared
+    by several tables costs one check and plurals ("appointments", "prices")
+    match. Hyphens and curly apostrophes are normalized first, so
+    "chest-pain" and "can’t breathe" count.
+
+    Larger tables (per-practice service catalogues) index the utterance's
+    words instead, so the cost doesn't grow with the tables: punctuation is
+    turned into spaces, keywords match whole words including their plural /
+    past / -ing forms, and multi-word phrases are only searched for when
+    their first word is present. Groups listed in substring_groups (the
+    emergency screen by default) are still matched as substrings of the
+    normalized text there, so the screen is never less sensitive than a
+    plain substring check.
+    """
+
+    def __init__(self, keyword_groups: Dict[str, List[str]],
+                 substring_groups: Iterable[str] = (EMERGENCY_SCREEN,), scan_limit: int = SCAN_LIMIT):
+        self.keyword_groups = {group: list(keywords) for group, keywords in keyword_groups.items()}
+        distinct = {keyword for keywords in self.keyword_groups.values() for keyword in keywords}
+        self.scan = len(distinct) <= scan_limit
+
+        normalize = self.normalize_substring if self.scan else self.normalize
+        self.lowered_groups = {
+            group: [(normalize(keyword), keyword) for keyword in keywords]
+            for group, keywords in self.keyword_groups.items()
+        }
+        self.substring_groups = [group for group in substring_groups if group in self.keyword_groups]
+
+        # keyword -> groups containing it (word-matched groups only when indexing)
+        owners: Dict[str, Tuple[str, ...]] = {}
+        for group, keywords in self.lowered_groups.items():
+            if group in self.substring_groups and not self.scan:
+                continue
+            for keyword, _ in keywords:
+                if keyword and group not in owners.get(keyword, ()):
+                    owners[keyword] = owners.get(keyword, ()) + (group,)
+        self.keyword_owners = owners
+        self.scan_keywords = list(owners)
+
+        # word form -> (group, keyword) pairs it matches on its own
+        word_pairs: Dict[str, Tuple[Tuple[str, str], ...]] = {}
+        # first word -> (' ' + phrase stem, (' ' + phrase form + ' ', ...), group, keyword) for
+        # phrases starting with it; the forms are only checked once the stem is found
+        phrases: Dict[str, Tuple[Tuple[str, Tuple[str, ...], str, str], ...]] = {}
+        for keyword, groups in ({} if self.scan else owners).items():
+            words = keyword.split()
+            if len(words) == 1:
+                for form in inflections(keyword):
+                    word_pairs[form] = word_pairs.get(form, ()) + tuple((group, keyword) for group in groups)
+            else:
+                prefix = ' '.join(words[:-1])
+                last = words[-1][:-1] if words[-1][-1] in 'ey' else words[-1]
+                forms = tuple(f' {prefix} {form} ' for form in inflections(words[-1]))
+                phrases[words[0]] = phrases.get(words[0], ()) + tuple(
+                    (f' {prefix} {last}', forms, group, keyword) for group in groups
+                )
+
+        self.word_index: Dict[str, Tuple[tuple, tuple]] = {
+            word: (word_pairs.get(word, ()), phrases.get(word, ()))
+            for word in set(word_pairs) | set(phrases)
+        }
+        self.first_words: Set[str] = set(self.word_index)
+
+        # substring group -> normalized keywords (word index only)
+        self.substring_keywords: Dict[str, List[str]] = {} if self.scan else {
+            group: [keyword for keyword, _ in self.lowered_groups[group] if keyword]
+            for group in self.substring_groups
+        }
+
+    @staticmethod
+    def normalize_substring(text: str) -> str:
+        """Lowercased text with hyphens as spaces and curly apostrophes straightened."""
+        text = text.lower()
+        if not text.isascii():
+            text = text.replace('’', "'")
+        if '-' in text:
+            text = text.replace('-', ' ')
+        return text
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercased words, with punctuation and apostrophes treated as spaces."""
+        text = text.lower()
+        if not text.isascii():
+            for char in UNICODE_PUNCTUATION:
+                text = text.replace(char, ' ')
+        return text.encode().translate(PUNCTUATION_TO_SPACE).decode().split()
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """Text reduced to its words joined by single spaces."""
+        return ' '.join(cls.tokenize(text))
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """Return {group: set of matched keywords} for every group with a match."""
+        if not text:
+            return {}
+        if self.scan:
+            text = self.normalize_substring(text)
+            matches: Dict[str, Set[str]] = {}
+            for keyword in [keyword for keyword in self.scan_keywords if keyword in text]:
+                for group in self.keyword_owners[keyword]:
+                    if group in matches:
+                        matches[group].add(keyword)
+                    else:
+                        matches[group] = {keyword}
+            return matches
+
+        words = self.tokenize(text)
+        padded = f" {' '.join(words)} "
+
+        hits = []
+        for group, keywords in self.substring_keywords.items():
+            hits.extend((group, keyword) for keyword in keywords if keyword in padded)
+        for word in self.first_words.intersection(words):
+            pairs, phrases = self.word_index[word]
+            hits.extend(pairs)
+            for stem, forms, group, keyword in phrases:
+                if stem in padded:
+                    for form in forms:
+                        if form in padded:
+                            hits.append((group, keyword))
+                            break
+        return self._group_hits(hits)
+
+    @staticmethod
+    def _group_hits(hits: Iterable[Tuple[str, str]]) -> Dict[str, Set[str]]:
+        matches: Dict[str, Set[str]] = {}
+        for group, keyword in hits:
+            if group in matches:
+                matches[group].add(keyword)
+            else:
+                matches[group] = {keyword}
+        return matches
+
+    def first_match(self, group: str, matched_keywords: Set[str]) -> str:
+        """Return the first keyword of a group (in configured order) that matched, or ''."""
+        if matched_keywords:
+            for lowered, keyword in self.lowered_groups.get(group, []):
+                if lowered in matched_keywords:
+                    return keyword
+        return ''
@@ -1,11 +1,16 @@
 import os
+import io
 import json
+import wave
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import requests
 from flask import current_app
 
+from src.services.keyword_matcher import KeywordMatcher, EMERGENCY_SCREEN
+from src.services.tts_cache import TTSAudioCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,6 +50,15 @@ class PhoneService:
                 'bleeding', 'overdose', 'suicide', 'help me'
             ]
         }
+        
+        self.emergency_matcher = KeywordMatcher({
+            EMERGENCY_SCREEN: self.routing_rules['emergency_keywords']
+        })
+        
+        # Rendered speech, keyed by hash of (text, voice settings)
+        self.tts_cache = TTSAudioCache.from_env()
+        self.tts_provider = os.getenv('TTS_PROVIDER', 'simulated')
+        self.openai_voices = {'female_voice': 'nova', 'male_voice': 'onyx'}
     
     def initiate_call(self, phone_number: str, call_type: str = 'outbound') -> Dict:
         """
@@ -165,22 +179,18 @@ class PhoneService:
     def convert_text_to_speech(self, text: str, call_id: str, voice_settings: Dict = None) -> Dict:
         """
         Convert text to speech audio for AI responses.
-        In production, this would use TTS services like Google Text-to-Speech or Azure Speech.
+        Audio is cached by (text, voice settings), so repeated prompts are only synthesized once.
         """
         try:
             if voice_settings is None:
                 voice_settings = self.voice_settings
             
-            # Simulate text-to-speech conversion
-            # In production, you would use:
-            # - Google Cloud Text-to-Speech API
-            # - Azure Cognitive Services Speech
-            # - AWS Polly
-            # - OpenAI TTS API
+            audio_key, cached = self.tts_cache.get_or_render(text, voice_settings, self._synthesize_speech)
             
             result = {
                 'success': True,
-                'audio_url': f'/audio/tts_{call_id}_{datetime.now().strftime("%H%M%S")}.wav',
+                'audio_url': f'/api/voice/audio/{self.tts_cache.filename(audio_key)}',
+                'cached': cached,
                 'text': text,
                 'voice_settings': voice_settings,
                 'duration': len(text.split()) * 0.6,  # Estimate 0.6 seconds per word
@@ -188,7 +198,7 @@ class PhoneService:
                 'timestamp': datetime.now().isoformat()
             }
             
-            logger.info(f"Text-to-speech completed for call {call_id}: {len(text)} characters")
+            logger.info(f"Text-to-speech {'cache hit' if cached else 'completed'} for call {call_id}: {len(text)} characters")
             
             return result
             
@@ -200,6 +210,52 @@ class PhoneService:
                 'audio_url': None
             }
     
+    def prewarm_tts(self, phrases: List[str]) -> int:
+        """
+        Render fixed prompts (greetings, fallbacks) into the audio cache ahead of
+        the first call. Returns how many had to be synthesized.
+        """
+        rendered = 0
+        for phrase in phrases:
+            try:
+                _, cached = self.tts_cache.get_or_render(phrase, self.voice_settings, self._synthesize_speech)
+                rendered += 0 if cached else 1
+            except Exception as e:
+                logger.error(f"Error pre-warming TTS for '{phrase[:40]}': {e}")
+        logger.info(f"TTS cache pre-warmed: {len(phrases)} phrases, {rendered} synthesized")
+        return rendered
+    
+    def fixed_phrases(self) -> List[str]:
+        """Prompts spoken verbatim on many calls"""
+        return [self._generate_greeting(True), self._generate_greeting(False)]
+    
+    def _synthesize_speech(self, text: str, voice_settings: Dict) -> bytes:
+        """
+        Render text to WAV audio.
+        TTS_PROVIDER=openai uses the OpenAI speech API; the default 'simulated'
+        provider produces silence of the estimated spoken length.
+        """
+        if self.tts_provider == 'openai':
+            from openai import OpenAI
+            
+            response = OpenAI().audio.speech.create(
+                model=os.getenv('OPENAI_TTS_MODEL', 'tts-1'),
+                voice=self.openai_voices.get(voice_settings.get('voice_id'), 'nova'),
+                input=text,
+                speed=voice_settings.get('speech_rate', 1.0),
+                response_format='wav'
+            )
+            return response.content
+        
+        # Simulated synthesis: 8 kHz mono 16-bit silence, 0.6 seconds per word
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as audio:
+            audio.setnchannels(1)
+            audio.setsampwidth(2)
+            audio.setframerate(8000)
+            audio.writeframes(b'\x00\x00' * int(8000 * 0.6 * max(len(text.split()), 1)))
+        return buffer.getvalue()
+    
     def transfer_call(self, call_id: str, transfer_type: str, reason: str = '') -> Dict:
         """
         Transfer a call to human staff or emergency services.
@@ -341,15 +397,18 @@ I'm your AI assistant, and I can still help you with scheduling appointments, se
             
 How can I help you today?"""
     
-    def detect_emergency_in_speech(self, transcript: str) -> Tuple[bool, str]:
+    def detect_emergency_in_speech(self, transcript: str,
+                                   matched_keywords: Optional[set] = None) -> Tuple[bool, str]:
         """
         Detect if the caller is describing an emergency situation.
+        Pass matched_keywords from a combined KeywordMatcher scan to skip rescanning.
         """
-        transcript_lower = transcript.lower()
+        if matched_keywords is None:
+            matched_keywords = self.emergency_matcher.match(transcript).get(EMERGENCY_SCREEN, set())
         
-        for keyword in self.routing_rules['emergency_keywords']:
-            if keyword in transcript_lower:
-                return True, f"Emergency keyword detected: {keyword}"
+        keyword = self.emergency_matcher.first_match(EMERGENCY_SCREEN, matched_keywords)
+        if keyword:
+            return True, f"Emergency keyword detected: {keyword}"
         
         # Additional emergency detection logic could be added here
         # such as sentiment analysis or more sophisticated NLP
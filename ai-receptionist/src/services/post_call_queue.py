@@ -0,0 +1,156 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'post_call_jobs.db')
+
+class PostCallQueue:
+    """
+    Durable queue of work to do after a call ends (summaries, CRM logging,
+    analytics), kept in SQLite so jobs survive restarts and can be drained by
+    a worker process separate from the web workers.
+
+    Jobs are claimed with a lease: a job whose worker died is picked up again
+    once its lease expires. Failed jobs are retried with exponential backoff
+    until max_attempts, then left in the 'failed' state for inspection.
+    A dedupe_key makes enqueueing idempotent, so webhook retries don't create
+    duplicate jobs.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_QUEUE_DB, max_attempts: int = 5,
+                 retry_seconds: float = 30, lease_seconds: float = 300):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._create_table()
+
+    @classmethod
+    def from_env(cls) -> 'PostCallQueue':
+        return cls(
+            db_path=os.getenv('POST_CALL_QUEUE_DB', DEFAULT_QUEUE_DB),
+            max_attempts=int(os.getenv('POST_CALL_MAX_ATTEMPTS', '5')),
+            retry_seconds=float(os.getenv('POST_CALL_RETRY_SECONDS', '30')),
+            lease_seconds=float(os.getenv('POST_CALL_LEASE_SECONDS', '300'))
+        )
+
+    def enqueue(self, job_type: str, payload: Dict, dedupe_key: Optional[str] = None,
+                delay_seconds: float = 0) -> bool:
+        """Add a job; returns False if a job with the same dedupe_key already exists"""
+        now = time.time()
+        with self._connection() as connection:
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO post_call_jobs '
+                '(job_type, payload, dedupe_key, status, attempts, run_after, created_at, updated_at) '
+                "VALUES (?, ?, ?, 'pending', 0, ?, ?, ?)",
+                (job_type, json.dumps(payload), dedupe_key, now + delay_seconds, now, now)
+            )
+        return cursor.rowcount == 1
+
+    def claim(self) -> Optional[Dict]:
+        """
+        Take the next due job and lease it to the caller. Returns
+        {'id', 'job_type', 'payload', 'attempts'} (attempts includes this one) or None.
+        """
+        now = time.time()
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock first so two workers can't claim the same job
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT id, job_type, payload, attempts FROM post_call_jobs '
+                "WHERE (status = 'pending' AND run_after <= ?) OR (status = 'running' AND locked_until <= ?) "
+                'ORDER BY run_after LIMIT 1',
+                (now, now)
+            ).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+
+            job_id, job_type, payload, attempts = row
+            connection.execute(
+                "UPDATE post_call_jobs SET status = 'running', attempts = ?, locked_until = ?, updated_at = ? "
+                'WHERE id = ?',
+                (attempts + 1, now + self.lease_seconds, now, job_id)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        return {'id': job_id, 'job_type': job_type, 'payload': json.loads(payload), 'attempts': attempts + 1}
+
+    def complete(self, job_id: int):
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE post_call_jobs SET status = 'done', locked_until = NULL, last_error = NULL, updated_at = ? "
+                'WHERE id = ?',
+                (time.time(), job_id)
+            )
+
+    def fail(self, job_id: int, attempts: int, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried"""
+        now = time.time()
+        retry = attempts < self.max_attempts
+        # 30s, 60s, 120s, ... capped at an hour
+        run_after = now + min(self.retry_seconds * 2 ** (attempts - 1), 3600)
+        with self._connection() as connection:
+            connection.execute(
+                'UPDATE post_call_jobs SET status = ?, run_after = ?, locked_until = NULL, last_error = ?, '
+                'updated_at = ? WHERE id = ?',
+                ('pending' if retry else 'failed', run_after, error[:1000], now, job_id)
+            )
+        return retry
+
+    def is_final_attempt(self, job: Dict) -> bool:
+        return job['attempts'] >= self.max_attempts
+
+    def purge(self, older_than_seconds: float = 7 * 24 * 3600) -> int:
+        """Delete finished jobs older than the cutoff; failed jobs are kept"""
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "DELETE FROM post_call_jobs WHERE status = 'done' AND updated_at <= ?",
+                (time.time() - older_than_seconds,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        rows = self._connection().execute(
+            'SELECT status, COUNT(*) FROM post_call_jobs GROUP BY status'
+        ).fetchall()
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        oldest = self._connection().execute(
+            "SELECT MIN(created_at) FROM post_call_jobs WHERE status = 'pending'"
+        ).fetchone()[0]
+        counts['oldest_pending_seconds'] = time.time() - oldest if oldest else 0.0
+        return counts
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _create_table(self):
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS post_call_jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, job_type TEXT NOT NULL, payload TEXT NOT NULL, '
+            'dedupe_key TEXT UNIQUE, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'run_after REAL NOT NULL, locked_until REAL, last_error TEXT, '
+            'created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS ix_post_call_jobs_due ON post_call_jobs (status, run_after)'
+        )
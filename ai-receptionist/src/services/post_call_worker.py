@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from src.models.call import Call, ConversationTurn, db
+from src.services.batch_summarizer import claim_for_summary, release_summary_claims
+from src.services.post_call_queue import PostCallQueue
+
+logger = logging.getLogger(__name__)
+
+def enqueue_call_completed(queue: PostCallQueue, call_id: int, outcome: str = 'completed'):
+    """Queue the post-call work for an ended call; safe to call again for the same call"""
+    queue.enqueue('summarize_call', {'call_id': call_id, 'outcome': outcome}, dedupe_key=f'summarize_call:{call_id}')
+
+class PostCallWorker:
+    """
+    Drains the post-call queue: summarizes the conversation, then logs the
+    call to the CRM as a separate job, so a CRM outage doesn't repeat the
+    (paid) summary request.
+
+    Must run inside a Flask app context. Any number of workers, in any number
+    of processes, can share one queue.
+    """
+
+    def __init__(self, queue: PostCallQueue, ai_service, crm_service):
+        self.queue = queue
+        self.ai_service = ai_service
+        self.crm_service = crm_service
+        self.handlers = {
+            'summarize_call': self._summarize_call,
+            'log_call_interaction': self._log_call_interaction
+        }
+
+    def run_once(self) -> bool:
+        """Process one due job; returns False if there was nothing to do"""
+        job = self.queue.claim()
+        if job is None:
+            return False
+
+        handler = self.handlers.get(job['job_type'])
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job['job_type']}")
+            handler(job)
+            self.queue.complete(job['id'])
+        except Exception as e:
+            db.session.rollback()
+            retry = self.queue.fail(job['id'], job['attempts'], str(e))
+            log = logger.warning if retry else logger.error
+            log(f"Post-call job {job['id']} ({job['job_type']}) failed on attempt {job['attempts']}"
+                f"{', will retry' if retry else ', giving up'}: {e}")
+        finally:
+            db.session.remove()
+        return True
+
+    def run_forever(self, poll_interval: float = 1.0, stop_event: Optional[threading.Event] = None):
+        stop_event = stop_event or threading.Event()
+        last_purge = 0.0
+        while not stop_event.is_set():
+            try:
+                if time.time() - last_purge > 3600:
+                    self.queue.purge()
+                    last_purge = time.time()
+                if not self.run_once():
+                    stop_event.wait(poll_interval)
+            except Exception as e:
+                # Queue database unavailable; back off and keep the worker alive
+                logger.error(f"Post-call worker error: {e}")
+                stop_event.wait(poll_interval * 5)
+
+    def _summarize_call(self, job: Dict):
+        call_record = db.session.get(Call, job['payload']['call_id'])
+        if call_record is None:
+            logger.warning(f"Post-call job {job['id']}: call {job['payload']['call_id']} no longer exists")
+            return
+
+        conversation_turns = ConversationTurn.query.filter_by(
+            call_id=call_record.id
+        ).order_by(ConversationTurn.turn_number).all()
+
+        # Skip calls the batch summarizer (or a retried job) already summarized
+        if conversation_turns and call_record.summarized_at is None:
+            if not claim_for_summary([call_record.id]):
+                db.session.refresh(call_record)
+                if call_record.summarized_at is None:
+                    # A batch run is summarizing it; log to the CRM once that summary is in
+                    raise RuntimeError(f'Call {call_record.id} is being summarized by another run')
+            else:
+                try:
+                    # Keep retrying the LLM; on the last attempt settle for the fallback summary
+                    call_record.conversation_summary = self.ai_service.generate_conversation_summary(
+                        [turn.to_dict() for turn in conversation_turns],
+                        fallback_on_error=self.queue.is_final_attempt(job)
+                    )
+                    call_record.summarized_at = datetime.utcnow()
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    release_summary_claims([call_record.id])
+                    raise
+
+        self.queue.enqueue(
+            'log_call_interaction',
+            {'call_id': call_record.id, 'outcome': job['payload'].get('outcome', 'completed')},
+            dedupe_key=f'log_call_interaction:{call_record.id}'
+        )
+
+    def _log_call_interaction(self, job: Dict):
+        call_record = db.session.get(Call, job['payload']['call_id'])
+        if call_record is None:
+            return
+
+        crm_log_data = {
+            'call_id': call_record.id,
+            'patient_id': call_record.patient_id,
+            'phone_number': call_record.phone_number,
+            'conversation_summary': call_record.conversation_summary,
+            'intent_detected': call_record.intent_detected,
+            'outcome': job['payload'].get('outcome', 'completed'),
+            'appointment_created': call_record.appointment_created,
+            'follow_up_required': call_record.follow_up_required
+        }
+
+        crm_result = self.crm_service.log_call_interaction(crm_log_data)
+        if not crm_result['success']:
+            raise RuntimeError(crm_result.get('error', 'CRM logging failed'))
+        logger.info(f"Call {call_record.id} logged to CRM: {crm_result['interaction_id']}")
+
+def start_worker_thread(app, queue: Optional[PostCallQueue] = None) -> threading.Thread:
+    """Run a worker inside this process, e.g. for the development server"""
+    from src.services.ai_service import AIReceptionistService
+    from src.services.crm_integration import CRMIntegrationService
+
+    worker = PostCallWorker(queue or PostCallQueue.from_env(), AIReceptionistService(), CRMIntegrationService())
+    poll_interval = float(os.getenv('POST_CALL_POLL_SECONDS', '1'))
+
+    def run():
+        with app.app_context():
+            worker.run_forever(poll_interval)
+
+    thread = threading.Thread(target=run, name='post-call-worker', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,75 @@
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or a line break. Common titles and a.m./p.m. are not treated as sentence ends.
+SENTENCE_END = re.compile(
+    r'(?<!\bDr)(?<!\bMr)(?<!\bMs)(?<!\bMrs)(?<!\bSt)(?<!\bvs)(?<![ap]\.m)[.!?]+["\')\]]*(?=\s)|\n+'
+)
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter behind iter_sentences/aiter_sentences.
+
+    feed() takes the next text delta and returns the sentences it completed;
+    finish() returns whatever is left. Fragments shorter than min_chars
+    ("Sure." / "Yes!") are held and joined to the next sentence so TTS isn't
+    handed tiny clips.
+    """
+
+    def __init__(self, min_chars: int = 12):
+        self.min_chars = min_chars
+        self.buffer = ''
+        self.scan_from = 0
+
+    def feed(self, delta: str) -> List[str]:
+        if not delta:
+            return []
+        self.buffer += delta
+        sentences = []
+
+        while True:
+            boundary = SENTENCE_END.search(self.buffer, self.scan_from)
+            if not boundary:
+                # Re-check the tail next time in case the boundary straddles deltas
+                self.scan_from = max(0, len(self.buffer) - 4)
+                break
+
+            sentence = self.buffer[:boundary.end()].strip()
+            if len(sentence) < self.min_chars:
+                self.scan_from = boundary.end()
+                continue
+
+            sentences.append(sentence)
+            self.buffer = self.buffer[boundary.end():]
+            self.scan_from = 0
+
+        return sentences
+
+    def finish(self) -> List[str]:
+        remainder = self.buffer.strip()
+        self.buffer = ''
+        self.scan_from = 0
+        return [remainder] if remainder else []
+
+def iter_sentences(deltas: Iterable[str], min_chars: int = 12) -> Iterator[str]:
+    """
+    Re-chunk streamed text deltas into complete sentences.
+
+    Each sentence is yielded as soon as its boundary arrives. Fragments shorter
+    than min_chars ("Sure." / "Yes!") are held and joined to the next sentence
+    so TTS isn't handed tiny clips.
+    """
+    splitter = SentenceSplitter(min_chars)
+    for delta in deltas:
+        yield from splitter.feed(delta)
+    yield from splitter.finish()
+
+async def aiter_sentences(deltas: AsyncIterable[str], min_chars: int = 12) -> AsyncIterator[str]:
+    """iter_sentences for an async stream of deltas"""
+    splitter = SentenceSplitter(min_chars)
+    async for delta in deltas:
+        for sentence in splitter.feed(delta):
+            yield sentence
+    for sentence in splitter.finish():
+        yield sentence
@@ -0,0 +1,30 @@
+import math
+import re
+from typing import Dict, List
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('cl100k_base')
+except Exception:  # tiktoken not installed or encoding unavailable offline
+    _ENCODING = None
+
+TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Chat format overhead per message (role + separators) and for the reply primer
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens in text for gpt-3.5-turbo. Uses tiktoken when it is installed, otherwise
+    a close estimate: one token per punctuation mark and per ~4 characters of a word.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return sum(math.ceil(len(piece) / 4) for piece in TOKEN_PIECES.findall(text))
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """Prompt tokens for a list of chat messages"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(message['content']) for message in messages) + TOKENS_PER_REPLY
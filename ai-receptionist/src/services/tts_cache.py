@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'tts_cache')
+
+class TTSAudioCache:
+    """
+    Content-addressed cache of rendered speech audio on disk.
+
+    Files are named by the SHA-256 of (text, voice settings), so identical
+    prompts are synthesized once and served as static files by every worker
+    that shares the directory. The directory is kept under max_bytes by
+    evicting the least recently used files (file mtime is refreshed on every
+    hit, so the LRU order survives restarts).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 200 * 1024 * 1024,
+                 extension: str = 'wav'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # The directory itself is created on the first write
+        self._load_index()
+
+    @classmethod
+    def from_env(cls) -> 'TTSAudioCache':
+        return cls(
+            cache_dir=os.getenv('TTS_CACHE_DIR', DEFAULT_CACHE_DIR),
+            max_bytes=int(os.getenv('TTS_CACHE_MAX_MB', '200')) * 1024 * 1024
+        )
+
+    @staticmethod
+    def make_key(text: str, voice_settings: Dict) -> str:
+        payload = json.dumps({'text': text, 'voice': voice_settings}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def filename(self, key: str) -> str:
+        return f'{key}.{self.extension}'
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, self.filename(key))
+
+    def get_or_render(self, text: str, voice_settings: Dict,
+                      render: Callable[[str, Dict], bytes]) -> Tuple[str, bool]:
+        """
+        Return (key, was_cached). On a miss render(text, voice_settings) is called
+        once, even if several requests ask for the same audio at the same time.
+        """
+        key = self.make_key(text, voice_settings)
+        if self._touch(key):
+            return key, True
+
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+
+        try:
+            with render_lock:
+                # Another thread may have rendered it while we waited
+                if self._touch(key):
+                    return key, True
+
+                audio = render(text, voice_settings)
+                self._store(key, audio)
+        finally:
+            with self._lock:
+                self._render_locks.pop(key, None)
+
+        with self._lock:
+            self.misses += 1
+        return key, False
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'files': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _touch(self, key: str) -> bool:
+        """Mark a cached file as recently used; False if it isn't on disk"""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Missing, or evicted by another worker sharing the directory
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return False
+
+        with self._lock:
+            if key not in self._entries:
+                size = os.path.getsize(path)
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return True
+
+    def _store(self, key: str, audio: bytes):
+        path = self.path(key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(temp_path, 'wb') as audio_file:
+            audio_file.write(audio)
+        # Atomic rename: readers never see a half-written file
+        os.replace(temp_path, path)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._entries[key] = len(audio)
+            self._total_bytes += len(audio)
+            self._evict()
+
+    def _evict(self):
+        # Caller holds self._lock
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        suffix = f'.{self.extension}'
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        files = []
+        for name in names:
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name[:-len(suffix)], stat.st_size))
+
+        with self._lock:
+            for _, key, size in sorted(files):
+                self._entries[key] = size
+                self._total_bytes += size
+            self._evict()
@@ -0,0 +1,143 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-stage timeouts in seconds
+DEFAULT_STAGE_TIMEOUTS = {
+    'intent': float(os.getenv('TURN_TIMEOUT_INTENT', '3')),
+    'response': float(os.getenv('TURN_TIMEOUT_RESPONSE', '8')),
+    'crm': float(os.getenv('TURN_TIMEOUT_CRM', '5'))
+}
+
+class TurnPipeline:
+    """
+    Runs the stages of one conversational turn on a shared asyncio loop,
+    overlapping the ones that don't depend on each other:
+
+        intent detection
+        -> entity extraction
+        -> response generation  ||  CRM appointment request
+
+    so a turn costs the critical path rather than the sum of all stages. Each
+    stage has its own timeout and a fallback value, so a slow dependency
+    degrades the reply instead of failing the call.
+
+    The caller loads the conversation history (a session store read) before
+    the turn and applies every database change after it: a stage that times
+    out keeps running in the background, so stages must not touch the
+    request's SQLAlchemy session or its ORM objects. schedule_appointment
+    only calls the CRM and returns its result.
+
+    Flask views stay synchronous: run_turn() submits the coroutine to a
+    background loop and waits for it. A blocking schedule_appointment runs in
+    the loop's thread pool. The ASGI webhooks (src/routes/async_voice.py)
+    await run_turn_async() on their own loop instead and pass a coroutine
+    function, which is awaited directly.
+    """
+
+    def __init__(self, ai_service, timeouts: Optional[Dict[str, float]] = None):
+        self.ai_service = ai_service
+        self.timeouts = {**DEFAULT_STAGE_TIMEOUTS, **(timeouts or {})}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def run_turn(self, speech_text: str, keyword_matches: Dict, history: List[Dict],
+                 schedule_appointment: Optional[Callable[[Dict], Dict]] = None,
+                 generate_response: bool = True) -> Dict:
+        """
+        Run a turn and return intent, confidence, entities, ai_response,
+        appointment_result, the reply's token usage and per-stage timings (ms).
+
+        history is the call's recent turns from the session store.
+        schedule_appointment(entities) is only called for appointment_scheduling turns.
+        With generate_response=False the reply is left to the caller (e.g. streaming).
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_turn(speech_text, keyword_matches, history, schedule_appointment, generate_response),
+            self._get_loop()
+        )
+        return future.result()
+
+    async def run_turn_async(self, speech_text: str, keyword_matches: Dict, history: List[Dict],
+                             schedule_appointment: Optional[Callable[[Dict], Dict]] = None,
+                             generate_response: bool = True) -> Dict:
+        """run_turn on the caller's event loop; schedule_appointment may be a coroutine function"""
+        return await self._run_turn(speech_text, keyword_matches, history, schedule_appointment,
+                                    generate_response)
+
+    async def _run_turn(self, speech_text, keyword_matches, history, schedule_appointment,
+                        generate_response) -> Dict:
+        started = time.perf_counter()
+        timings = {}
+
+        intent, confidence = await self._stage(
+            'intent', self.ai_service.detect_intent_async(speech_text, keyword_matches),
+            ('general_info', 0.3), timings
+        )
+        entities_started = time.perf_counter()
+        entities = self.ai_service.extract_entities(speech_text, intent)
+        timings['entities'] = (time.perf_counter() - entities_started) * 1000
+
+        stages = {}
+        usage = {}
+        if generate_response:
+            stages['response'] = self._stage(
+                'response',
+                self.ai_service.generate_response_async(speech_text, intent, entities, history, usage),
+                self.ai_service._get_fallback_response(intent),
+                timings
+            )
+        if schedule_appointment and intent == 'appointment_scheduling' and entities:
+            stages['crm'] = self._stage(
+                'crm',
+                self._call(schedule_appointment, entities),
+                {'success': False, 'error': 'timeout', 'message': 'Failed to process appointment request'},
+                timings
+            )
+        results = dict(zip(stages, await asyncio.gather(*stages.values())))
+
+        timings['total'] = (time.perf_counter() - started) * 1000
+        return {
+            'intent': intent,
+            'confidence': confidence,
+            'entities': entities,
+            'ai_response': results.get('response'),
+            'appointment_result': results.get('crm'),
+            'usage': usage,
+            'timings': timings
+        }
+
+    @staticmethod
+    def _call(function: Callable, *args):
+        """Awaitable for a stage callable: coroutine functions run on the loop, anything else in its thread pool"""
+        if inspect.iscoroutinefunction(function):
+            return function(*args)
+        return asyncio.to_thread(function, *args)
+
+    async def _stage(self, name: str, awaitable, fallback, timings: Dict):
+        """Await a stage with its timeout; log and return the fallback on timeout or error"""
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.timeouts[name])
+        except asyncio.TimeoutError:
+            logger.warning(f"Turn stage '{name}' timed out after {self.timeouts[name]}s")
+            return fallback
+        except Exception as e:
+            logger.error(f"Turn stage '{name}' failed: {e}")
+            return fallback
+        finally:
+            timings[name] = (time.perf_counter() - started) * 1000
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        # One long-lived loop per process so the async OpenAI client keeps its connection pool
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='turn-pipeline', daemon=True).start()
+            return self._loop
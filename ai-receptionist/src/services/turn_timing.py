@@ -0,0 +1,113 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Stages in the order a turn goes through them. Pipeline stages (llm, crm)
+# overlap, so stage times can add up to more than the total.
+TURN_STAGES = ['stt', 'emergency', 'history', 'intent', 'entities', 'llm', 'crm', 'tts', 'db']
+
+# TurnPipeline timing names -> stage names
+PIPELINE_STAGES = {'intent': 'intent', 'entities': 'entities', 'response': 'llm', 'crm': 'crm'}
+
+class TurnTimer:
+    """
+    Collects how long each stage of one turn took (ms), from when the webhook
+    started handling it, plus the LLM token usage of the reply.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.tokens = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name: str, elapsed_ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def add_pipeline(self, turn: Dict):
+        """Take the stage timings and token usage from a TurnPipeline result"""
+        for pipeline_name, elapsed_ms in turn.get('timings', {}).items():
+            if pipeline_name in PIPELINE_STAGES:
+                self.add(PIPELINE_STAGES[pipeline_name], elapsed_ms)
+        self.add_usage(turn.get('usage'))
+
+    def add_usage(self, usage: Optional[Dict]):
+        for key in ('prompt_tokens', 'completion_tokens'):
+            if usage and usage.get(key):
+                self.tokens[key] = self.tokens.get(key, 0) + usage[key]
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self) -> Dict:
+        return {
+            'total': round(self.total_ms(), 2),
+            'stages': {name: round(elapsed_ms, 2) for name, elapsed_ms in self.stages.items()},
+            'tokens': self.tokens
+        }
+
+def summarize_turn_timings(rows: Iterable[Tuple[datetime, Dict]]) -> Dict:
+    """
+    Aggregate (turn timestamp, TurnTimer.to_dict()) rows by stage, overall and
+    per hour: sample count, mean, p50, p95 and max per stage, and token totals.
+    """
+    overall = _Bucket()
+    hours = {}
+    for timestamp, timings in rows:
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        for bucket in (overall, hours.setdefault(hour, _Bucket())):
+            bucket.add(timings)
+
+    return {
+        'stages': TURN_STAGES,
+        'overall': overall.summary(),
+        'hourly': [{'hour': hour.isoformat(), **bucket.summary()} for hour, bucket in sorted(hours.items())]
+    }
+
+class _Bucket:
+    def __init__(self):
+        self.turns = 0
+        self.totals = []
+        self.stages = {}
+        self.tokens = {'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def add(self, timings: Dict):
+        self.turns += 1
+        self.totals.append(timings.get('total', 0.0))
+        for name, elapsed_ms in timings.get('stages', {}).items():
+            self.stages.setdefault(name, []).append(elapsed_ms)
+        for key, count in timings.get('tokens', {}).items():
+            self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def summary(self) -> Dict:
+        known = [name for name in TURN_STAGES if name in self.stages]
+        other = sorted(name for name in self.stages if name not in TURN_STAGES)
+        return {
+            'turns': self.turns,
+            'total_ms': _distribution(self.totals),
+            'stage_ms': {name: _distribution(self.stages[name]) for name in known + other},
+            'tokens': {
+                **self.tokens,
+                'completion_tokens_per_turn': round(self.tokens['completion_tokens'] / self.turns, 1) if self.turns else 0.0
+            }
+        }
+
+def _distribution(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 2),
+        'p50': round(ordered[len(ordered) // 2], 2),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max': round(ordered[-1], 2)
+    }
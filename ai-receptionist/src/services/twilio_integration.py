@@ -5,18 +5,23 @@ Handles voice calls, SMS, and telephony integration with Twilio's API
 
 import os
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+from xml.sax.saxutils import escape
 from flask import request, current_app
 from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse, Gather, Say, Record
-from twilio.base.exceptions import TwilioException
+from twilio.base.exceptions import TwilioException, TwilioRestException
 import requests
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stands in for the message when rendering the AI response template; survives XML escaping unchanged
+AI_MESSAGE_PLACEHOLDER = 'AI_MESSAGE_PLACEHOLDER_0b6f2c'
+
 class TwilioIntegrationService:
     """
     Service for integrating with Twilio's Voice API for phone calls.
@@ -32,6 +37,9 @@ class TwilioIntegrationService:
         # Initialize Twilio client
         try:
             self.client = Client(self.account_sid, self.auth_token)
+            # Point the REST API elsewhere, e.g. at a local stub for load tests
+            if os.getenv('TWILIO_API_BASE_URL'):
+                self.client.api.base_url = os.getenv('TWILIO_API_BASE_URL')
             logger.info("Twilio client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Twilio client: {e}")
@@ -52,33 +60,135 @@ class TwilioIntegrationService:
             'hours': 'Monday through Friday, 8 AM to 6 PM',
             'emergency_message': 'If this is a medical emergency, please hang up and dial 911 immediately.'
         }
+        
+        # Rendered TwiML for responses that don't change between calls
+        self._rendered_twiml = {}
     
     def create_incoming_call_response(self, caller_id: str = None) -> str:
         """
         Create TwiML response for incoming calls with AI greeting.
         """
         try:
-            response = VoiceResponse()
-            
-            # Emergency check first
-            response.say(
-                self.practice_info['emergency_message'],
-                voice=self.voice_settings['voice'],
-                language=self.voice_settings['language']
-            )
+            return self._cached_twiml('incoming_call', self._build_incoming_call_response)
             
-            # Pause for emergency consideration
-            response.pause(length=2)
+        except Exception as e:
+            logger.error(f"Error creating incoming call response: {e}")
+            # Fallback response
+            return self._cached_twiml('incoming_call_fallback', self._build_incoming_call_fallback)
+    
+    def create_ai_response(self, ai_message: str, should_continue: bool = True) -> str:
+        """
+        Create TwiML response with AI-generated message and continue conversation.
+        
+        Everything but the message is static, so the document is rendered once per
+        variant and the escaped message is spliced in between the two halves.
+        """
+        try:
+            prefix, suffix = self._ai_response_template(should_continue)
+            return prefix + escape(ai_message) + suffix
             
-            # Main greeting
-            greeting_text = (
-                f"Hello and thank you for calling {self.practice_info['name']}. "
-                f"I'm your AI assistant and I'm here to help you with appointment scheduling, "
-                f"service information, and general inquiries. "
-                f"Please tell me how I can assist you today."
+        except Exception as e:
+            logger.error(f"Error creating AI response: {e}")
+            return self._cached_twiml('ai_response_fallback', self._build_ai_response_fallback)
+    
+    def create_transfer_response(self, transfer_type: str = 'reception') -> str:
+        """
+        Create TwiML response for transferring calls to human staff.
+        """
+        try:
+            return self._cached_twiml(
+                f'transfer_{transfer_type}', lambda: self._build_transfer_response(transfer_type)
             )
             
-            # Use Gather to collect speech input
+        except Exception as e:
+            logger.error(f"Error creating transfer response: {e}")
+            return self._cached_twiml('transfer_fallback', self._build_transfer_fallback)
+    
+    def _cached_twiml(self, key: str, build) -> str:
+        """
+        Return the rendered TwiML for a static response, building it on first use.
+        Responses only depend on voice_settings and practice_info, which are fixed
+        after __init__.
+        """
+        twiml = self._rendered_twiml.get(key)
+        if twiml is None:
+            twiml = self._rendered_twiml[key] = build()
+        return twiml
+    
+    def _ai_response_template(self, should_continue: bool) -> Tuple[str, str]:
+        """Split a rendered AI response around a placeholder message"""
+        def build():
+            twiml = self._build_ai_response(AI_MESSAGE_PLACEHOLDER, should_continue)
+            prefix, suffix = twiml.split(AI_MESSAGE_PLACEHOLDER)
+            return prefix, suffix
+        
+        return self._cached_twiml(f'ai_response_{bool(should_continue)}', build)
+    
+    def _build_incoming_call_response(self) -> str:
+        response = VoiceResponse()
+        
+        # Emergency check first
+        response.say(
+            self.practice_info['emergency_message'],
+            voice=self.voice_settings['voice'],
+            language=self.voice_settings['language']
+        )
+        
+        # Pause for emergency consideration
+        response.pause(length=2)
+        
+        # Main greeting
+        greeting_text = (
+            f"Hello and thank you for calling {self.practice_info['name']}. "
+            f"I'm your AI assistant and I'm here to help you with appointment scheduling, "
+            f"service information, and general inquiries. "
+            f"Please tell me how I can assist you today."
+        )
+        
+        # Use Gather to collect speech input
+        gather = Gather(
+            input='speech',
+            timeout=10,
+            speech_timeout='auto',
+            action='/api/voice/process-speech',
+            method='POST',
+            enhanced=True,
+            language=self.voice_settings['language']
+        )
+        
+        gather.say(
+            greeting_text,
+            voice=self.voice_settings['voice'],
+            language=self.voice_settings['language']
+        )
+        
+        response.append(gather)
+        
+        # Fallback if no input received
+        response.say(
+            "I didn't hear anything. Please call back if you need assistance. Goodbye.",
+            voice=self.voice_settings['voice'],
+            language=self.voice_settings['language']
+        )
+        response.hangup()
+        
+        return str(response)
+    
+    def _build_incoming_call_fallback(self) -> str:
+        response = VoiceResponse()
+        response.say(
+            f"Thank you for calling {self.practice_info['name']}. "
+            f"Please call us back at {self.practice_info['phone']}. Goodbye.",
+            voice='alice'
+        )
+        response.hangup()
+        return str(response)
+    
+    def _build_ai_response(self, ai_message: str, should_continue: bool) -> str:
+        response = VoiceResponse()
+        
+        if should_continue:
+            # Continue conversation with speech input
             gather = Gather(
                 input='speech',
                 timeout=10,
@@ -90,131 +200,76 @@ class TwilioIntegrationService:
             )
             
             gather.say(
-                greeting_text,
+                ai_message,
                 voice=self.voice_settings['voice'],
                 language=self.voice_settings['language']
             )
             
             response.append(gather)
             
-            # Fallback if no input received
+            # Fallback if no response
             response.say(
-                "I didn't hear anything. Please call back if you need assistance. Goodbye.",
+                "I didn't hear a response. Is there anything else I can help you with?",
                 voice=self.voice_settings['voice'],
                 language=self.voice_settings['language']
             )
-            response.hangup()
             
-            return str(response)
+            # Final gather attempt
+            final_gather = Gather(
+                input='speech',
+                timeout=5,
+                speech_timeout='auto',
+                action='/api/voice/process-speech',
+                method='POST'
+            )
+            final_gather.say("Please let me know if you need anything else.")
+            response.append(final_gather)
             
-        except Exception as e:
-            logger.error(f"Error creating incoming call response: {e}")
-            # Fallback response
-            response = VoiceResponse()
+            # End call if still no response
+            response.say("Thank you for calling. Goodbye.")
+            response.hangup()
+        else:
+            # End conversation
             response.say(
-                f"Thank you for calling {self.practice_info['name']}. "
-                f"Please call us back at {self.practice_info['phone']}. Goodbye.",
-                voice='alice'
+                ai_message,
+                voice=self.voice_settings['voice'],
+                language=self.voice_settings['language']
             )
             response.hangup()
-            return str(response)
+        
+        return str(response)
     
-    def create_ai_response(self, ai_message: str, should_continue: bool = True) -> str:
-        """
-        Create TwiML response with AI-generated message and continue conversation.
-        """
-        try:
-            response = VoiceResponse()
-            
-            if should_continue:
-                # Continue conversation with speech input
-                gather = Gather(
-                    input='speech',
-                    timeout=10,
-                    speech_timeout='auto',
-                    action='/api/voice/process-speech',
-                    method='POST',
-                    enhanced=True,
-                    language=self.voice_settings['language']
-                )
-                
-                gather.say(
-                    ai_message,
-                    voice=self.voice_settings['voice'],
-                    language=self.voice_settings['language']
-                )
-                
-                response.append(gather)
-                
-                # Fallback if no response
-                response.say(
-                    "I didn't hear a response. Is there anything else I can help you with?",
-                    voice=self.voice_settings['voice'],
-                    language=self.voice_settings['language']
-                )
-                
-                # Final gather attempt
-                final_gather = Gather(
-                    input='speech',
-                    timeout=5,
-                    speech_timeout='auto',
-                    action='/api/voice/process-speech',
-                    method='POST'
-                )
-                final_gather.say("Please let me know if you need anything else.")
-                response.append(final_gather)
-                
-                # End call if still no response
-                response.say("Thank you for calling. Goodbye.")
-                response.hangup()
-            else:
-                # End conversation
-                response.say(
-                    ai_message,
-                    voice=self.voice_settings['voice'],
-                    language=self.voice_settings['language']
-                )
-                response.hangup()
-            
-            return str(response)
-            
-        except Exception as e:
-            logger.error(f"Error creating AI response: {e}")
-            response = VoiceResponse()
-            response.say("I apologize, but I'm having technical difficulties. Please call back later.")
-            response.hangup()
-            return str(response)
+    def _build_ai_response_fallback(self) -> str:
+        response = VoiceResponse()
+        response.say("I apologize, but I'm having technical difficulties. Please call back later.")
+        response.hangup()
+        return str(response)
     
-    def create_transfer_response(self, transfer_type: str = 'reception') -> str:
-        """
-        Create TwiML response for transferring calls to human staff.
-        """
-        try:
-            response = VoiceResponse()
-            
-            if transfer_type == 'emergency':
-                response.say(
-                    "I'm transferring you to emergency services immediately.",
-                    voice=self.voice_settings['voice']
-                )
-                # In production, this would dial 911 or emergency line
-                response.dial('911')
-            else:
-                response.say(
-                    "Let me transfer you to our reception staff who can better assist you. Please hold.",
-                    voice=self.voice_settings['voice']
-                )
-                # Transfer to practice number (would be internal extension in production)
-                response.dial(self.practice_info['phone'])
-            
-            return str(response)
-            
-        except Exception as e:
-            logger.error(f"Error creating transfer response: {e}")
-            response = VoiceResponse()
-            response.say("I'm unable to transfer your call right now. Please call back.")
-            response.hangup()
-            return str(response)
+    def _build_transfer_response(self, transfer_type: str) -> str:
+        response = VoiceResponse()
+        
+        if transfer_type == 'emergency':
+            response.say(
+                "I'm transferring you to emergency services immediately.",
+                voice=self.voice_settings['voice']
+            )
+            # In production, this would dial 911 or emergency line
+            response.dial('911')
+        else:
+            response.say(
+                "Let me transfer you to our reception staff who can better assist you. Please hold.",
+                voice=self.voice_settings['voice']
+            )
+            # Transfer to practice number (would be internal extension in production)
+            response.dial(self.practice_info['phone'])
+        
+        return str(response)
+    
+    def _build_transfer_fallback(self) -> str:
+        response = VoiceResponse()
+        response.say("I'm unable to transfer your call right now. Please call back.")
+        response.hangup()
+        return str(response)
     
     def make_outbound_call(self, to_number: str, message: str, callback_url: str = None) -> Dict:
         """
@@ -245,6 +300,10 @@ class TwilioIntegrationService:
                 'from': self.phone_number
             }
             
+        except TwilioRestException as e:
+            # http_status lets callers back off on 429 (calls-per-second limit) and retry 5xx
+            logger.error(f"Twilio error making outbound call: {e}")
+            return {'success': False, 'error': str(e), 'http_status': e.status, 'twilio_code': e.code}
         except TwilioException as e:
             logger.error(f"Twilio error making outbound call: {e}")
             return {'success': False, 'error': str(e)}
@@ -252,7 +311,8 @@ class TwilioIntegrationService:
             logger.error(f"Error making outbound call: {e}")
             return {'success': False, 'error': str(e)}
     
-    def make_appointment_confirmation_call(self, patient_phone: str, appointment_data: Dict) -> Dict:
+    def make_appointment_confirmation_call(self, patient_phone: str, appointment_data: Dict,
+                                           callback_url: str = None) -> Dict:
         """
         Make an outbound call to confirm an appointment.
         """
@@ -270,7 +330,7 @@ class TwilioIntegrationService:
                 f"You can also call us back at {self.practice_info['phone']}."
             )
             
-            return self.make_outbound_call(patient_phone, message)
+            return self.make_outbound_call(patient_phone, message, callback_url)
             
         except Exception as e:
             logger.error(f"Error making appointment confirmation call: {e}")
@@ -283,7 +343,7 @@ class TwilioIntegrationService:
         # In production, this would create a proper TwiML endpoint
         # For now, return a placeholder URL that would serve the TwiML
         base_url = os.getenv('BASE_URL', 'https://your-domain.com')
-        return f"{base_url}/api/voice/outbound-twiml?message={message}"
+        return f"{base_url}/api/twilio/outbound-twiml?message={quote(message)}"
     
     def get_call_details(self, call_sid: str) -> Dict:
         """
@@ -315,6 +375,23 @@ class TwilioIntegrationService:
             logger.error(f"Error getting call details: {e}")
             return {'success': False, 'error': str(e)}
     
+    def find_recent_calls(self, to_number: str, since: datetime) -> List[Dict]:
+        """
+        Calls to a number created at or after `since` (UTC), newest first. Used to
+        find out whether a call request that got no answer was placed after all.
+        Raises on API errors, since "no call" and "couldn't check" must differ.
+        """
+        if not self.client:
+            raise RuntimeError('Twilio client not initialized')
+        
+        # Queued calls have no start time yet, so compare creation times
+        since = since.replace(tzinfo=timezone.utc) if since.tzinfo is None else since
+        return [
+            {'call_sid': call.sid, 'status': call.status}
+            for call in self.client.calls.list(to=to_number, limit=20)
+            if call.date_created and call.date_created >= since
+        ]
+    
     def end_call(self, call_sid: str) -> Dict:
         """
         End an active call.
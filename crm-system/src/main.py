@@ -6,7 +6,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
+from src.models.routing import READ_REPLICA_BIND
 from src.models.patient import Patient, ConsultationRequest, Appointment, Communication, EmailTemplate
+from src.models.idempotency import IdempotencyKey
 from src.routes.user import user_bp
 from src.routes.patients import patients_bp
 from src.services.automation_service import AutomationService
@@ -21,7 +23,19 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(patients_bp, url_prefix='/api')
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+database_url = os.getenv('CRM_DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}")
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+
+# Read-only endpoints (lists, patient details, dashboard) use a separate engine:
+# a PostgreSQL replica via CRM_READ_DATABASE_URL, or by default a read-only
+# URI connection to the same SQLite file
+read_database_url = os.getenv('CRM_READ_DATABASE_URL')
+if not read_database_url:
+    if database_url.startswith('sqlite:///'):
+        read_database_url = f"sqlite:///file:{database_url[len('sqlite:///'):]}?mode=ro&uri=true"
+    else:
+        read_database_url = database_url
+app.config['SQLALCHEMY_BINDS'] = {READ_REPLICA_BIND: read_database_url}
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
@@ -29,8 +43,15 @@ db.init_app(app)
 automation_service = AutomationService(app)
 
 with app.app_context():
+    # Creates missing tables only; columns and indexes added to existing tables
+    # come from scripts/migrate_schema.py, run once per deploy
     db.create_all()
     
+    # WAL lets the read-only connections read while a write is in progress
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+        db.session.commit()
+    
     # Create default email templates if they don't exist
     from src.services.email_service import EmailService
     email_service = EmailService()
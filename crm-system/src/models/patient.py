@@ -1,7 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.orm import validates
 from src.models.user import db
 
+def normalize_phone(phone):
+    """
+    Normalize a phone number to E.164 (+14845550199). Numbers without a country
+    code are taken as US numbers. Returns None if it doesn't look like a number.
+    """
+    if not phone:
+        return None
+    digits = ''.join(filter(str.isdigit, phone))
+    if phone.strip().startswith('+'):
+        return f'+{digits}' if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return f'+1{digits}'
+    if len(digits) == 11 and digits[0] == '1':
+        return f'+{digits}'
+    return None
+
 class Patient(db.Model):
     __tablename__ = 'patients'
     
@@ -10,6 +27,7 @@ class Patient(db.Model):
     last_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(255), unique=True, nullable=False)
     phone = db.Column(db.String(20))
+    phone_e164 = db.Column(db.String(16), index=True)  # normalized copy of phone for caller-ID lookups
     date_of_birth = db.Column(db.Date)
     insurance_provider = db.Column(db.String(255))
     preferred_contact_method = db.Column(db.String(20), default='email')
@@ -22,6 +40,11 @@ class Patient(db.Model):
     appointments = db.relationship('Appointment', backref='patient', lazy=True)
     communications = db.relationship('Communication', backref='patient', lazy=True)
     
+    @validates('phone')
+    def _set_phone_e164(self, key, phone):
+        self.phone_e164 = normalize_phone(phone)
+        return phone
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -29,6 +52,7 @@ class Patient(db.Model):
             'last_name': self.last_name,
             'email': self.email,
             'phone': self.phone,
+            'phone_e164': self.phone_e164,
             'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
             'insurance_provider': self.insurance_provider,
             'preferred_contact_method': self.preferred_contact_method,
@@ -60,6 +84,10 @@ class ConsultationRequest(db.Model):
     # Relationships
     appointment = db.relationship('Appointment', backref='consultation_request', uselist=False, lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_consultation_requests_patient_created', 'patient_id', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -93,11 +121,16 @@ class Appointment(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_appointments_patient_created', 'patient_id', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'patient_id': self.patient_id,
             'patient_name': self.patient.get_full_name() if self.patient else None,
+            'patient_phone': self.patient.phone if self.patient else None,
             'consultation_request_id': self.consultation_request_id,
             'service_type': self.service_type,
             'appointment_date': self.appointment_date.isoformat(),
@@ -121,6 +154,11 @@ class Communication(db.Model):
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='sent')
     template_used = db.Column(db.String(100))
+    provider_message_id = db.Column(db.String(64), index=True)  # Twilio message SID, matched by delivery callbacks
+    
+    __table_args__ = (
+        db.Index('ix_communications_patient_sent', 'patient_id', 'sent_at'),
+    )
     
     def to_dict(self):
         return {
@@ -132,7 +170,8 @@ class Communication(db.Model):
             'message': self.message,
             'sent_at': self.sent_at.isoformat(),
             'status': self.status,
-            'template_used': self.template_used
+            'template_used': self.template_used,
+            'provider_message_id': self.provider_message_id
         }
 
 
@@ -0,0 +1,34 @@
+from functools import wraps
+from flask_sqlalchemy.session import Session
+
+# Bind key of the read-only engine (a SQLite read-only connection or a PostgreSQL replica)
+READ_REPLICA_BIND = 'read_replica'
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the read-only engine while a request is marked
+    read-only, and everything else (including any flush) to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only') and not self._flushing:
+            engines = self._db.engines
+            if READ_REPLICA_BIND in engines:
+                return engines[READ_REPLICA_BIND]
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_only(view):
+    """Route all queries made by this view to the read-only engine"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from src.models.user import db
+
+        session = db.session()
+        session.info['read_only'] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            session.info.pop('read_only', None)
+
+    return wrapper
@@ -1,13 +1,19 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, date, time
+import base64
+import json
 from src.models.user import db
-from src.models.patient import Patient, ConsultationRequest, Appointment, Communication
+from src.models.routing import read_only
+from src.models.patient import Patient, ConsultationRequest, Appointment, Communication, normalize_phone
 from src.services.email_service import EmailService
+from src.services.idempotency_service import idempotent
+from src.services.sms_status_buffer import sms_status_buffer
 
 patients_bp = Blueprint('patients', __name__)
 email_service = EmailService()
 
 @patients_bp.route('/patients', methods=['POST'])
+@idempotent()
 def create_patient():
     """Create a new patient or return existing patient"""
     try:
@@ -49,7 +55,40 @@ def create_patient():
             'error': str(e)
         }), 400
 
+@patients_bp.route('/patients/lookup', methods=['GET'])
+@read_only
+def lookup_patient_by_phone():
+    """Find the patient with a phone number (any format), e.g. for caller ID"""
+    try:
+        phone = normalize_phone(request.args.get('phone', ''))
+        if not phone:
+            return jsonify({
+                'success': False,
+                'error': 'A valid phone number is required'
+            }), 400
+        
+        # Most recently created patient if several share a number (e.g. family members)
+        patient = Patient.query.filter_by(phone_e164=phone).order_by(Patient.created_at.desc()).first()
+        if not patient:
+            return jsonify({
+                'success': False,
+                'phone': phone,
+                'error': 'Patient not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'patient': patient.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
 @patients_bp.route('/patients/<int:patient_id>', methods=['GET'])
+@read_only
 def get_patient(patient_id):
     """Get patient details with appointment history"""
     try:
@@ -78,7 +117,106 @@ def get_patient(patient_id):
             'error': str(e)
         }), 400
 
+@patients_bp.route('/patients/<int:patient_id>/timeline', methods=['GET'])
+@read_only
+def get_patient_timeline(patient_id):
+    """Get a patient's consultation requests, appointments and communications as one
+    chronological (newest first) feed, merged in SQL and paged with a cursor"""
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        cursor = request.args.get('cursor')
+        
+        patient = Patient.query.get_or_404(patient_id)
+        
+        # Lightweight event rows only - no email bodies or visit notes. Rows without a
+        # timestamp can't be placed in the feed or encoded in a cursor, so they are left out
+        consultation_events = db.select(
+            db.literal('consultation_request').label('event_type'),
+            ConsultationRequest.id.label('id'),
+            ConsultationRequest.created_at.label('ts'),
+            ConsultationRequest.service_type.label('title'),
+            ConsultationRequest.status.label('status'),
+            ConsultationRequest.priority.label('detail'),
+            ConsultationRequest.confirmed_date.label('scheduled_date')
+        ).where(ConsultationRequest.patient_id == patient_id, ConsultationRequest.created_at.isnot(None))
+        
+        appointment_events = db.select(
+            db.literal('appointment'),
+            Appointment.id,
+            Appointment.created_at,
+            Appointment.service_type,
+            Appointment.status,
+            Appointment.provider,
+            Appointment.appointment_date
+        ).where(Appointment.patient_id == patient_id, Appointment.created_at.isnot(None))
+        
+        communication_events = db.select(
+            db.literal('communication'),
+            Communication.id,
+            Communication.sent_at,
+            Communication.subject,
+            Communication.status,
+            Communication.communication_type,
+            db.cast(db.null(), db.Date)
+        ).where(Communication.patient_id == patient_id, Communication.sent_at.isnot(None))
+        
+        timeline = db.union_all(consultation_events, appointment_events, communication_events).subquery()
+        
+        query = db.select(timeline)
+        if cursor:
+            cursor_ts, cursor_type, cursor_id = _decode_timeline_cursor(cursor)
+            query = query.where(db.or_(
+                timeline.c.ts < cursor_ts,
+                db.and_(timeline.c.ts == cursor_ts, timeline.c.event_type < cursor_type),
+                db.and_(timeline.c.ts == cursor_ts, timeline.c.event_type == cursor_type, timeline.c.id < cursor_id)
+            ))
+        
+        query = query.order_by(
+            timeline.c.ts.desc(),
+            timeline.c.event_type.desc(),
+            timeline.c.id.desc()
+        ).limit(limit + 1)
+        
+        rows = db.session.execute(query).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        events = [{
+            'type': row.event_type,
+            'id': row.id,
+            'timestamp': row.ts.isoformat(),
+            'title': row.title,
+            'status': row.status,
+            'detail': row.detail,
+            'scheduled_date': row.scheduled_date.isoformat() if row.scheduled_date else None
+        } for row in rows]
+        
+        return jsonify({
+            'success': True,
+            'patient_id': patient.id,
+            'events': events,
+            'next_cursor': _encode_timeline_cursor(rows[-1]) if has_more else None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+def _encode_timeline_cursor(row):
+    payload = json.dumps([row.ts.isoformat(), row.event_type, row.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _decode_timeline_cursor(cursor):
+    try:
+        ts, event_type, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(ts), event_type, int(event_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid timeline cursor')
+
 @patients_bp.route('/patients', methods=['GET'])
+@read_only
 def list_patients():
     """List all patients with pagination and search"""
     try:
@@ -119,6 +257,7 @@ def list_patients():
         }), 400
 
 @patients_bp.route('/consultation-requests', methods=['POST'])
+@idempotent()
 def create_consultation_request():
     """Create a new consultation request"""
     try:
@@ -185,6 +324,7 @@ def create_consultation_request():
         }), 400
 
 @patients_bp.route('/consultation-requests', methods=['GET'])
+@read_only
 def list_consultation_requests():
     """List consultation requests with filtering"""
     try:
@@ -267,6 +407,7 @@ def confirm_consultation_request(request_id):
         }), 400
 
 @patients_bp.route('/appointments', methods=['GET'])
+@read_only
 def list_appointments():
     """List appointments with filtering"""
     try:
@@ -308,7 +449,23 @@ def list_appointments():
             'error': str(e)
         }), 400
 
+@patients_bp.route('/communications/sms-status', methods=['POST'])
+def sms_status_callback():
+    """Twilio message status callback; statuses are buffered and written in batches"""
+    try:
+        if sms_status_buffer.add(request.form.get('MessageSid'), request.form.get('MessageStatus')):
+            sms_status_buffer.flush()
+        
+        return jsonify({'success': True}), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
 @patients_bp.route('/dashboard/stats', methods=['GET'])
+@read_only
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
@@ -1,14 +1,43 @@
 from datetime import datetime, timedelta, date, time
 from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import or_
 from src.models.patient import Patient, Appointment, Communication
 from src.models.user import db
-from src.services.email_service import EmailService
+from src.services.email_service import EmailService, SERVICE_DISPLAY
+from src.services.email_dispatcher import EmailDispatcher
+from src.services.sms_service import SMSService
+from src.services.sms_dispatcher import SMSDispatcher
+from src.services.sms_status_buffer import sms_status_buffer
 import atexit
 
+# Logged statuses of messages that never went out
+UNSENT_STATUSES = ('failed', 'skipped')
+
+# Service-specific next steps
+POST_APPOINTMENT_NEXT_STEPS = {
+    'psychiatry': 'Continue with prescribed therapy sessions and medication as discussed. Monitor your mood and energy levels.',
+    'hormone': 'Follow the hormone optimization protocol as outlined. Schedule follow-up lab work in 6-8 weeks.',
+    'weight-loss': 'Begin your personalized nutrition plan and track your progress. Weigh yourself weekly at the same time.',
+    'peptide': 'Start your peptide therapy regimen as instructed. Monitor for any side effects and benefits.',
+    'wellness': 'Implement the wellness recommendations discussed. Focus on sleep, nutrition, and stress management.'
+}
+
+# Service-specific care instructions
+FOLLOWUP_CARE_INSTRUCTIONS = {
+    'psychiatry': 'Continue monitoring your mental health progress. Practice the coping strategies we discussed and maintain your medication schedule.',
+    'hormone': 'You should start noticing initial improvements in energy and mood. Continue with your hormone protocol and prepare for follow-up testing.',
+    'weight-loss': 'Focus on consistent meal timing and portion control. Track your food intake and celebrate small victories along the way.',
+    'peptide': 'Monitor your response to peptide therapy. Note any improvements in recovery, energy, or other targeted areas.',
+    'wellness': 'Implement the lifestyle changes gradually. Focus on one area at a time for sustainable results.'
+}
+
 class AutomationService:
     def __init__(self, app=None):
         self.scheduler = BackgroundScheduler()
         self.email_service = EmailService()
+        self.email_dispatcher = EmailDispatcher.from_env(self.email_service)
+        self.sms_service = SMSService()
+        self.sms_dispatcher = SMSDispatcher.from_env(self.sms_service)
         self.app = app
         
         if app:
@@ -35,6 +64,14 @@ class AutomationService:
             id='daily_followup_communications'
         )
         
+        # Apply buffered SMS delivery statuses that haven't filled a batch yet
+        self.scheduler.add_job(
+            func=self.flush_sms_statuses,
+            trigger="interval",
+            seconds=10,
+            id='sms_status_flush'
+        )
+        
         # Start the scheduler
         self.scheduler.start()
         
@@ -51,23 +88,25 @@ class AutomationService:
                     appointment_date=tomorrow,
                     status='scheduled'
                 ).all()
-                
-                for appointment in tomorrow_appointments:
-                    # Check if reminder already sent
-                    existing_reminder = Communication.query.filter_by(
-                        patient_id=appointment.patient_id,
-                        template_used='appointment_reminder_24h'
-                    ).filter(
-                        Communication.sent_at >= datetime.combine(date.today(), time.min)
-                    ).first()
-                    
-                    if not existing_reminder:
-                        success = self.email_service.send_appointment_reminder(
-                            appointment.patient, 
-                            appointment, 
-                            hours_before=24
-                        )
-                        print(f"24h reminder sent to {appointment.patient.email}: {'Success' if success else 'Failed'}")
+                email_appointments, sms_appointments = self._split_by_contact_method(tomorrow_appointments)
+                
+                messages = self._collect_messages(
+                    email_appointments,
+                    'appointment_reminder_24h',
+                    lambda appointment: self.email_service.build_appointment_reminder(
+                        appointment.patient, appointment, hours_before=24
+                    )
+                )
+                self._dispatch_messages(messages, '24h reminder')
+                
+                texts = self._collect_messages(
+                    sms_appointments,
+                    'appointment_reminder_24h',
+                    lambda appointment: self.sms_service.build_appointment_reminder(
+                        appointment.patient, appointment, hours_before=24
+                    )
+                )
+                self._dispatch_texts(texts, '24h reminder')
                 
                 # Get appointments for day after tomorrow (48-hour reminder)
                 day_after_tomorrow = date.today() + timedelta(days=2)
@@ -75,23 +114,25 @@ class AutomationService:
                     appointment_date=day_after_tomorrow,
                     status='scheduled'
                 ).all()
-                
-                for appointment in future_appointments:
-                    # Check if reminder already sent
-                    existing_reminder = Communication.query.filter_by(
-                        patient_id=appointment.patient_id,
-                        template_used='appointment_reminder_48h'
-                    ).filter(
-                        Communication.sent_at >= datetime.combine(date.today(), time.min)
-                    ).first()
-                    
-                    if not existing_reminder:
-                        success = self.email_service.send_appointment_reminder(
-                            appointment.patient, 
-                            appointment, 
-                            hours_before=48
-                        )
-                        print(f"48h reminder sent to {appointment.patient.email}: {'Success' if success else 'Failed'}")
+                email_appointments, sms_appointments = self._split_by_contact_method(future_appointments)
+                
+                messages = self._collect_messages(
+                    email_appointments,
+                    'appointment_reminder_48h',
+                    lambda appointment: self.email_service.build_appointment_reminder(
+                        appointment.patient, appointment, hours_before=48
+                    )
+                )
+                self._dispatch_messages(messages, '48h reminder')
+                
+                texts = self._collect_messages(
+                    sms_appointments,
+                    'appointment_reminder_48h',
+                    lambda appointment: self.sms_service.build_appointment_reminder(
+                        appointment.patient, appointment, hours_before=48
+                    )
+                )
+                self._dispatch_texts(texts, '48h reminder')
                         
             except Exception as e:
                 print(f"Error sending appointment reminders: {e}")
@@ -107,18 +148,12 @@ class AutomationService:
                     status='completed'
                 ).all()
                 
-                for appointment in completed_appointments:
-                    # Check if same-day follow-up already sent
-                    existing_followup = Communication.query.filter_by(
-                        patient_id=appointment.patient_id,
-                        template_used='post_appointment_followup'
-                    ).filter(
-                        Communication.sent_at >= datetime.combine(date.today(), time.min)
-                    ).first()
-                    
-                    if not existing_followup:
-                        success = self.send_post_appointment_followup(appointment.patient, appointment)
-                        print(f"Post-appointment follow-up sent to {appointment.patient.email}: {'Success' if success else 'Failed'}")
+                messages = self._collect_messages(
+                    completed_appointments,
+                    'post_appointment_followup',
+                    lambda appointment: self.build_post_appointment_followup(appointment.patient, appointment)
+                )
+                self._dispatch_messages(messages, 'Post-appointment follow-up')
                 
                 # Get completed appointments from 3 days ago for care instructions
                 three_days_ago = date.today() - timedelta(days=3)
@@ -127,18 +162,12 @@ class AutomationService:
                     status='completed'
                 ).all()
                 
-                for appointment in care_instruction_appointments:
-                    # Check if care instructions already sent
-                    existing_care = Communication.query.filter_by(
-                        patient_id=appointment.patient_id,
-                        template_used='followup_care_instructions'
-                    ).filter(
-                        Communication.sent_at >= datetime.combine(date.today(), time.min)
-                    ).first()
-                    
-                    if not existing_care:
-                        success = self.send_followup_care_instructions(appointment.patient, appointment)
-                        print(f"Follow-up care instructions sent to {appointment.patient.email}: {'Success' if success else 'Failed'}")
+                messages = self._collect_messages(
+                    care_instruction_appointments,
+                    'followup_care_instructions',
+                    lambda appointment: self.build_followup_care_instructions(appointment.patient, appointment)
+                )
+                self._dispatch_messages(messages, 'Follow-up care instructions')
                 
                 # Get completed appointments from 1 week ago for satisfaction survey
                 one_week_ago = date.today() - timedelta(days=7)
@@ -147,42 +176,105 @@ class AutomationService:
                     status='completed'
                 ).all()
                 
-                for appointment in survey_appointments:
-                    # Check if survey already sent
-                    existing_survey = Communication.query.filter_by(
-                        patient_id=appointment.patient_id,
-                        template_used='satisfaction_survey'
-                    ).filter(
-                        Communication.sent_at >= datetime.combine(date.today(), time.min)
-                    ).first()
-                    
-                    if not existing_survey:
-                        success = self.send_satisfaction_survey(appointment.patient, appointment)
-                        print(f"Satisfaction survey sent to {appointment.patient.email}: {'Success' if success else 'Failed'}")
+                messages = self._collect_messages(
+                    survey_appointments,
+                    'satisfaction_survey',
+                    lambda appointment: self.build_satisfaction_survey(appointment.patient, appointment)
+                )
+                self._dispatch_messages(messages, 'Satisfaction survey')
                         
             except Exception as e:
                 print(f"Error sending follow-up communications: {e}")
     
+    def flush_sms_statuses(self):
+        """Write buffered SMS delivery statuses to the database"""
+        with self.app.app_context():
+            sms_status_buffer.flush()
+    
+    def _split_by_contact_method(self, appointments):
+        """Split appointments into (email, sms) by the patient's preferred contact method"""
+        email_appointments, sms_appointments = [], []
+        
+        for appointment in appointments:
+            patient = appointment.patient
+            # Fall back to email when SMS isn't set up or the patient has no usable number
+            if patient.preferred_contact_method == 'sms' and patient.phone_e164 and self.sms_service.is_configured:
+                sms_appointments.append(appointment)
+            else:
+                email_appointments.append(appointment)
+        
+        return email_appointments, sms_appointments
+    
+    def _collect_messages(self, appointments, template_used, build_message):
+        """Build one message per patient that has not already received this template today"""
+        patient_ids = {appointment.patient_id for appointment in appointments}
+        if not patient_ids:
+            return []
+        
+        # Patients already sent this template today, in one query; failed or skipped messages are sent again
+        already_sent = {
+            patient_id for (patient_id,) in db.session.query(Communication.patient_id).filter(
+                Communication.patient_id.in_(patient_ids),
+                Communication.template_used == template_used,
+                Communication.sent_at >= datetime.combine(date.today(), time.min),
+                or_(Communication.status.is_(None), Communication.status.notin_(UNSENT_STATUSES))
+            ).distinct()
+        }
+        
+        messages = []
+        for appointment in appointments:
+            if appointment.patient_id in already_sent:
+                continue
+            already_sent.add(appointment.patient_id)
+            messages.append(build_message(appointment))
+        
+        return messages
+    
+    def _dispatch_messages(self, messages, description):
+        """Send prepared messages through the concurrent dispatcher and log the results"""
+        results = self.email_dispatcher.dispatch(messages)
+        
+        self.email_service.log_communications(
+            messages,
+            ['sent' if success else 'failed' for success in results]
+        )
+        
+        for message, success in zip(messages, results):
+            print(f"{description} sent to {message['to_email']}: {'Success' if success else 'Failed'}")
+    
+    def _dispatch_texts(self, texts, description):
+        """Send prepared text messages through the SMS dispatcher and log the results"""
+        texts = self.sms_service.merge_shared_numbers(texts)
+        results = self.sms_dispatcher.dispatch(texts)
+        
+        self.sms_service.log_communications(texts, results)
+        
+        for text, result in zip(texts, results):
+            print(f"{description} text to {text['to_phone']}: {result['status']}"
+                  + (f" ({result['error']})" if result['error'] else ''))
+    
     def send_post_appointment_followup(self, patient, appointment):
         """Send post-appointment follow-up email"""
-        subject = "Thank You for Visiting Lehigh Valley Wellness"
+        message = self.build_post_appointment_followup(patient, appointment)
         
-        service_display = {
-            'psychiatry': 'Psychiatry & Mental Health',
-            'hormone': 'Hormone Optimization Consultation',
-            'weight-loss': 'Medical Weight Loss Consultation',
-            'peptide': 'Peptide Therapy Consultation',
-            'wellness': 'Wellness Consultation'
-        }
+        # Send email
+        success = self.email_service.send_email(patient.email, message['subject'], message['html_content'])
         
-        # Service-specific next steps
-        next_steps = {
-            'psychiatry': 'Continue with prescribed therapy sessions and medication as discussed. Monitor your mood and energy levels.',
-            'hormone': 'Follow the hormone optimization protocol as outlined. Schedule follow-up lab work in 6-8 weeks.',
-            'weight-loss': 'Begin your personalized nutrition plan and track your progress. Weigh yourself weekly at the same time.',
-            'peptide': 'Start your peptide therapy regimen as instructed. Monitor for any side effects and benefits.',
-            'wellness': 'Implement the wellness recommendations discussed. Focus on sleep, nutrition, and stress management.'
-        }
+        # Log communication
+        self.email_service.log_communication(
+            patient.id,
+            'email',
+            message['subject'],
+            message['html_content'],
+            message['template_used'],
+            'sent' if success else 'failed'
+        )
+        
+        return success
+    
+    def build_post_appointment_followup(self, patient, appointment):
+        """Build post-appointment follow-up email without sending it"""
+        subject = "Thank You for Visiting Lehigh Valley Wellness"
         
         html_content = f"""
         <!DOCTYPE html>
@@ -206,11 +298,11 @@ class AutomationService:
             <div class="content">
                 <p>Dear {patient.first_name},</p>
                 
-                <p>Thank you for choosing Lehigh Valley Wellness for your {service_display.get(appointment.service_type, appointment.service_type)} consultation today. It was a pleasure meeting with you and discussing your health goals.</p>
+                <p>Thank you for choosing Lehigh Valley Wellness for your {SERVICE_DISPLAY.get(appointment.service_type, appointment.service_type)} consultation today. It was a pleasure meeting with you and discussing your health goals.</p>
                 
                 <div class="next-steps">
                     <h3>📋 Your Next Steps</h3>
-                    <p>{next_steps.get(appointment.service_type, 'Follow the personalized recommendations we discussed during your visit.')}</p>
+                    <p>{POST_APPOINTMENT_NEXT_STEPS.get(appointment.service_type, 'Follow the personalized recommendations we discussed during your visit.')}</p>
                 </div>
                 
                 <p><strong>Important Reminders:</strong></p>
@@ -237,42 +329,37 @@ class AutomationService:
         </html>
         """
         
+        return {
+            'patient_id': patient.id,
+            'to_email': patient.email,
+            'subject': subject,
+            'html_content': html_content,
+            'template_used': 'post_appointment_followup'
+        }
+    
+    def send_followup_care_instructions(self, patient, appointment):
+        """Send follow-up care instructions 3 days after appointment"""
+        message = self.build_followup_care_instructions(patient, appointment)
+        
         # Send email
-        success = self.email_service.send_email(patient.email, subject, html_content)
+        success = self.email_service.send_email(patient.email, message['subject'], message['html_content'])
         
         # Log communication
         self.email_service.log_communication(
             patient.id,
             'email',
-            subject,
-            html_content,
-            'post_appointment_followup',
+            message['subject'],
+            message['html_content'],
+            message['template_used'],
             'sent' if success else 'failed'
         )
         
         return success
     
-    def send_followup_care_instructions(self, patient, appointment):
-        """Send follow-up care instructions 3 days after appointment"""
+    def build_followup_care_instructions(self, patient, appointment):
+        """Build follow-up care instructions email without sending it"""
         subject = "Your Wellness Plan - Next Steps"
         
-        service_display = {
-            'psychiatry': 'Psychiatry & Mental Health',
-            'hormone': 'Hormone Optimization Consultation',
-            'weight-loss': 'Medical Weight Loss Consultation',
-            'peptide': 'Peptide Therapy Consultation',
-            'wellness': 'Wellness Consultation'
-        }
-        
-        # Service-specific care instructions
-        care_instructions = {
-            'psychiatry': 'Continue monitoring your mental health progress. Practice the coping strategies we discussed and maintain your medication schedule.',
-            'hormone': 'You should start noticing initial improvements in energy and mood. Continue with your hormone protocol and prepare for follow-up testing.',
-            'weight-loss': 'Focus on consistent meal timing and portion control. Track your food intake and celebrate small victories along the way.',
-            'peptide': 'Monitor your response to peptide therapy. Note any improvements in recovery, energy, or other targeted areas.',
-            'wellness': 'Implement the lifestyle changes gradually. Focus on one area at a time for sustainable results.'
-        }
-        
         html_content = f"""
         <!DOCTYPE html>
         <html>
@@ -295,11 +382,11 @@ class AutomationService:
             <div class="content">
                 <p>Dear {patient.first_name},</p>
                 
-                <p>It's been a few days since your {service_display.get(appointment.service_type, appointment.service_type)} appointment. We wanted to check in and provide some additional guidance for your wellness journey.</p>
+                <p>It's been a few days since your {SERVICE_DISPLAY.get(appointment.service_type, appointment.service_type)} appointment. We wanted to check in and provide some additional guidance for your wellness journey.</p>
                 
                 <div class="care-box">
                     <h3>🎯 Focus This Week</h3>
-                    <p>{care_instructions.get(appointment.service_type, 'Continue following your personalized wellness plan as discussed.')}</p>
+                    <p>{FOLLOWUP_CARE_INSTRUCTIONS.get(appointment.service_type, 'Continue following your personalized wellness plan as discussed.')}</p>
                 </div>
                 
                 <p><strong>This Week's Goals:</strong></p>
@@ -327,23 +414,35 @@ class AutomationService:
         </html>
         """
         
+        return {
+            'patient_id': patient.id,
+            'to_email': patient.email,
+            'subject': subject,
+            'html_content': html_content,
+            'template_used': 'followup_care_instructions'
+        }
+    
+    def send_satisfaction_survey(self, patient, appointment):
+        """Send satisfaction survey 1 week after appointment"""
+        message = self.build_satisfaction_survey(patient, appointment)
+        
         # Send email
-        success = self.email_service.send_email(patient.email, subject, html_content)
+        success = self.email_service.send_email(patient.email, message['subject'], message['html_content'])
         
         # Log communication
         self.email_service.log_communication(
             patient.id,
             'email',
-            subject,
-            html_content,
-            'followup_care_instructions',
+            message['subject'],
+            message['html_content'],
+            message['template_used'],
             'sent' if success else 'failed'
         )
         
         return success
     
-    def send_satisfaction_survey(self, patient, appointment):
-        """Send satisfaction survey 1 week after appointment"""
+    def build_satisfaction_survey(self, patient, appointment):
+        """Build satisfaction survey email without sending it"""
         subject = "How Was Your Experience? - Lehigh Valley Wellness"
         
         html_content = f"""
@@ -402,23 +501,35 @@ class AutomationService:
         </html>
         """
         
+        return {
+            'patient_id': patient.id,
+            'to_email': patient.email,
+            'subject': subject,
+            'html_content': html_content,
+            'template_used': 'satisfaction_survey'
+        }
+    
+    def send_wellness_checkin(self, patient, appointment):
+        """Send wellness check-in 1 month after appointment"""
+        message = self.build_wellness_checkin(patient, appointment)
+        
         # Send email
-        success = self.email_service.send_email(patient.email, subject, html_content)
+        success = self.email_service.send_email(patient.email, message['subject'], message['html_content'])
         
         # Log communication
         self.email_service.log_communication(
             patient.id,
             'email',
-            subject,
-            html_content,
-            'satisfaction_survey',
+            message['subject'],
+            message['html_content'],
+            message['template_used'],
             'sent' if success else 'failed'
         )
         
         return success
     
-    def send_wellness_checkin(self, patient, appointment):
-        """Send wellness check-in 1 month after appointment"""
+    def build_wellness_checkin(self, patient, appointment):
+        """Build wellness check-in email without sending it"""
         subject = "Your Wellness Journey - Monthly Check-In"
         
         html_content = f"""
@@ -480,18 +591,11 @@ class AutomationService:
         </html>
         """
         
-        # Send email
-        success = self.email_service.send_email(patient.email, subject, html_content)
-        
-        # Log communication
-        self.email_service.log_communication(
-            patient.id,
-            'email',
-            subject,
-            html_content,
-            'wellness_checkin',
-            'sent' if success else 'failed'
-        )
-        
-        return success
+        return {
+            'patient_id': patient.id,
+            'to_email': patient.email,
+            'subject': subject,
+            'html_content': html_content,
+            'template_used': 'wellness_checkin'
+        }
 
@@ -0,0 +1,147 @@
+import os
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to stay under provider sending caps"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class EmailDispatcher:
+    """
+    Sends batches of prepared emails over a bounded pool of SMTP connections.
+
+    Each worker thread keeps its own authenticated SMTP connection for the whole
+    batch, all workers share one token bucket so the combined send rate stays
+    under the provider cap, and transient failures are retried with jittered
+    exponential backoff. Workers never touch the database; callers log results
+    afterwards from the thread that owns the session.
+    """
+
+    def __init__(self, email_service, max_workers=5, rate_per_second=10, burst=None,
+                 max_retries=3, retry_base_delay=1.0, retry_max_delay=30.0):
+        # Defaults stay under the Amazon SES sandbox-exit limit (14/s) and Gmail's
+        # concurrent connection limit; from_env() reads the provider's actual limits
+        self.email_service = email_service
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+    @classmethod
+    def from_env(cls, email_service):
+        burst = os.getenv('EMAIL_BURST')
+        return cls(
+            email_service,
+            max_workers=int(os.getenv('EMAIL_DISPATCH_WORKERS', '5')),
+            rate_per_second=float(os.getenv('EMAIL_RATE_PER_SECOND', '10')),
+            burst=float(burst) if burst else None,
+            max_retries=int(os.getenv('EMAIL_MAX_RETRIES', '3'))
+        )
+
+    def dispatch(self, messages):
+        """
+        Send prepared messages concurrently.
+
+        Each message is a dict with 'to_email', 'subject', 'html_content' and
+        optionally 'text_content'. Returns a list of booleans in input order.
+        """
+        if not messages:
+            return []
+
+        local = threading.local()
+        connections = []
+        connections_lock = threading.Lock()
+
+        def get_connection():
+            server = getattr(local, 'server', None)
+            if server is None:
+                server = self.email_service.create_smtp_connection()
+                local.server = server
+                with connections_lock:
+                    connections.append(server)
+            return server
+
+        def drop_connection():
+            server = getattr(local, 'server', None)
+            local.server = None
+            if server is not None:
+                try:
+                    server.close()
+                except Exception:
+                    pass
+
+        def send(message):
+            msg = self.email_service.build_message(
+                message['to_email'],
+                message['subject'],
+                message['html_content'],
+                message.get('text_content')
+            )
+
+            for attempt in range(self.max_retries + 1):
+                self.rate_limiter.acquire()
+                try:
+                    get_connection().send_message(msg)
+                    return True
+                except Exception as e:
+                    drop_connection()
+                    if attempt == self.max_retries or not self._is_transient(e):
+                        print(f"Email sending failed for {message['to_email']}: {e}")
+                        return False
+                    time.sleep(self._backoff_delay(attempt))
+
+            return False
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(messages))) as executor:
+                return list(executor.map(send, messages))
+        finally:
+            for server in connections:
+                try:
+                    server.quit()
+                except Exception:
+                    pass
+
+    def _is_transient(self, error):
+        """Whether a send failure is worth retrying (throttling, dropped connection, 4xx)"""
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return all(400 <= code < 500 for code, _ in error.recipients.values())
+        if isinstance(error, smtplib.SMTPException):
+            return False
+        return isinstance(error, OSError)
+
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
@@ -5,6 +5,39 @@ from datetime import datetime, timedelta
 from src.models.patient import Communication, EmailTemplate
 from src.models.user import db
 
+# Service metadata shared by all emails; built once per process instead of per message
+SERVICE_DISPLAY = {
+    'psychiatry': 'Psychiatry & Mental Health',
+    'hormone': 'Hormone Optimization Consultation',
+    'weight-loss': 'Medical Weight Loss Consultation',
+    'peptide': 'Peptide Therapy Consultation',
+    'wellness': 'Wellness Consultation'
+}
+
+SERVICE_PRICING = {
+    'psychiatry': '$250',
+    'hormone': '$200',
+    'weight-loss': '$175',
+    'peptide': '$150',
+    'wellness': '$200'
+}
+
+SERVICE_DURATION = {
+    'psychiatry': '60 minutes',
+    'hormone': '45 minutes',
+    'weight-loss': '45 minutes',
+    'peptide': '30 minutes',
+    'wellness': '60 minutes'
+}
+
+SERVICE_PREPARATION = {
+    'psychiatry': 'Please complete intake forms 24 hours before your appointment',
+    'hormone': 'Fasting lab work may be required before your visit',
+    'weight-loss': 'Please bring current medications and recent lab results',
+    'peptide': 'Health history review and goal assessment',
+    'wellness': 'Complete health questionnaire and bring recent lab work'
+}
+
 class EmailService:
     def __init__(self):
         # Email configuration - in production, these should be environment variables
@@ -13,28 +46,40 @@ class EmailService:
         self.email_address = "info@lehighvalleywellness.org"
         self.email_password = "your_app_password"  # Use app password for Gmail
         self.from_name = "Lehigh Valley Wellness"
+        self.smtp_timeout = 30
+        
+    def create_smtp_connection(self):
+        """Open an authenticated SMTP connection"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        server.starttls()
+        server.login(self.email_address, self.email_password)
+        return server
+    
+    def build_message(self, to_email, subject, html_content, text_content=None):
+        """Build a MIME message with optional plain-text alternative"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = f"{self.from_name} <{self.email_address}>"
+        msg['To'] = to_email
+        
+        # Add text and HTML parts
+        if text_content:
+            text_part = MIMEText(text_content, 'plain')
+            msg.attach(text_part)
         
+        html_part = MIMEText(html_content, 'html')
+        msg.attach(html_part)
+        
+        return msg
+    
     def send_email(self, to_email, subject, html_content, text_content=None):
         """Send an email using SMTP"""
         try:
             # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.email_address}>"
-            msg['To'] = to_email
-            
-            # Add text and HTML parts
-            if text_content:
-                text_part = MIMEText(text_content, 'plain')
-                msg.attach(text_part)
-            
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
+            msg = self.build_message(to_email, subject, html_content, text_content)
             
             # Send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_address, self.email_password)
+            server = self.create_smtp_connection()
             server.send_message(msg)
             server.quit()
             
@@ -62,6 +107,25 @@ class EmailService:
             print(f"Failed to log communication: {e}")
             return False
     
+    def log_communications(self, messages, statuses):
+        """Log a batch of prepared email messages in a single transaction"""
+        try:
+            for message, status in zip(messages, statuses):
+                db.session.add(Communication(
+                    patient_id=message['patient_id'],
+                    communication_type='email',
+                    subject=message['subject'],
+                    message=message['html_content'],
+                    template_used=message['template_used'],
+                    status=status
+                ))
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to log communications: {e}")
+            return False
+    
     def render_template(self, template_content, variables):
         """Simple template rendering with variable substitution"""
         content = template_content
@@ -74,18 +138,9 @@ class EmailService:
         """Send confirmation email for consultation request"""
         subject = "Consultation Request Received - Lehigh Valley Wellness"
         
-        # Service type mapping for display
-        service_display = {
-            'psychiatry': 'Psychiatry & Mental Health',
-            'hormone': 'Hormone Optimization Consultation',
-            'weight-loss': 'Medical Weight Loss Consultation',
-            'peptide': 'Peptide Therapy Consultation',
-            'wellness': 'Wellness Consultation'
-        }
-        
         variables = {
             'patient_first_name': patient.first_name,
-            'service_type': service_display.get(consultation_request.service_type, consultation_request.service_type),
+            'service_type': SERVICE_DISPLAY.get(consultation_request.service_type, consultation_request.service_type),
             'preferred_date': consultation_request.preferred_date.strftime('%B %d, %Y') if consultation_request.preferred_date else 'Not specified',
             'preferred_time': consultation_request.preferred_time.strftime('%I:%M %p') if consultation_request.preferred_time else 'Not specified',
             'practice_phone': '(484) 357-1916'
@@ -166,49 +221,14 @@ class EmailService:
         """Send appointment confirmation email"""
         subject = f"Appointment Confirmed - {appointment.appointment_date.strftime('%B %d')} at {appointment.appointment_time.strftime('%I:%M %p')}"
         
-        # Service pricing mapping
-        service_pricing = {
-            'psychiatry': '$250',
-            'hormone': '$200',
-            'weight-loss': '$175',
-            'peptide': '$150',
-            'wellness': '$200'
-        }
-
-        # Service duration mapping
-        service_duration = {
-            'psychiatry': '60 minutes',
-            'hormone': '45 minutes',
-            'weight-loss': '45 minutes',
-            'peptide': '30 minutes',
-            'wellness': '60 minutes'
-        }
-
-        # Service preparation instructions
-        service_prep = {
-            'psychiatry': 'Please complete intake forms 24 hours before your appointment',
-            'hormone': 'Fasting lab work may be required before your visit',
-            'weight-loss': 'Please bring current medications and recent lab results',
-            'peptide': 'Health history review and goal assessment',
-            'wellness': 'Complete health questionnaire and bring recent lab work'
-        }
-
-        service_display = {
-            'psychiatry': 'Psychiatry & Mental Health',
-            'hormone': 'Hormone Optimization Consultation',
-            'weight-loss': 'Medical Weight Loss Consultation',
-            'peptide': 'Peptide Therapy Consultation',
-            'wellness': 'Wellness Consultation'
-        }
-        
         variables = {
             'patient_first_name': patient.first_name,
             'appointment_date': appointment.appointment_date.strftime('%A, %B %d, %Y'),
             'appointment_time': appointment.appointment_time.strftime('%I:%M %p'),
-            'service_type': service_display.get(appointment.service_type, appointment.service_type),
-            'duration': service_duration.get(appointment.service_type, f'{appointment.duration_minutes} minutes'),
-            'service_price': service_pricing.get(appointment.service_type, 'Please call for pricing'),
-            'preparation_instructions': service_prep.get(appointment.service_type, 'No special preparation required'),
+            'service_type': SERVICE_DISPLAY.get(appointment.service_type, appointment.service_type),
+            'duration': SERVICE_DURATION.get(appointment.service_type, f'{appointment.duration_minutes} minutes'),
+            'service_price': SERVICE_PRICING.get(appointment.service_type, 'Please call for pricing'),
+            'preparation_instructions': SERVICE_PREPARATION.get(appointment.service_type, 'No special preparation required'),
             'practice_phone': '(484) 357-1916',
             'practice_address': '6081 Hamilton Blvd Suite 600, Allentown, PA 18106'
         }
@@ -292,24 +312,35 @@ class EmailService:
     
     def send_appointment_reminder(self, patient, appointment, hours_before=24):
         """Send appointment reminder email"""
+        message = self.build_appointment_reminder(patient, appointment, hours_before)
+        
+        # Send email
+        success = self.send_email(message['to_email'], message['subject'], message['html_content'])
+        
+        # Log communication
+        self.log_communication(
+            patient.id,
+            'email',
+            message['subject'],
+            message['html_content'],
+            message['template_used'],
+            'sent' if success else 'failed'
+        )
+        
+        return success
+    
+    def build_appointment_reminder(self, patient, appointment, hours_before=24):
+        """Build appointment reminder email without sending it"""
         subject = f"Appointment Reminder - Tomorrow at {appointment.appointment_time.strftime('%I:%M %p')}"
         
         if hours_before == 48:
             subject = f"Appointment Reminder - {appointment.appointment_date.strftime('%A')} at {appointment.appointment_time.strftime('%I:%M %p')}"
         
-        service_display = {
-            'psychiatry': 'Psychiatry & Mental Health',
-            'hormone': 'Hormone Optimization Consultation',
-            'weight-loss': 'Medical Weight Loss Consultation',
-            'peptide': 'Peptide Therapy Consultation',
-            'wellness': 'Wellness Consultation'
-        }
-        
         variables = {
             'patient_first_name': patient.first_name,
             'appointment_date': appointment.appointment_date.strftime('%A, %B %d, %Y'),
             'appointment_time': appointment.appointment_time.strftime('%I:%M %p'),
-            'service_type': service_display.get(appointment.service_type, appointment.service_type),
+            'service_type': SERVICE_DISPLAY.get(appointment.service_type, appointment.service_type),
             'practice_phone': '(484) 357-1916'
         }
         
@@ -372,18 +403,11 @@ class EmailService:
         </html>
         """
         
-        # Send email
-        success = self.send_email(patient.email, subject, html_content)
-        
-        # Log communication
-        self.log_communication(
-            patient.id,
-            'email',
-            subject,
-            html_content,
-            f'appointment_reminder_{hours_before}h',
-            'sent' if success else 'failed'
-        )
-        
-        return success
+        return {
+            'patient_id': patient.id,
+            'to_email': patient.email,
+            'subject': subject,
+            'html_content': html_content,
+            'template_used': f'appointment_reminder_{hours_before}h'
+        }
 
@@ -0,0 +1,129 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+DEFAULT_TTL = timedelta(hours=24)
+# In-progress claims older than this are treated as abandoned (e.g. worker crashed)
+IN_PROGRESS_TIMEOUT = timedelta(minutes=5)
+
+def idempotent(ttl=DEFAULT_TTL):
+    """
+    Make a POST endpoint safe to retry with an Idempotency-Key header.
+
+    The first request with a given key claims it, runs the view and stores the
+    response. Replays of the same key and body within the TTL return the stored
+    response without running the view again (no duplicate inserts or emails).
+    Requests without the header behave exactly as before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+
+            if len(key) > 255:
+                return jsonify({
+                    'success': False,
+                    'error': f'{IDEMPOTENCY_HEADER} must be at most 255 characters'
+                }), 400
+
+            endpoint = request.endpoint
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+            record = _claim_key(key, endpoint, request_hash, ttl)
+
+            if record is not None:
+                if record.request_hash != request_hash:
+                    return jsonify({
+                        'success': False,
+                        'error': f'{IDEMPOTENCY_HEADER} was already used with a different request body'
+                    }), 422
+
+                if record.status != 'completed':
+                    return jsonify({
+                        'success': False,
+                        'error': 'A request with this idempotency key is still being processed'
+                    }), 409
+
+                replay = Response(
+                    record.response_body,
+                    status=record.response_status,
+                    mimetype=record.response_mimetype
+                )
+                replay.headers['Idempotent-Replayed'] = 'true'
+                return replay
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                _release_key(key, endpoint)
+                raise
+
+            if 200 <= response.status_code < 300:
+                _store_response(key, endpoint, response)
+            else:
+                # Failed requests don't consume the key so the client can retry
+                _release_key(key, endpoint)
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+def _claim_key(key, endpoint, request_hash, ttl):
+    """Insert an in-progress record; return the existing record if the key is taken"""
+    now = datetime.utcnow()
+
+    existing = IdempotencyKey.query.filter_by(key=key, endpoint=endpoint).first()
+    if existing and (
+        existing.expires_at <= now
+        or (existing.status != 'completed' and existing.created_at <= now - IN_PROGRESS_TIMEOUT)
+    ):
+        db.session.delete(existing)
+        db.session.commit()
+        existing = None
+
+    if existing:
+        return existing
+
+    try:
+        db.session.add(IdempotencyKey(
+            key=key,
+            endpoint=endpoint,
+            request_hash=request_hash,
+            status='in_progress',
+            expires_at=now + ttl
+        ))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        # A concurrent request claimed the key first
+        db.session.rollback()
+        return IdempotencyKey.query.filter_by(key=key, endpoint=endpoint).first()
+
+def _store_response(key, endpoint, response):
+    try:
+        record = IdempotencyKey.query.filter_by(key=key, endpoint=endpoint).first()
+        if record:
+            record.status = 'completed'
+            record.response_status = response.status_code
+            record.response_body = response.get_data(as_text=True)
+            record.response_mimetype = response.mimetype
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to store idempotent response: {e}")
+
+def _release_key(key, endpoint):
+    try:
+        IdempotencyKey.query.filter_by(key=key, endpoint=endpoint, status='in_progress').delete()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to release idempotency key: {e}")
@@ -0,0 +1,139 @@
+import http.client
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.models.patient import normalize_phone
+from src.services.email_dispatcher import TokenBucket
+from src.services.sms_service import SMSSendError
+
+
+class SMSDispatcher:
+    """
+    Sends batches of prepared text messages over a bounded pool of workers.
+
+    Messages are deduplicated by normalized phone number first, so a number is
+    texted at most once per batch; callers merge messages for patients who
+    share a number (SMSService.merge_shared_numbers) before dispatching. Each worker keeps its own keep-alive connection to the
+    Twilio API, all workers share one token bucket so the combined rate stays
+    under the sender's messages-per-second limit, and throttling or network
+    failures are retried with jittered exponential backoff. Workers never touch
+    the database; callers log results afterwards.
+    """
+
+    def __init__(self, sms_service, max_workers=4, rate_per_second=1, burst=None,
+                 max_retries=3, retry_base_delay=1.0, retry_max_delay=30.0):
+        # A single long code is limited to about 1 message per second; toll-free
+        # numbers and messaging services allow more
+        self.sms_service = sms_service
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+    @classmethod
+    def from_env(cls, sms_service):
+        burst = os.getenv('SMS_BURST')
+        return cls(
+            sms_service,
+            max_workers=int(os.getenv('SMS_DISPATCH_WORKERS', '4')),
+            rate_per_second=float(os.getenv('SMS_RATE_PER_SECOND', '1')),
+            burst=float(burst) if burst else None,
+            max_retries=int(os.getenv('SMS_MAX_RETRIES', '3'))
+        )
+
+    def dispatch(self, messages):
+        """
+        Send prepared messages concurrently.
+
+        Each message is a dict with 'to_phone' and 'body'. Returns one result
+        dict per message, in input order, with 'success', 'status' (the Twilio
+        message status, 'failed', or 'skipped' for a duplicate or unusable
+        number), 'message_sid' and 'error'.
+        """
+        if not messages:
+            return []
+
+        results = [None] * len(messages)
+        pending = []
+        seen_numbers = set()
+
+        for index, message in enumerate(messages):
+            to_number = normalize_phone(message.get('to_phone'))
+            if not to_number:
+                results[index] = self._result('skipped', error='No valid phone number')
+            elif to_number in seen_numbers:
+                results[index] = self._result('skipped', error=f'Duplicate of another message to {to_number}')
+            else:
+                seen_numbers.add(to_number)
+                pending.append((index, to_number, message))
+
+        if not pending:
+            return results
+
+        local = threading.local()
+        connections = []
+        connections_lock = threading.Lock()
+
+        def get_connection():
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = self.sms_service.create_connection()
+                local.connection = connection
+                with connections_lock:
+                    connections.append(connection)
+            return connection
+
+        def drop_connection():
+            connection = getattr(local, 'connection', None)
+            local.connection = None
+            if connection is not None:
+                connection.close()
+
+        def send(item):
+            index, to_number, message = item
+
+            for attempt in range(self.max_retries + 1):
+                self.rate_limiter.acquire()
+                try:
+                    created = self.sms_service.send_sms(get_connection(), to_number, message['body'])
+                    results[index] = self._result(created.get('status') or 'queued', message_sid=created.get('sid'))
+                    return
+                except Exception as e:
+                    if not isinstance(e, SMSSendError):
+                        drop_connection()
+                    if attempt == self.max_retries or not self._is_transient(e):
+                        print(f"SMS sending failed for {to_number}: {e}")
+                        results[index] = self._result('failed', error=str(e))
+                        return
+                    time.sleep(self._backoff_delay(attempt))
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+                list(executor.map(send, pending))
+        finally:
+            for connection in connections:
+                connection.close()
+
+        return results
+
+    def _result(self, status, message_sid=None, error=None):
+        return {
+            'success': status not in ('failed', 'skipped'),
+            'status': status,
+            'message_sid': message_sid,
+            'error': error
+        }
+
+    def _is_transient(self, error):
+        """Whether a send failure is worth retrying (throttling, 5xx, dropped connection)"""
+        if isinstance(error, SMSSendError):
+            return error.http_status == 429 or (error.http_status or 0) >= 500
+        # Not timeouts: Twilio may have created the message and a retry would text the patient twice
+        return isinstance(error, (ConnectionError, http.client.HTTPException))
+
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
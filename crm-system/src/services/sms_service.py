@@ -0,0 +1,160 @@
+import base64
+import http.client
+import json
+import os
+from urllib.parse import urlencode, urlsplit
+from src.models.patient import Communication, normalize_phone
+from src.models.user import db
+from src.services.email_service import SERVICE_DISPLAY
+
+class SMSSendError(Exception):
+    """A Twilio Messages API request that did not create a message"""
+
+    def __init__(self, message, http_status=None, twilio_code=None):
+        super().__init__(message)
+        self.http_status = http_status
+        self.twilio_code = twilio_code
+
+
+class SMSService:
+    """
+    Sends text messages through the Twilio Messages REST API.
+
+    Talks to the API over plain HTTP connections so the CRM does not need the
+    Twilio SDK, and so a dispatcher worker can keep one connection open for a
+    whole batch.
+    """
+
+    def __init__(self):
+        self.account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+        self.auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+        self.from_number = os.getenv('TWILIO_PHONE_NUMBER')
+        self.messaging_service_sid = os.getenv('TWILIO_MESSAGING_SERVICE_SID')
+        # Public URL of /api/communications/sms-status; without it no delivery updates arrive
+        self.status_callback_url = os.getenv('SMS_STATUS_CALLBACK_URL')
+        self.api_base_url = os.getenv('TWILIO_API_BASE_URL', 'https://api.twilio.com')
+        self.request_timeout = 15
+
+    @property
+    def is_configured(self):
+        return bool(self.account_sid and self.auth_token and (self.from_number or self.messaging_service_sid))
+
+    def create_connection(self):
+        """Open a keep-alive connection to the Twilio API"""
+        url = urlsplit(self.api_base_url)
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(url.netloc, timeout=self.request_timeout)
+
+    def send_sms(self, connection, to_number, body):
+        """
+        Create one message over an open connection.
+
+        Returns the Twilio message resource as a dict; raises SMSSendError when
+        Twilio rejects the request and OSError/HTTPException on network errors.
+        """
+        form = {'To': to_number, 'Body': body}
+        if self.messaging_service_sid:
+            form['MessagingServiceSid'] = self.messaging_service_sid
+        else:
+            form['From'] = self.from_number
+        if self.status_callback_url:
+            form['StatusCallback'] = self.status_callback_url
+
+        credentials = base64.b64encode(f'{self.account_sid}:{self.auth_token}'.encode()).decode()
+        path = f"{urlsplit(self.api_base_url).path.rstrip('/')}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+        connection.request('POST', path, body=urlencode(form), headers={
+            'Authorization': f'Basic {credentials}',
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json'
+        })
+        response = connection.getresponse()
+        data = response.read()
+
+        try:
+            payload = json.loads(data) if data else {}
+        except ValueError:
+            payload = {}
+
+        if response.status >= 400:
+            raise SMSSendError(
+                payload.get('message') or f'Twilio returned HTTP {response.status}',
+                http_status=response.status,
+                twilio_code=payload.get('code')
+            )
+        return payload
+
+    def log_communications(self, messages, results):
+        """
+        Log a batch of SMS messages and their send results in a single
+        transaction, one row per patient a message was for.
+        """
+        try:
+            for message, result in zip(messages, results):
+                for patient_id in message.get('patient_ids') or [message['patient_id']]:
+                    db.session.add(Communication(
+                        patient_id=patient_id,
+                        communication_type='sms',
+                        subject=message.get('subject'),
+                        message=message['body'],
+                        template_used=message['template_used'],
+                        status=result['status'],
+                        provider_message_id=result.get('message_sid')
+                    ))
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to log SMS communications: {e}")
+            return False
+
+    def build_appointment_reminder(self, patient, appointment, hours_before=24):
+        """Build an appointment reminder text message without sending it"""
+        time_reference = "tomorrow" if hours_before == 24 else appointment.appointment_date.strftime('%A')
+        service = SERVICE_DISPLAY.get(appointment.service_type, appointment.service_type)
+
+        body = (
+            f"Hi {patient.first_name}, this is Lehigh Valley Wellness reminding you of your {service} "
+            f"appointment {time_reference}, {appointment.appointment_date.strftime('%B %d')} at "
+            f"{appointment.appointment_time.strftime('%I:%M %p')}. Please arrive 10 minutes early. "
+            f"To reschedule call (484) 357-1916."
+        )
+
+        return {
+            'patient_id': patient.id,
+            'to_phone': patient.phone_e164,
+            'subject': f'Appointment reminder ({hours_before}h)',
+            'body': body,
+            'template_used': f'appointment_reminder_{hours_before}h',
+            'day': f"{time_reference}, {appointment.appointment_date.strftime('%B %d')}",
+            'appointment_line': (
+                f"{patient.first_name} - {service} at {appointment.appointment_time.strftime('%I:%M %p')}"
+            )
+        }
+
+    def merge_shared_numbers(self, texts):
+        """
+        Combine reminders for patients who share a phone number (family
+        members) into one text that lists each appointment, so nobody's
+        reminder is dropped as a duplicate. The combined message carries
+        every patient's id in 'patient_ids'.
+        """
+        by_number = {}
+        for text in texts:
+            by_number.setdefault(normalize_phone(text['to_phone']) or text['to_phone'], []).append(text)
+
+        merged = []
+        for group in by_number.values():
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            lines = '; '.join(text['appointment_line'] for text in group)
+            merged.append({
+                **group[0],
+                'patient_ids': [text['patient_id'] for text in group],
+                'body': (
+                    f"Hi, this is Lehigh Valley Wellness reminding you of appointments "
+                    f"{group[0]['day']}: {lines}. Please arrive 10 minutes early. "
+                    f"To reschedule call (484) 357-1916."
+                )
+            })
+        return merged
@@ -0,0 +1,113 @@
+import threading
+import time
+from sqlalchemy import update
+from src.models.patient import Communication
+from src.models.user import db
+
+# Later statuses never move a message back to an earlier one; callbacks can arrive out of order
+SMS_STATUS_RANK = {
+    'accepted': 0, 'scheduled': 0, 'queued': 1, 'sending': 2, 'sent': 3,
+    'delivered': 4, 'undelivered': 4, 'failed': 4, 'canceled': 4, 'read': 5
+}
+
+
+class SMSStatusBuffer:
+    """
+    Collects Twilio message status callbacks and applies them to Communication
+    rows in batches.
+
+    A bulk send produces several callbacks per message (queued, sent,
+    delivered) within seconds. The callback endpoint only records the newest
+    status per message SID in memory; flush() then loads the affected rows in
+    one query and updates them in one executemany, once the buffer reaches
+    flush_size or on the scheduler's interval. Anything still buffered when the
+    process stops is lost, which only leaves a row at an earlier status.
+
+    Callbacks can arrive before their Communication row exists: a reminder
+    batch is only recorded once the dispatcher has sent all of it, which at
+    the default rate takes minutes. Statuses with no matching row are kept
+    for later flushes until unmatched_ttl seconds after their first callback.
+    """
+
+    def __init__(self, flush_size=200, unmatched_ttl=1800):
+        self.flush_size = flush_size
+        self.unmatched_ttl = unmatched_ttl
+        self._pending = {}
+        # message SID -> (status, monotonic time of first callback) for SIDs with no row yet
+        self._unmatched = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, message_sid, status):
+        """Record a status callback; returns True once enough are buffered to flush"""
+        if not message_sid or status not in SMS_STATUS_RANK:
+            return False
+        with self._lock:
+            current = self._pending.get(message_sid)
+            if current is None or SMS_STATUS_RANK[status] >= SMS_STATUS_RANK[current]:
+                self._pending[message_sid] = status
+            return len(self._pending) >= self.flush_size
+
+    def flush(self):
+        """Write buffered statuses to the database; needs an app context. Returns rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                unmatched, self._unmatched = self._unmatched, {}
+            if not pending and not unmatched:
+                return 0
+
+            now = time.monotonic()
+            first_seen = {message_sid: seen for message_sid, (_, seen) in unmatched.items()}
+            for message_sid, (status, _) in unmatched.items():
+                current = pending.get(message_sid)
+                if current is None or SMS_STATUS_RANK[status] > SMS_STATUS_RANK[current]:
+                    pending[message_sid] = status
+
+            started = time.perf_counter()
+            try:
+                rows = db.session.query(Communication.id, Communication.status, Communication.provider_message_id).filter(
+                    Communication.provider_message_id.in_(list(pending))
+                ).all()
+                changes = [
+                    {'id': row.id, 'status': pending[row.provider_message_id]}
+                    for row in rows
+                    if SMS_STATUS_RANK[pending[row.provider_message_id]] > SMS_STATUS_RANK.get(row.status, -1)
+                ]
+                if changes:
+                    db.session.execute(update(Communication), changes)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                # Put the statuses back unless newer ones arrived in the meantime
+                with self._lock:
+                    for message_sid, status in pending.items():
+                        current = self._pending.get(message_sid)
+                        if current is None or SMS_STATUS_RANK[status] > SMS_STATUS_RANK[current]:
+                            self._pending[message_sid] = status
+                    for message_sid, seen in first_seen.items():
+                        if message_sid in self._pending:
+                            self._unmatched[message_sid] = (self._pending.pop(message_sid), seen)
+                print(f"Failed to apply SMS status updates: {e}")
+                return 0
+
+            # Keep statuses whose row hasn't been recorded yet for the next flush
+            matched = {row.provider_message_id for row in rows}
+            expired = 0
+            with self._lock:
+                for message_sid, status in pending.items():
+                    if message_sid in matched:
+                        continue
+                    seen = first_seen.get(message_sid, now)
+                    if now - seen > self.unmatched_ttl:
+                        expired += 1
+                        continue
+                    self._unmatched[message_sid] = (status, seen)
+
+            print(f"Applied {len(changes)} SMS status updates from {len(pending)} callbacks "
+                  f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+                  f" ({len(pending) - len(matched) - expired} awaiting their message row, {expired} expired)")
+            return len(changes)
+
+
+sms_status_buffer = SMSStatusBuffer()
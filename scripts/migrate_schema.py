@@ -0,0 +1,100 @@
+"""
+Bring an existing database up to date with the models of one of the apps.
+
+db.create_all() at app startup only creates missing tables. Run this once
+after deploying a release that adds columns to existing tables, before
+starting the servers, instead of letting every worker alter the schema on
+import. It adds missing columns (with their defaults and NOT NULL), creates
+missing indexes and runs the app's data backfills. Running it again does
+nothing.
+
+Usage (from the repository root):
+    python scripts/migrate_schema.py crm-system [--dry-run]
+    python scripts/migrate_schema.py ai-receptionist [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+
+from sqlalchemy import inspect, literal
+from sqlalchemy.schema import CreateColumn
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ('crm-system', 'ai-receptionist')
+
+def add_column_sql(table, column, dialect):
+    """ALTER TABLE statement adding a model column, keeping its default and NOT NULL"""
+    preparer = dialect.identifier_preparer
+    definition = str(CreateColumn(column).compile(dialect=dialect))
+    if column.server_default is None and column.default is not None and column.default.is_scalar:
+        # Python-side defaults only apply to new rows; give existing rows the same value
+        default = literal(column.default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}
+        )
+        definition = f'{definition} DEFAULT {default}'
+    return f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}'
+
+def backfill_phone_e164(db, dry_run):
+    """CRM: normalized phone numbers for patients created before the column existed"""
+    from src.models.patient import Patient, normalize_phone
+    patients = Patient.query.filter(Patient.phone_e164.is_(None), Patient.phone.isnot(None)).all()
+    print(f"patients.phone_e164: {len(patients)} rows to fill")
+    if not dry_run:
+        for patient in patients:
+            patient.phone_e164 = normalize_phone(patient.phone)
+        db.session.commit()
+
+BACKFILLS = {
+    'crm-system': [backfill_phone_e164],
+    'ai-receptionist': []
+}
+
+def migrate(app_name, dry_run=False):
+    sys.path.insert(0, os.path.join(REPO_ROOT, app_name))
+    from src.main import app
+    from src.models.user import db
+
+    with app.app_context():
+        engine = db.engine
+        inspector = inspect(engine)
+        pending = False
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                statement = add_column_sql(table, column, engine.dialect)
+                print(statement)
+                pending = True
+                if not dry_run:
+                    db.session.execute(db.text(statement))
+        if not dry_run:
+            db.session.commit()
+
+        for table in db.metadata.sorted_tables:
+            existing_indexes = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    print(f"CREATE INDEX {index.name} ON {table.name}")
+                    if not dry_run:
+                        index.create(engine)
+
+        if dry_run and pending:
+            # Backfills read the new columns, so they can only be previewed once those exist
+            print(f"{len(BACKFILLS[app_name])} backfill(s) run after the columns are added")
+            return
+        for backfill in BACKFILLS[app_name]:
+            backfill(db, dry_run)
+
+def main():
+    parser = argparse.ArgumentParser(description='Add missing columns and indexes to an existing database')
+    parser.add_argument('app', choices=APPS)
+    parser.add_argument('--dry-run', action='store_true', help='print the changes without making them')
+    args = parser.parse_args()
+    migrate(args.app, args.dry_run)
+
+if __name__ == '__main__':
+    main()
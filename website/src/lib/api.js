@@ -351,11 +351,21 @@ export async function fetchCrmJson(path, init = {}) {
   return fetchCrm(path, init, { parser: parseJsonResponse });
 }
 
-export async function submitConsultationRequest(payload) {
+function generateIdempotencyKey() {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+export async function submitConsultationRequest(payload, { idempotencyKey } = {}) {
+  // One key per submission so retries and endpoint fallbacks never create duplicates
   const requestInit = {
     method: 'POST',
     headers: {
-      'Content-Type': 'application/json'
+      'Content-Type': 'application/json',
+      'Idempotency-Key': idempotencyKey || generateIdempotencyKey()
     },
     body: JSON.stringify(payload)
   };